@@ -5,8 +5,16 @@
     return metaApiBase || window.API_BASE || window.location.origin
   }
 
+  function newIdempotencyKey() {
+    if (window.crypto?.randomUUID) return crypto.randomUUID()
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}${Math.random().toString(36).slice(2)}`
+  }
+
   async function request(path, { method = "GET", body, retries = 3, timeout = 5000 } = {}) {
     let lastError;
+    // One key per logical request, reused by every retry below, so the server
+    // can replay the first result instead of booking/cancelling twice.
+    const idempotencyKey = method === "GET" ? null : newIdempotencyKey();
     
     for (let attempt = 0; attempt < retries; attempt++) {
       try {
@@ -17,7 +25,8 @@
           method,
           headers: { 
             "Content-Type": "application/json",
-            "X-Request-ID": Math.random().toString(36).substring(7)
+            "X-Request-ID": Math.random().toString(36).substring(7),
+            ...(idempotencyKey ? { "Idempotency-Key": idempotencyKey } : {})
           },
           body: body ? JSON.stringify(body) : undefined,
           signal: controller.signal
@@ -105,7 +114,12 @@
     },
     logout() {
       return request("/logout", { method: "POST" })
-    }
+    },
+    myBookings(cursor, limit = 20) {
+      const qs = new URLSearchParams({ limit })
+      if (cursor) qs.set("cursor", cursor)
+      return request(`/me/bookings?${qs}`, { method: "GET" })
+    },
     // Events
     listEvents() {
       return request("/events", { method: "GET" })
@@ -153,18 +167,54 @@
 })()
 
 // Trace helper (posts lightweight client-side events to server)
-;(async () => {
-  async function trace(action, details) {
-    try {
-      await fetch((window.API_BASE || "http://localhost:5000") + "/trace", {
-        method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ action, details }),
-      })
-    } catch (e) {
+// Events are batched: sent every few seconds or once enough pile up, and
+// handed to sendBeacon when the page is hidden so none are lost on unload.
+;(() => {
+  const FLUSH_MS = 3000
+  const MAX_BATCH = 50
+  let pending = []
+  let timer = null
+
+  function url() {
+    return (window.API_BASE || "http://localhost:5000") + "/trace"
+  }
+
+  function flush(useBeacon) {
+    if (timer) {
+      clearTimeout(timer)
+      timer = null
+    }
+    if (!pending.length) return
+    const body = JSON.stringify({ events: pending })
+    pending = []
+    // text/plain keeps the beacon a simple (preflight-free) request
+    if (useBeacon && navigator.sendBeacon && navigator.sendBeacon(url(), new Blob([body], { type: "text/plain" }))) {
+      return
+    }
+    fetch(url(), {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body,
+      keepalive: true,
+    }).catch((e) => {
       // non-fatal
       console.warn("Trace failed", e)
+    })
+  }
+
+  function trace(action, details) {
+    pending.push({ action, details, ts: Date.now() })
+    if (pending.length >= MAX_BATCH) {
+      flush(false)
+    } else if (!timer) {
+      timer = setTimeout(() => flush(false), FLUSH_MS)
     }
   }
+
+  document.addEventListener("visibilitychange", () => {
+    if (document.visibilityState === "hidden") flush(true)
+  })
+  window.addEventListener("pagehide", () => flush(true))
+
   window.ehTrace = trace
 })()
@@ -1,13 +1,26 @@
 from __future__ import annotations
 
+import hmac
+import io
 import json
+import os
 from pathlib import Path
 import re
+import sys
+from datetime import datetime
 from typing import List, Dict, Any, Optional
 
 from flask import Flask, jsonify, request, send_from_directory, Blueprint, render_template, send_file, session
 from flask_cors import CORS
 
+from rate_limiter import (
+    rate_limit,
+    auth_ip_limiter,
+    login_failure_limiter,
+    booking_ip_limiter,
+    booking_account_limiter,
+)
+
 # Try to import EventHub, but make it optional for deployment
 try:
     from scripts.eventhub_binding import EventHub
@@ -18,31 +31,31 @@ except ImportError as e:
     EVENTHUB_AVAILABLE = False
     EventHub = None
 
-# Optional imports for PDF ticket generation
-try:
-    from reportlab.lib.pagesizes import letter, A4
-    from reportlab.lib.colors import Color, red, white, black
-    from reportlab.lib.units import inch, mm
-    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.pdfgen import canvas
-    from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
-    import qrcode
-    from PIL import Image
-    import io
-    import tempfile
-    import random
-    import string
-    from datetime import datetime
-    PDF_GENERATION_AVAILABLE = True
-except ImportError:
-    PDF_GENERATION_AVAILABLE = False
-    print("PDF generation libraries not available - install with: pip install reportlab qrcode pillow")
+from idempotency import idempotent, booking_idempotency, ticket_idempotency, set_response_ref
+from ticket_pdf import StandardizedTicketGenerator, PDF_GENERATION_AVAILABLE
+from ticket_cache import TicketCache, ticket_cache_key
+from ticket_batch import BatchRenderer, MAX_BATCH as MAX_TICKET_BATCH
+from ticket_registry import TicketRegistry, SIGNING_KEY_CONFIGURED, ticket_id_for
+from email_service import outbox as email_outbox, queue_booking_confirmation, queue_event_cancellation_notices
+from booking_ledger import BookingLedger, SEED_BOOKINGS, booking_seats
+from cancellations import CancellationEngine, CANCEL_BATCH
+from pricing import PriceTable
+from metrics import instrument_app, instrument_eventhub, registry as metrics_registry
+from trace_buffer import TraceBuffer, MAX_BATCH as MAX_TRACE_BATCH
+from profiler import install_profiler
+from static_assets import StaticAssets
+from image_pipeline import IMAGE_WARM_ON_START, ImagePipeline
 
 
 ROOT = Path(__file__).resolve().parent
 
 app = Flask(__name__, template_folder=str(ROOT))
+# `python app.py` or FLASK_DEBUG=1. Development fallbacks for secrets are
+# only accepted in debug mode.
+DEBUG = __name__ == "__main__" or os.getenv("FLASK_DEBUG", "").lower() in ("1", "true")
+if not SIGNING_KEY_CONFIGURED and not DEBUG:
+    raise RuntimeError("TICKET_SIGNING_KEY is not set: tickets signed with the development key can be "
+                       "forged by anyone (set FLASK_DEBUG=1 for local development)")
 # Secret key for session-based authentication
 app.secret_key = "dev-secret-change-me"
 CORS(app)
@@ -53,9 +66,12 @@ app.static_url_path = '/static'
 
 # Initialize EventHub only if available
 if EVENTHUB_AVAILABLE:
-    eh = EventHub()
+    eh = instrument_eventhub(EventHub())
 else:
     eh = None
+instrument_app(app)
+# Admin-only per-request profiling; a no-op unless PROFILER_TOKEN is set.
+install_profiler(app)
     
 import logging
 logger = logging.getLogger("EventHubServer")
@@ -65,26 +81,40 @@ if not logger.handlers:
     logger.addHandler(h)
 logger.setLevel(logging.INFO)
 
-# Route to serve HTML files
+# Static files (HTML/JS/CSS/images) are served from memory, pre-compressed,
+# with ETags and fingerprinted CSS/JS; see static_assets.StaticAssets.
+static_assets = StaticAssets(ROOT, ROOT / "static")
+
+
 @app.route('/', defaults={'path': 'index.html'})
 @app.route('/<path:path>')
 def serve_file(path):
-    # First, try to serve static files
-    if path.startswith('static/'):
-        return send_from_directory(app.static_folder, path[7:])
-    
-    # Then try to serve from root directory
-    try:
-        return send_from_directory(str(ROOT), path)
-    except:
-        # If file not found, serve index.html for client-side routing
-        return send_from_directory(str(ROOT), 'index.html')
-    else:
-        # Serve from root directory
-        return send_from_directory(str(ROOT), filename)
-        return app.send_static_file(path[7:])  # Remove "static/" prefix
-    return send_from_directory(str(ROOT), path)
-    return jsonify(error="not found"), 404
+    resp = static_assets.serve(path)
+    if resp is None:
+        # Unknown path: serve index.html for client-side routing
+        resp = static_assets.serve("index.html")
+    return resp
+
+
+def serve_static(filename):
+    return static_assets.serve(f"static/{filename}") or (jsonify(error="not found"), 404)
+
+
+# /static/<path> goes through the same in-memory layer as everything else
+app.view_functions["static"] = serve_static
+
+# Resized WebP/JPEG variants of static/images for the listing cards.
+image_pipeline = ImagePipeline()
+if IMAGE_WARM_ON_START:
+    image_pipeline.start()
+
+
+@app.get("/img/<path:name>")
+def serve_image(name):
+    """Catalog image `name` (relative to static/images) resized to the
+    nearest configured width >= ?w=, as WebP when the client accepts it."""
+    resp = image_pipeline.serve(name, request.args.get("w", type=int))
+    return resp or (jsonify(error="not found"), 404)
 
 
 # --- Health ---
@@ -94,218 +124,41 @@ def health():
     return jsonify(status="ok")
 
 
-# --- Ticket Generation System ---
+@app.get("/metrics")
+def metrics():
+    """Latency histograms per eh_* function and per route, Prometheus text
+    format. ?format=json gives count/mean/p50/p99 per series instead."""
+    if request.args.get("format") == "json":
+        return jsonify(metrics_registry.summary())
+    return app.response_class(metrics_registry.render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+
+# The ticket generator (and reportlab with it) is created on the first
+# ticket request rather than at startup.
+_ticket_generator: Optional[StandardizedTicketGenerator] = None
 
-class StandardizedTicketGenerator:
-    """
-    Standardized PDF ticket generator matching the exact reference format.
-    Creates uniform tickets for all event types with proper theming.
-    """
-    
-    def __init__(self):
-        # Standard ticket dimensions matching reference
-        self.ticket_width = 7.5 * inch
-        self.ticket_height = 3.5 * inch
-        
-        # Exact theme colors matching reference format
-        self.theme_colors = {
-            'movies': Color(0.8, 0.2, 0.2),      # Red theme
-            'events': Color(0.4, 0.2, 0.8),      # Purple theme  
-            'sports': Color(0.2, 0.7, 0.3),      # Green theme
-            'play': Color(0.8, 0.6, 0.2),        # Gold theme (matching reference)
-        }
-        
-        # Category labels
-        self.category_labels = {
-            'movies': 'Movie',
-            'events': 'Concert', 
-            'sports': 'Sports',
-            'play': 'Play'
-        }
-    
-    def generate_ticket_id(self) -> str:
-        """Generate a unique 8-digit ticket ID."""
-        return ''.join(random.choices(string.digits, k=8))
-    
-    def format_date(self, date_str: str) -> tuple:
-        """Format date string to match reference format."""
-        try:
-            date_obj = datetime.strptime(date_str, '%Y-%m-%d')
-            day_name = date_obj.strftime('%A').upper()
-            month_day = date_obj.strftime('%B %d, %Y').upper()
-            return day_name, month_day
-        except:
-            return "SATURDAY", "JANUARY 18, 2025"
-    
-    def generate_standardized_ticket(self, booking_data: dict, output_path: str) -> bool:
-        """
-        Generate a standardized PDF ticket matching the exact reference format.
-        Layout: Left section (white) + Right section (colored) + Bottom info strip
-        """
-        if not PDF_GENERATION_AVAILABLE:
-            return False
-            
-        try:
-            # Create canvas with standard page size
-            c = canvas.Canvas(output_path, pagesize=letter)
-            
-            # Get theme color for this category
-            category = booking_data.get('category', 'movies').lower()
-            theme_color = self.theme_colors.get(category, self.theme_colors['movies'])
-            
-            # Generate unique ticket ID
-            ticket_id = self.generate_ticket_id()
-            
-            # Ticket positioning (centered on page)
-            x_start = 1 * inch
-            y_start = 4.5 * inch
-            
-            # Section dimensions
-            left_width = 5 * inch
-            right_width = 2.5 * inch
-            ticket_height = 2.5 * inch
-            
-            # Draw main ticket border
-            c.setStrokeColor(black)
-            c.setLineWidth(2)
-            c.rect(x_start, y_start, left_width + right_width, ticket_height, fill=0, stroke=1)
-            
-            # LEFT SECTION (White background)
-            c.setFillColor(white)
-            c.rect(x_start, y_start, left_width, ticket_height, fill=1, stroke=0)
-            
-            # RIGHT SECTION (Colored background)
-            c.setFillColor(theme_color)
-            c.rect(x_start + left_width, y_start, right_width, ticket_height, fill=1, stroke=0)
-            
-            # Draw perforated edge
-            c.setStrokeColor(black)
-            c.setLineWidth(1)
-            # Vertical perforation line
-            perf_x = x_start + left_width
-            for i in range(15):
-                y_perf = y_start + (i * 0.15 * inch) + 0.1 * inch
-                c.circle(perf_x, y_perf, 0.03 * inch, fill=1)
-            
-            # LEFT SECTION CONTENT
-            c.setFillColor(black)
-            
-            # Event Title (Large, centered)
-            c.setFont("Helvetica-Bold", 24)
-            event_title = booking_data.get('eventTitle', 'Event Name')
-            title_width = c.stringWidth(event_title, "Helvetica-Bold", 24)
-            title_x = x_start + (left_width - title_width) / 2
-            c.drawString(title_x, y_start + ticket_height - 0.6 * inch, event_title)
-            
-            # Horizontal line under title
-            c.setLineWidth(1)
-            c.line(x_start + 0.3 * inch, y_start + ticket_height - 0.8 * inch, 
-                   x_start + left_width - 0.3 * inch, y_start + ticket_height - 0.8 * inch)
-            
-            # Format date
-            day_name, full_date = self.format_date(booking_data.get('date', '2025-01-18'))
-            
-            # Three column layout for details
-            c.setFont("Helvetica-Bold", 10)
-            
-            # Column 1: Date
-            col1_x = x_start + 0.3 * inch
-            c.drawString(col1_x, y_start + ticket_height - 1.2 * inch, day_name)
-            c.drawString(col1_x, y_start + ticket_height - 1.35 * inch, full_date)
-            
-            # Column 2: Price
-            col2_x = x_start + 1.8 * inch
-            c.drawString(col2_x, y_start + ticket_height - 1.2 * inch, "EVENT PRICE")
-            price_text = f"₹{booking_data.get('price', 800)}"
-            c.drawString(col2_x, y_start + ticket_height - 1.35 * inch, price_text)
-            
-            # Column 3: Door Open
-            col3_x = x_start + 3.2 * inch
-            c.drawString(col3_x, y_start + ticket_height - 1.2 * inch, "DOOR OPEN")
-            time_text = booking_data.get('time', '6:30 PM')
-            c.drawString(col3_x, y_start + ticket_height - 1.35 * inch, time_text)
-            
-            # Venue (centered)
-            c.setFont("Helvetica", 12)
-            venue = booking_data.get('venue', 'Event Venue')
-            venue_width = c.stringWidth(venue, "Helvetica", 12)
-            venue_x = x_start + (left_width - venue_width) / 2
-            c.drawString(venue_x, y_start + ticket_height - 1.7 * inch, venue)
-            
-            # Barcode in left section
-            self.draw_barcode(c, x_start + 0.3 * inch, y_start + 0.3 * inch, 4.4 * inch, 0.4 * inch)
-            
-            # Barcode number
-            c.setFont("Helvetica", 8)
-            barcode_num = ticket_id
-            c.drawString(x_start + 2 * inch, y_start + 0.1 * inch, barcode_num)
-            
-            # RIGHT SECTION CONTENT
-            c.setFillColor(white)
-            
-            # "ADMIT ONE TICKET" text
-            c.setFont("Helvetica-Bold", 14)
-            c.drawString(x_start + left_width + 0.2 * inch, y_start + ticket_height - 0.5 * inch, "ADMIT ONE")
-            c.drawString(x_start + left_width + 0.3 * inch, y_start + ticket_height - 0.7 * inch, "TICKET")
-            
-            # Date in right section
-            c.setFont("Helvetica-Bold", 10)
-            c.drawString(x_start + left_width + 0.2 * inch, y_start + ticket_height - 1.0 * inch, full_date)
-            
-            # Gate and Seat info
-            c.setFont("Helvetica-Bold", 9)
-            gate = booking_data.get('gate', 'Main')
-            row = booking_data.get('row', 'K')
-            seat = booking_data.get('seatNumber', '04')
-            
-            c.drawString(x_start + left_width + 0.2 * inch, y_start + ticket_height - 1.3 * inch, f"GATE {gate}")
-            c.drawString(x_start + left_width + 0.2 * inch, y_start + ticket_height - 1.45 * inch, f"ROW {row} • SEAT {seat}")
-            
-            # Barcode in right section
-            self.draw_barcode(c, x_start + left_width + 0.2 * inch, y_start + 0.5 * inch, 2.1 * inch, 0.3 * inch)
-            
-            # Barcode number in right section
-            c.setFont("Helvetica", 7)
-            c.drawString(x_start + left_width + 0.8 * inch, y_start + 0.3 * inch, barcode_num)
-            
-            # BOTTOM INFO STRIP
-            strip_y = y_start - 0.3 * inch
-            c.setFillColor(Color(0.9, 0.9, 0.9))
-            c.rect(x_start, strip_y, left_width + right_width, 0.25 * inch, fill=1, stroke=0)
-            
-            c.setFillColor(black)
-            c.setFont("Helvetica", 8)
-            
-            # Category and mood
-            category_label = self.category_labels.get(category, 'Event')
-            mood = booking_data.get('mood', 'Entertainment')
-            c.drawString(x_start + 0.2 * inch, strip_y + 0.1 * inch, f"■ {category_label} • #{mood.title()}")
-            
-            # Ticket ID on right
-            c.drawString(x_start + left_width + right_width - 1.5 * inch, strip_y + 0.1 * inch, f"ID: {ticket_id}")
-            
-            # Save the PDF
-            c.save()
-            return True
-            
-        except Exception as e:
-            logger.error(f"Error generating standardized ticket PDF: {e}")
-            return False
-    
-    def draw_barcode(self, canvas, x, y, width, height):
-        """Draw a simple barcode pattern."""
-        canvas.setFillColor(black)
-        bar_width = width / 40
-        
-        # Create barcode pattern
-        for i in range(40):
-            if i % 3 != 0:  # Create pattern
-                bar_height = height if i % 2 == 0 else height * 0.7
-                canvas.rect(x + (i * bar_width), y, bar_width * 0.8, bar_height, fill=1)
 
+def ticket_generator() -> StandardizedTicketGenerator:
+    global _ticket_generator
+    if _ticket_generator is None:
+        _ticket_generator = StandardizedTicketGenerator()
+    return _ticket_generator
 
-# Initialize standardized ticket generator
-ticket_generator = StandardizedTicketGenerator()
+
+ticket_cache = TicketCache()
+# Idempotent ticket downloads store the cache key, not the PDF.
+ticket_idempotency.load_ref = ticket_cache.get
+ticket_registry = TicketRegistry()
+booking_ledger = BookingLedger()
+cancellation_engine = CancellationEngine(eh, booking_ledger, notify=queue_event_cancellation_notices,
+                                         find_event=lambda event_id: _find_event(event_id),
+                                         on_booked=lambda booking: _booking_confirmed(booking),
+                                         on_cancelled=lambda booking_id, seats: _revoke_tickets(booking_id, seats))
+batch_renderer = BatchRenderer(cache=ticket_cache, resolve=lambda booking_id: _booking_tickets(booking_id))
+trace_buffer = TraceBuffer()
+# Gate scanners authenticate with X-Gate-Key; /tickets/validate is closed
+# until it is set.
+GATE_API_KEY = os.getenv("GATE_API_KEY", "")
 
 
 # --- Events data layer ---
@@ -524,6 +377,7 @@ def _build_category_events(category: str, base_id: int, count: int = 9) -> List[
             "available_seats": f"{(i * 7) % 50 + 10}/60 seats available",
             "category": category if category != "play" else "play",
             "image_url": img,
+            **image_pipeline.responsive(img),
             "description": f"{name} - {category} event",
             "price": ((i * 10) % 500) + 100,
             "location": locations[i % len(locations)],
@@ -532,9 +386,10 @@ def _build_category_events(category: str, base_id: int, count: int = 9) -> List[
     return items
 
 
-def _all_catalog() -> List[Dict[str, Any]]:
+def _base_catalog() -> List[Dict[str, Any]]:
     """
-    Returns full catalog combining explicit seed and generated category events.
+    Returns full catalog combining explicit seed and generated category events,
+    at their base (undiscounted, static) prices.
     Ensures there are at least 9 events per category.
     """
     all_items: List[Dict[str, Any]] = []
@@ -551,6 +406,19 @@ def _all_catalog() -> List[Dict[str, Any]]:
     return all_items
 
 
+# Demand-based prices, recomputed on a schedule; endpoints only look them up.
+price_table = PriceTable(_base_catalog, capacity_source=eh.event_capacity if eh else None)
+
+
+def _all_catalog() -> List[Dict[str, Any]]:
+    """Full catalog at current prices (see pricing.PriceTable)."""
+    return price_table.apply(_base_catalog())
+
+
+def _category_events(category: str, base_id: int) -> List[Dict[str, Any]]:
+    return price_table.apply(_build_category_events(category, base_id, 9))
+
+
 @app.get("/events")
 def list_events():
     """
@@ -563,7 +431,7 @@ def list_events():
     logger.info("HTTP GET /events category=%s", cat or "all")
     if cat in {"movies", "events", "sports", "play"}:
         base = {"movies": 1000, "events": 2000, "sports": 3000, "play": 4000}[cat]
-        return jsonify(_build_category_events(cat, base, 9))
+        return jsonify(_category_events(cat, base))
 
     # Return full catalog (explicit seed + generated)
     return jsonify(_all_catalog())
@@ -839,7 +707,7 @@ def chatbot():
 @app.post("/events")
 def add_event():
     """Add or upsert an event into the native store.
-    Body: { id, name, category, venue, total }
+    Body: { id, name, category, venue, date (YYYY-MM-DD), time, price, total }
     Categories expected by native: Movies | Plays | Sports | Concerts
     """
     if not EVENTHUB_AVAILABLE:
@@ -849,19 +717,35 @@ def add_event():
     name = (data.get("name") or "").strip()
     category = (data.get("category") or "").strip()
     venue = (data.get("venue") or "").strip()
-    total = int(data.get("total") or 0)
-    if not (event_id and name and category and venue and total >= 0):
+    date = str(data.get("date") or "").strip()
+    time_ = str(data.get("time") or "").strip()
+    try:
+        total = int(data.get("total") or 0)
+        price = float(data.get("price"))
+        datetime.strptime(date, "%Y-%m-%d")
+    except (TypeError, ValueError):
+        return jsonify(error="missing/invalid fields"), 400
+    if not (event_id and name and category and venue and time_ and total >= 0 and price >= 0):
         return jsonify(error="missing/invalid fields"), 400
-    logger.info("HTTP POST /events id=%s name=%s cat=%s venue=%s total=%s", event_id, name, category, venue, total)
-    ok = eh.add_event(event_id, name, category, venue, total)
+    logger.info("HTTP POST /events id=%s name=%s cat=%s venue=%s date=%s total=%s",
+                event_id, name, category, venue, date, total)
+    ok = eh.add_event(event_id, name, category, venue, total, date=date, time=time_, price=price)
     return jsonify(ok=bool(ok)), (200 if ok else 400)
 
 
 @app.delete("/events/<event_id>")
 def delete_event(event_id: str):
+    """Delete an event: purge its queued requests, remove it from the native
+    store, and start a background job cancelling and refunding its bookings.
+    Poll the returned status_url for progress."""
     logger.info("HTTP DELETE /events/%s", event_id)
-    ok = eh.delete_event(event_id)
-    return jsonify(ok=bool(ok)), (200 if ok else 404)
+    if not EVENTHUB_AVAILABLE:
+        return jsonify(error="EventHub backend not available"), 503
+    if not eh.search_event_json(event_id):
+        return jsonify(ok=False), 404
+    job = cancellation_engine.cancel_event(event_id, delete=True)
+    return jsonify(ok=True, job_id=job.id, status_url=f"/events/cancellations/{job.id}",
+                   purged=job.purged), 202
 
 
 @app.get("/event/<int:event_id>")
@@ -896,22 +780,22 @@ def get_event(event_id: int):
 # Keep optional category endpoints for backward compatibility (frontend no longer needs to use them)
 @app.get("/events/movies")
 def events_movies():
-    return jsonify(_build_category_events("movies", 1000, 9))
+    return jsonify(_category_events("movies", 1000))
 
 
 @app.get("/events/events")
 def events_events():
-    return jsonify(_build_category_events("events", 2000, 9))
+    return jsonify(_category_events("events", 2000))
 
 
 @app.get("/events/sports")
 def events_sports():
-    return jsonify(_build_category_events("sports", 3000, 9))
+    return jsonify(_category_events("sports", 3000))
 
 
 @app.get("/events/play")
 def events_play():
-    return jsonify(_build_category_events("play", 4000, 9))
+    return jsonify(_category_events("play", 4000))
 
 
 # Categories tree from native store
@@ -927,6 +811,7 @@ def categories_tree():
 
 # --- Auth ---
 @app.post("/signup")
+@rate_limit(ip_table=auth_ip_limiter)
 def signup():
     data = request.get_json(force=True)
     name = (data.get("name") or "").strip()
@@ -953,6 +838,7 @@ def signup():
 
 
 @app.post("/login")
+@rate_limit(ip_table=auth_ip_limiter, account_table=login_failure_limiter, charge_account_on=(401,))
 def login():
     data = request.get_json(force=True)
     name = (data.get("name") or "").strip()
@@ -984,6 +870,27 @@ def me():
     return jsonify(ok=True, user=user), 200
 
 
+@app.get("/me/bookings")
+def my_bookings():
+    """
+    The signed-in user's bookings, newest first.
+    Query: limit (1-100, default 20), cursor (from the previous page's next_cursor).
+    """
+    user = session.get("user")
+    if not user:
+        return jsonify(error="unauthenticated"), 401
+    try:
+        limit = min(max(int(request.args.get("limit", 20)), 1), 100)
+    except ValueError:
+        return jsonify(error="limit must be an integer"), 400
+    try:
+        bookings, next_cursor = booking_ledger.list_for_user(user["user_id"], limit, request.args.get("cursor"))
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    logger.info("HTTP GET /me/bookings user_id=%s count=%d", user["user_id"], len(bookings))
+    return jsonify(ok=True, bookings=bookings, next_cursor=next_cursor), 200
+
+
 @app.post("/logout")
 def logout():
     session.pop("user", None)
@@ -991,7 +898,47 @@ def logout():
 
 
 # --- Booking ---
+# Event fields a booking (and its tickets) cannot do without.
+BOOKING_EVENT_FIELDS = ("name", "venue", "date", "time", "price")
+# Longest user id (an email address) a booking or cancellation is queued for.
+MAX_USER_ID_LENGTH = 254
+
+
+def _native_event(event_id: str) -> Optional[Dict[str, Any]]:
+    """The native store's record of an event (name, category, venue, date,
+    time, price, capacity), without unset fields; None if unknown."""
+    js = eh.search_event_json(str(event_id)) if eh is not None else None
+    return {k: v for k, v in json.loads(js).items() if v is not None} if js else None
+
+
+def _find_event(event_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Details of a booked event for the ledger: the native record (the event
+    that was actually booked), with the catalog listing of the same id
+    filling in the rest (mood, description) and anything the record lacks.
+    The price is the demand price the catalog is showing, so the buyer is
+    charged what they were quoted.
+    """
+    event = _native_event(event_id)
+    if event is None:
+        return None
+    for listing in _base_catalog():
+        if str(listing.get("id")) == str(event_id):
+            event = {**listing, **event}
+            break
+    event["price"] = price_table.price(event_id, default=event.get("price"))
+    return event
+
+
+def _missing_event_fields(event: Optional[Dict[str, Any]]) -> List[str]:
+    if not event:
+        return list(BOOKING_EVENT_FIELDS)
+    return [k for k in BOOKING_EVENT_FIELDS if event.get(k) in (None, "")]
+
+
 @app.post("/book")
+@idempotent(booking_idempotency)
+@rate_limit(ip_table=booking_ip_limiter, account_table=booking_account_limiter)
 def book():
     data = request.get_json(force=True)
     user_id = data.get("user_id") or data.get("email")
@@ -999,6 +946,16 @@ def book():
     quantity = int(data.get("quantity") or data.get("qty") or 1)
     if not user_id or not event_id:
         return jsonify(error="missing user_id/event_id"), 400
+    if len(str(user_id)) > MAX_USER_ID_LENGTH:
+        return jsonify(error=f"user_id longer than {MAX_USER_ID_LENGTH} characters"), 400
+    event = _native_event(str(event_id))
+    if event is None:
+        return jsonify(error="event not found"), 404
+    if event.get("closed"):
+        return jsonify(error="event has been cancelled"), 409
+    missing = _missing_event_fields(event)
+    if missing:
+        return jsonify(error=f"event is not open for booking (missing {', '.join(missing)})"), 409
     logger.info("HTTP POST /book user_id=%s event_id=%s qty=%s", user_id, event_id, quantity)
     ok = eh.book(str(user_id), str(event_id), quantity)
     return jsonify(ok=bool(ok)), (200 if ok else 400)
@@ -1008,10 +965,24 @@ def book():
 def process_book():
     logger.info("HTTP POST /book/process called")
     js = eh.process_next_booking_json()
-    return app.response_class(response=js, mimetype="application/json")
+    result = json.loads(js)
+    if result.get("status") == "ok":
+        # Confirmed by the native queue: record it in the ledger
+        event = _find_event(result["event"]) or {"id": result["event"]}
+        missing = _missing_event_fields(event)
+        if missing:
+            # /book turns these away; a request queued before the event lost
+            # its details is still honoured, its tickets print "TBA".
+            logger.warning("booking for event %s recorded without %s", result["event"], ", ".join(missing))
+        booking = booking_ledger.record(result["user"], event, int(result["quantity"]))
+        _booking_confirmed(booking)
+        result["booking"] = booking
+    return jsonify(result)
 
 
 @app.post("/cancel")
+@idempotent(booking_idempotency)
+@rate_limit(ip_table=booking_ip_limiter, account_table=booking_account_limiter)
 def cancel():
     data = request.get_json(force=True)
     user_id = data.get("user_id") or data.get("email")
@@ -1019,16 +990,46 @@ def cancel():
     quantity = int(data.get("quantity") or data.get("qty") or 1)
     if not user_id or not event_id:
         return jsonify(error="missing user_id/event_id"), 400
+    if len(str(user_id)) > MAX_USER_ID_LENGTH:
+        return jsonify(error=f"user_id longer than {MAX_USER_ID_LENGTH} characters"), 400
     logger.info("HTTP POST /cancel user_id=%s event_id=%s qty=%s", user_id, event_id, quantity)
+    held = booking_ledger.held_tickets(str(user_id), str(event_id))
+    if held < quantity:
+        return jsonify(ok=False, error="not enough confirmed tickets to cancel", held=held), 400
     ok = eh.cancel(str(user_id), str(event_id), quantity)
     return jsonify(ok=bool(ok)), (200 if ok else 400)
 
 
 @app.post("/cancel/process")
 def process_cancel():
-    logger.info("HTTP POST /cancel/process called")
-    js = eh.process_last_cancellation_json()
-    return app.response_class(response=js, mimetype="application/json")
+    """Drain up to `max` queued cancellations (query or JSON body, default
+    CANCEL_BATCH), validated against the ledger, in one call."""
+    data = request.get_json(silent=True) or {}
+    try:
+        max_items = int(request.args.get("max") or data.get("max") or CANCEL_BATCH)
+    except (TypeError, ValueError):
+        return jsonify(error="max must be an integer"), 400
+    logger.info("HTTP POST /cancel/process max=%d", max_items)
+    return jsonify(cancellation_engine.process(max_items))
+
+
+@app.post("/events/<event_id>/cancel")
+def cancel_event_bookings(event_id: str):
+    """Event called off but kept: close it to new bookings, purge its
+    queued and waitlisted requests, and cancel and refund all of its bookings
+    in a background job. Poll the returned status_url."""
+    logger.info("HTTP POST /events/%s/cancel", event_id)
+    job = cancellation_engine.cancel_event(event_id)
+    return jsonify(ok=True, job_id=job.id, status_url=f"/events/cancellations/{job.id}",
+                   purged=job.purged), 202
+
+
+@app.get("/events/cancellations/<job_id>")
+def event_cancellation_status(job_id: str):
+    job = cancellation_engine.get_job(job_id)
+    if not job:
+        return jsonify(error="job not found"), 404
+    return jsonify(job.progress())
 
 
 @app.post("/shutdown")
@@ -1040,44 +1041,27 @@ def shutdown():
 
 @app.post("/trace")
 def trace_action():
-    """Simple tracing endpoint: accepts JSON { action: str, details: dict }
-    and logs it to the server terminal. This is intended for non-sensitive
-    client-side indicators (UI clicks, feature usage)."""
-    data = request.get_json(force=True)
-    action = data.get("action")
-    details = data.get("details")
-    # Map common actions to DS concepts (keep mapping small and editable)
-    ds_map = {
-        "add_to_cart": "HashTable/Array",      # cart insert/update uses local storage (keyed by user)
-        "proceed_to_payment": "Queue/BookingQueue", # booking queue enqueue
-        "complete_booking": "Queue/BookingQueue",  # booking processing (dequeue)
-        "login": "HashTable",
-        "register": "HashTable",
-        "search_event": "BST/Trie/HashTable",
-        "shortest_path": "Graph/Dijkstra",
-        "add_path": "Graph",
-        "add_venue": "Graph/NodeInsert",
-        "cancel": "Stack/CancelStack",
-    }
+    """Client tracing endpoint for non-sensitive indicators (UI clicks,
+    feature usage). Accepts one event { action, details, ts } or a batch
+    { events: [...] } (also a bare JSON list). Events are buffered and
+    written by a background thread, so this returns without any I/O."""
+    data = request.get_json(force=True, silent=True)
+    if isinstance(data, dict):
+        events = data.get("events") if "events" in data else [data]
+    else:
+        events = data
+    if not isinstance(events, list):
+        return jsonify(error="expected an event or a list of events"), 400
+    if len(events) > MAX_TRACE_BATCH:
+        return jsonify(error=f"at most {MAX_TRACE_BATCH} events per batch"), 413
+    events = [e for e in events if isinstance(e, dict) and isinstance(e.get("action"), str)]
+    accepted = trace_buffer.submit(events)
+    return jsonify(ok=True, accepted=accepted), 202
 
-    ds_part = ds_map.get(action, "unknown")
-    # Map actions to typical client and server function names for clarity
-    func_map = {
-        "add_to_cart": {"client": "Cart.add / addToBookingCart", "server": "(localStorage) / optional eh.book"},
-        "proceed_to_payment": {"client": "seatSelectionSystem.proceedToPayment", "server": "/book -> eh.book (enqueue)"},
-        "complete_booking": {"client": "bookingConfirmationSystem.completeBooking", "server": "/book/process -> eh.process_next_booking"},
-        "login": {"client": "AuthSystem.handleLogin", "server": "/login -> eh.login_user"},
-        "register": {"client": "AuthSystem.handleRegistration", "server": "/signup -> eh.register_user"},
-        "search_event": {"client": "ehApi.getEvent", "server": "/event/<id> -> eh.search_event_json"},
-        "shortest_path": {"client": "ehApi.shortest", "server": "/venues/shortest -> eh.shortest_path_json"},
-        "add_path": {"client": "ehApi.addPath", "server": "/paths -> eh.add_path"},
-        "add_venue": {"client": "ehApi.addVenue", "server": "/venues -> eh.add_venue"},
-        "cancel": {"client": "ehApi.cancel", "server": "/cancel -> eh.cancel"},
-    }
 
-    funcs = func_map.get(action, {"client": "unknown", "server": "unknown"})
-    logger.info("TRACE action=%s ds=%s client_fn=%s server_fn=%s details=%s", action, ds_part, funcs["client"], funcs["server"], details)
-    return jsonify(ok=True)
+@app.get("/trace/stats")
+def trace_stats():
+    return jsonify(trace_buffer.stats())
 
 
 # --- Venues Graph (optional DS demo) ---
@@ -1123,83 +1107,7 @@ def booking_details(booking_id: str):
     """
     logger.info("HTTP GET /booking_details/%s", booking_id)
     
-    # Sample booking data (in real app, this would come from database)
-    sample_bookings = {
-        "BK001": {
-            "bookingId": "BK001",
-            "eventTitle": "Avengers: Endgame",
-            "category": "movies",
-            "date": "2025-01-15",
-            "time": "7:00 PM",
-            "venue": "PVR Cinemas, Phoenix Mall",
-            "tickets": 2,
-            "totalAmount": 700,
-            "status": "confirmed",
-            "bookingDate": "2025-01-01",
-            "mood": "adventure",
-            "description": "The epic conclusion to the Infinity Saga that brings together all Marvel heroes for the ultimate battle.",
-            "price": 350,
-            "seatNumber": "15",
-            "row": "A",
-            "gate": "Main"
-        },
-        "BK002": {
-            "bookingId": "BK002",
-            "eventTitle": "Coldplay Live Concert",
-            "category": "events",
-            "date": "2025-01-20",
-            "time": "8:00 PM",
-            "venue": "DY Patil Stadium",
-            "tickets": 1,
-            "totalAmount": 2500,
-            "status": "confirmed",
-            "bookingDate": "2025-01-02",
-            "mood": "energetic",
-            "description": "Experience the magic of Coldplay live with their spectacular Music of the Spheres World Tour.",
-            "price": 2500,
-            "seatNumber": "42",
-            "row": "B",
-            "gate": "East"
-        },
-        "BK003": {
-            "bookingId": "BK003",
-            "eventTitle": "Romeo and Juliet",
-            "category": "play",
-            "date": "2025-01-18",
-            "time": "6:30 PM",
-            "venue": "National Centre for Performing Arts",
-            "tickets": 2,
-            "totalAmount": 1600,
-            "status": "confirmed",
-            "bookingDate": "2025-01-03",
-            "mood": "romantic",
-            "description": "Shakespeare's timeless love story brought to life with stunning performances and beautiful staging.",
-            "price": 800,
-            "seatNumber": "04",
-            "row": "K",
-            "gate": "Main"
-        },
-        "BK004": {
-            "bookingId": "BK004",
-            "eventTitle": "IPL Final Match",
-            "category": "sports",
-            "date": "2025-01-25",
-            "time": "7:30 PM",
-            "venue": "Wankhede Stadium",
-            "tickets": 3,
-            "totalAmount": 4500,
-            "status": "confirmed",
-            "bookingDate": "2025-01-04",
-            "mood": "energetic",
-            "description": "The ultimate cricket showdown between the top two teams of the season.",
-            "price": 1500,
-            "seatNumber": "55",
-            "row": "D",
-            "gate": "North"
-        }
-    }
-    
-    booking = sample_bookings.get(booking_id)
+    booking = booking_ledger.get(booking_id)
     if not booking:
         return jsonify({'error': 'Booking not found'}), 404
     
@@ -1221,13 +1129,105 @@ def booking_details(booking_id: str):
     })
 
 
+def _ticket_filename(booking_data: dict, booking_id: str) -> str:
+    safe_title = re.sub(r"[^\w\s-]", "", booking_data["eventTitle"]).strip()
+    safe_title = re.sub(r"[-\s]+", "_", safe_title)
+    return f"{safe_title}_ticket_{booking_id}.pdf"
+
+
+def _issue_tickets(booking: dict) -> None:
+    """Register one ticket per seat of a confirmed ledger booking. This is the
+    only place tickets are issued; rendering never creates them."""
+    ticket_registry.issue_many(
+        (ticket_id_for(booking["bookingId"], seat["seatIndex"]) for seat in booking_seats(booking)),
+        booking["bookingId"],
+    )
+
+
+# The demo bookings are confirmed ledger rows too (issue_many is a no-op once
+# they are registered).
+for _seed in SEED_BOOKINGS:
+    _issue_tickets(_seed)
+
+
+def _booking_confirmed(booking: dict) -> None:
+    """A booking was recorded in the ledger (from the queue or the waitlist):
+    issue its tickets and queue the confirmation email."""
+    _issue_tickets(booking)
+    queue_booking_confirmation(booking)
+
+
+def _revoke_tickets(booking_id: str, seats: range) -> None:
+    """Seats of a booking were cancelled: their tickets no longer admit."""
+    revoked = ticket_registry.revoke_many(ticket_id_for(booking_id, i) for i in seats)
+    logger.info("revoked %d ticket(s) of %s", revoked, booking_id)
+
+
+def _booking_tickets(booking_id: str) -> Optional[List[dict]]:
+    """Per-seat ticket data for a confirmed ledger booking, None if there is
+    none or it was cancelled."""
+    booking = booking_ledger.get(booking_id)
+    if booking is None or booking.get("status") != "confirmed":
+        return None
+    return booking_seats(booking)
+
+
+def _rendered_ticket(booking: dict) -> Optional[bytes]:
+    """PDF of a ledger booking, one page per seat, from the shared
+    rendered-ticket cache. Downloads and email attachments both go through
+    here, so each booking is rendered once."""
+    return ticket_cache.get_or_render(booking, lambda b: ticket_generator().render_tickets(booking_seats(b)))
+
+
+def _ticket_attachment(ref: dict):
+    """Outbox attachment loader: (filename, bytes) for a queued {bookingId} reference."""
+    booking = booking_ledger.get(str(ref.get("bookingId")))
+    if booking is None:
+        raise RuntimeError(f"booking {ref.get('bookingId')} not found")
+    pdf = _rendered_ticket(booking)
+    if pdf is None:
+        raise RuntimeError(f"failed to render ticket for {booking['bookingId']}")
+    return _ticket_filename(booking, booking["bookingId"]), pdf
+
+
+email_outbox.attachment_loader = _ticket_attachment
+# Deliver whatever is still queued from before a restart instead of waiting
+# for the next enqueue to start the senders.
+email_outbox.start()
+
+
+def _send_ticket(booking_id: str):
+    """Serve the tickets of a ledger booking straight from memory. Only the
+    booking id comes from the client; everything printed comes from the
+    ledger. Rendered bytes are cached by content hash, so a re-download does
+    no reportlab work and never touches the filesystem."""
+    booking = booking_ledger.get(booking_id)
+    if not booking:
+        return jsonify(error="Booking not found"), 404
+    if booking.get("status") != "confirmed":
+        # Cancelled or refunded: its tickets are revoked, don't hand them out.
+        return jsonify(error=f"Booking is {booking.get('status')}"), 410
+    pdf = _rendered_ticket(booking)
+    if pdf is None:
+        return jsonify(error="Failed to generate ticket"), 500
+
+    set_response_ref(ticket_cache_key(booking))
+    return send_file(
+        io.BytesIO(pdf),
+        as_attachment=True,
+        download_name=_ticket_filename(booking, booking_id),
+        mimetype="application/pdf",
+    )
+
+
 @app.post("/download_ticket")
+@idempotent(ticket_idempotency)
 def download_ticket_post():
     """
-    Generate and download a ticket PDF from real booking data posted by the client.
-    Expects JSON with at least: bookingId, eventTitle, category, date, time, venue, price, seatNumber, row
+    Download the ticket PDF of a booking.
+    Expects JSON with the bookingId (top level or under "booking").
     """
-    logger.info("HTTP POST /download_ticket (real booking data)")
+    logger.info("HTTP POST /download_ticket")
 
     if not PDF_GENERATION_AVAILABLE:
         return jsonify({
@@ -1238,35 +1238,11 @@ def download_ticket_post():
     try:
         data = request.get_json(force=True) or {}
         booking_data = data.get("booking") or data
+        booking_id = booking_data.get("bookingId") if isinstance(booking_data, dict) else None
+        if not booking_id or not isinstance(booking_id, str):
+            return jsonify(error="missing fields: bookingId"), 400
 
-        # Basic validation
-        required = ["bookingId", "eventTitle", "category", "date", "time", "venue"]
-        missing = [k for k in required if not booking_data.get(k)]
-        if missing:
-            return jsonify(error=f"missing fields: {', '.join(missing)}"), 400
-
-        # Create tickets directory
-        tickets_dir = ROOT / "tickets"
-        tickets_dir.mkdir(exist_ok=True)
-
-        # Generate filename based on real data
-        safe_title = re.sub(r"[^\w\s-]", "", booking_data["eventTitle"]).strip()
-        safe_title = re.sub(r"[-\s]+", "_", safe_title)
-        booking_id = booking_data.get("bookingId") or "TICKET"
-        filename = f"{safe_title}_ticket_{booking_id}.pdf"
-        filepath = tickets_dir / filename
-
-        # Generate standardized ticket
-        success = ticket_generator.generate_standardized_ticket(booking_data, str(filepath))
-        if not success:
-            return jsonify(error="Failed to generate ticket"), 500
-
-        return send_file(
-            str(filepath),
-            as_attachment=True,
-            download_name=filename,
-            mimetype="application/pdf",
-        )
+        return _send_ticket(booking_id)
     except Exception as e:
         logger.error(f"Error in POST /download_ticket: {e}")
         return jsonify(error="Internal server error"), 500
@@ -1289,96 +1265,96 @@ def download_ticket(booking_id: str):
             }
         }), 503
     
-    # Sample booking data (in real app, this would come from database)
-    sample_bookings = {
-        "BK001": {
-            "bookingId": "BK001",
-            "eventTitle": "Avengers: Endgame",
-            "category": "movies",
-            "date": "2025-01-15",
-            "time": "7:00 PM",
-            "venue": "PVR Cinemas, Phoenix Mall",
-            "price": 350,
-            "seatNumber": "15",
-            "row": "A",
-            "gate": "Main",
-            "mood": "adventure"
-        },
-        "BK002": {
-            "bookingId": "BK002",
-            "eventTitle": "Coldplay Live Concert",
-            "category": "events",
-            "date": "2025-01-20",
-            "time": "8:00 PM",
-            "venue": "DY Patil Stadium",
-            "price": 2500,
-            "seatNumber": "42",
-            "row": "B",
-            "gate": "East",
-            "mood": "energetic"
-        },
-        "BK003": {
-            "bookingId": "BK003",
-            "eventTitle": "Romeo and Juliet",
-            "category": "play",
-            "date": "2025-01-18",
-            "time": "6:30 PM",
-            "venue": "National Centre for Performing Arts",
-            "price": 800,
-            "seatNumber": "04",
-            "row": "K",
-            "gate": "Main",
-            "mood": "romantic"
-        },
-        "BK004": {
-            "bookingId": "BK004",
-            "eventTitle": "IPL Final Match",
-            "category": "sports",
-            "date": "2025-01-25",
-            "time": "7:30 PM",
-            "venue": "Wankhede Stadium",
-            "price": 1500,
-            "seatNumber": "55",
-            "row": "D",
-            "gate": "North",
-            "mood": "energetic"
-        }
-    }
-    
-    booking_data = sample_bookings.get(booking_id)
-    if not booking_data:
-        return jsonify(error="Booking not found"), 404
-    
     try:
-        # Create tickets directory if it doesn't exist
-        tickets_dir = ROOT / 'tickets'
-        tickets_dir.mkdir(exist_ok=True)
-        
-        # Generate filename
-        event_name = re.sub(r'[^\w\s-]', '', booking_data['eventTitle']).strip()
-        event_name = re.sub(r'[-\s]+', '_', event_name)
-        filename = f"{event_name}_ticket_{booking_id}.pdf"
-        filepath = tickets_dir / filename
-        
-        # Generate the standardized PDF ticket
-        success = ticket_generator.generate_standardized_ticket(booking_data, str(filepath))
-        
-        if not success:
-            return jsonify(error="Failed to generate ticket"), 500
-        
-        # Return the file for download
-        return send_file(
-            str(filepath),
-            as_attachment=True,
-            download_name=filename,
-            mimetype='application/pdf'
-        )
-        
+        return _send_ticket(booking_id)
     except Exception as e:
         logger.error(f"Error in download_ticket: {e}")
         return jsonify(error="Internal server error"), 500
 
 
+@app.post("/download_tickets/batch")
+def download_tickets_batch():
+    """
+    Start a batch render of the tickets (one per seat) of many bookings.
+    Body: { bookings: [ "<bookingId>" | {bookingId}, ... ], format: "zip" | "pdf" }
+    At most MAX_TICKET_BATCH bookings per request (413 above it).
+    Returns 202 with a job id; poll the status URL, then fetch the result URL.
+    """
+    if not PDF_GENERATION_AVAILABLE:
+        return jsonify(error="PDF generation not available"), 503
+    data = request.get_json(force=True) or {}
+    bookings = data.get("bookings")
+    fmt = (data.get("format") or "zip").lower()
+    if not isinstance(bookings, list) or not bookings:
+        return jsonify(error="bookings must be a non-empty list"), 400
+    if len(bookings) > MAX_TICKET_BATCH:
+        return jsonify(error=f"at most {MAX_TICKET_BATCH} bookings per batch"), 413
+    if fmt not in ("zip", "pdf"):
+        return jsonify(error="format must be zip or pdf"), 400
+    logger.info("HTTP POST /download_tickets/batch count=%d format=%s", len(bookings), fmt)
+    job = batch_renderer.submit(bookings, fmt)
+    return jsonify(
+        ok=True,
+        job_id=job.id,
+        status_url=f"/download_tickets/batch/{job.id}",
+        result_url=f"/download_tickets/batch/{job.id}/result",
+    ), 202
+
+
+@app.get("/download_tickets/batch/<job_id>")
+def download_tickets_batch_status(job_id: str):
+    job = batch_renderer.get(job_id)
+    if not job:
+        return jsonify(error="job not found"), 404
+    return jsonify(job.progress())
+
+
+@app.get("/download_tickets/batch/<job_id>/result")
+def download_tickets_batch_result(job_id: str):
+    job = batch_renderer.get(job_id)
+    if not job:
+        return jsonify(error="job not found"), 404
+    if job.status in ("queued", "running"):
+        return jsonify(error="job not finished", **job.progress()), 409
+    if job.format == "pdf":
+        document = job.document
+        if not document:
+            return jsonify(error="no tickets rendered", **job.progress()), 422
+        return send_file(io.BytesIO(document), as_attachment=True,
+                         download_name=f"tickets_{job.id}.pdf", mimetype="application/pdf")
+    if not job.rendered:
+        return jsonify(error="no tickets rendered", **job.progress()), 422
+    return app.response_class(
+        job.iter_zip(),
+        mimetype="application/zip",
+        headers={"Content-Disposition": f"attachment; filename=tickets_{job.id}.zip"},
+    )
+
+
+@app.post("/tickets/validate")
+def tickets_validate():
+    """
+    Gate scan: check the signed token from a ticket's QR/barcode and mark it used.
+    Body: { token: "<ticket_id>.<sig>", dry_run?: bool }
+    Requires the X-Gate-Key header (401 without it, 503 if GATE_API_KEY is unset).
+    200 admitted (or valid on dry_run), 409 already scanned / revoked,
+    404 unknown ticket, 403 bad signature.
+    """
+    if not GATE_API_KEY:
+        return jsonify(error="gate validation is not configured"), 503
+    if not hmac.compare_digest(request.headers.get("X-Gate-Key", "").encode(), GATE_API_KEY.encode()):
+        return jsonify(error="unauthorized"), 401
+    data = request.get_json(silent=True) or {}
+    token = str(data.get("token") or "")
+    if not token:
+        return jsonify(error="token is required"), 400
+    status, info = ticket_registry.validate(token, mark=not data.get("dry_run"))
+    logger.info("HTTP POST /tickets/validate status=%s", status)
+    code = {"admitted": 200, "valid": 200, "already_scanned": 409, "revoked": 409,
+            "unknown": 404, "invalid_signature": 403}[status]
+    return jsonify(ok=code == 200, status=status, **info), code
+
+
 @app.route("/ticket_success")
 def ticket_success():
     """
@@ -1391,4 +1367,9 @@ def ticket_success():
 
 
 if __name__ == "__main__":
+    if "--startup-report" in sys.argv:
+        # Measured in a fresh interpreter, so this process's own import
+        # does not count.
+        import startup_report
+        sys.exit(startup_report.main([a for a in sys.argv[1:] if a != "--startup-report"]))
     app.run(host="0.0.0.0", port=5000, debug=True)
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the native EventHub store and the hot Flask endpoints.
+
+Every benchmark runs a fixed, seeded workload and records per-operation
+latency (mean/p50/p99) and throughput. Results are written as JSON tagged
+with the git commit so two runs can be diffed:
+
+    python benchmarks/run.py                         # full run -> benchmarks/results/<commit>.json
+    python benchmarks/run.py --quick                 # smaller sizes for a smoke run
+    python benchmarks/run.py --only native.users     # name prefix filter
+    python benchmarks/run.py --compare old.json new.json
+
+Native tracing is switched off (EVENTHUB_TRACE=off) so the numbers measure
+the data structures, not the terminal.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+ROOT = Path(__file__).resolve().parents[1]
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+os.environ.setdefault("EVENTHUB_TRACE", "off")
+
+SEED = 1234
+REGRESSION_THRESHOLD = 0.10   # --compare flags p50 slowdowns above 10%
+
+BENCHMARKS: Dict[str, Callable[["Bench", argparse.Namespace], None]] = {}
+
+
+def benchmark(name: str):
+    def register(fn):
+        BENCHMARKS[name] = fn
+        return fn
+    return register
+
+
+class Bench:
+    """Collects timings for one named benchmark group."""
+
+    def __init__(self):
+        self.results: Dict[str, dict] = {}
+
+    def measure(self, name: str, op: Callable[..., object], args: Iterable[tuple]) -> dict:
+        """Run op(*a) for every a in `args`, timing each call."""
+        clock = time.perf_counter_ns
+        samples: List[int] = []
+        append = samples.append
+        started = clock()
+        for a in args:
+            t0 = clock()
+            op(*a)
+            append(clock() - t0)
+        wall = (clock() - started) / 1e9
+        samples.sort()
+        n = len(samples)
+        result = {
+            "n": n,
+            "wall_s": round(wall, 6),
+            "ops_per_s": round(n / wall, 1) if wall else None,
+            "mean_us": round(sum(samples) / n / 1000, 3) if n else None,
+            "p50_us": round(samples[n // 2] / 1000, 3) if n else None,
+            "p99_us": round(samples[min(n - 1, int(n * 0.99))] / 1000, 3) if n else None,
+            "max_us": round(samples[-1] / 1000, 3) if n else None,
+        }
+        self.results[name] = result
+        print(f"  {name:<40} n={n:<9} p50={result['p50_us']:>10}us p99={result['p99_us']:>10}us "
+              f"{result['ops_per_s']:>12} ops/s", flush=True)
+        return result
+
+
+# --- native store ---
+
+def _fresh_eventhub():
+    from scripts.eventhub_binding import EventHub
+    return EventHub()
+
+
+@benchmark("native.users")
+def bench_users(bench: Bench, opts) -> None:
+    eh = _fresh_eventhub()
+    n = opts.users
+    ids = [f"user{i}@bench.test" for i in range(n)]
+    bench.measure("native.users.register", eh.register_user, ((u, "h_pwd") for u in ids))
+    rnd = random.Random(SEED)
+    probes = [ids[rnd.randrange(n)] for _ in range(min(n, 200_000))]
+    bench.measure("native.users.login_hit", eh.login_user, ((u, "h_pwd") for u in probes))
+    bench.measure("native.users.login_miss", eh.login_user, ((f"nobody{i}", "x") for i in range(min(n, 50_000))))
+    eh.shutdown()
+
+
+@benchmark("native.events")
+def bench_events(bench: Bench, opts) -> None:
+    eh = _fresh_eventhub()
+    n = opts.events
+    cats = ("Movies", "Plays", "Sports", "Concerts")
+    ids = [f"E{i}" for i in range(n)]
+    bench.measure("native.events.add", eh.add_event,
+                  ((e, f"Event {i}", cats[i % 4], f"Venue {i % 97}", 500) for i, e in enumerate(ids)))
+    rnd = random.Random(SEED)
+    bench.measure("native.events.search", eh.search_event_json, ((ids[rnd.randrange(n)],) for _ in range(n)))
+    bench.measure("native.events.categories_tree", eh.list_categories_json, (() for _ in range(opts.repeat)))
+    bench.measure("native.events.capacity_bulk", eh.event_capacity, ((ids,) for _ in range(opts.repeat)))
+    bench.measure("native.events.delete", eh.delete_event, ((e,) for e in ids))
+    eh.shutdown()
+
+
+@benchmark("native.queue")
+def bench_queue(bench: Bench, opts) -> None:
+    eh = _fresh_eventhub()
+    n = opts.bookings
+    events = [f"Q{i}" for i in range(100)]
+    for e in events:
+        eh.add_event(e, e, "Concerts", "Arena", n)
+    rnd = random.Random(SEED)
+    bench.measure("native.queue.book", eh.book,
+                  ((f"u{i}", events[rnd.randrange(100)], 1 + rnd.randrange(4)) for i in range(n)))
+    bench.measure("native.queue.process_next", eh.process_next_booking_json, (() for _ in range(n)))
+    bench.measure("native.stack.cancel", eh.cancel,
+                  ((f"u{i}", events[rnd.randrange(100)], 1) for i in range(n)))
+    bench.measure("native.stack.drain_500", eh.drain_cancellations, ((500,) for _ in range(n // 500 + 1)))
+    eh.shutdown()
+
+
+@benchmark("native.graph")
+def bench_graph(bench: Bench, opts) -> None:
+    eh = _fresh_eventhub()
+    v = opts.venues
+    rnd = random.Random(SEED)
+    names = [f"V{i}" for i in range(v)]
+    for name in names:
+        eh.add_venue(name)
+    # connected backbone plus random chords, average degree ~8
+    edges = [(names[i], names[i + 1], 1 + rnd.randrange(20)) for i in range(v - 1)]
+    edges += [(names[rnd.randrange(v)], names[rnd.randrange(v)], 1 + rnd.randrange(50)) for _ in range(3 * v)]
+    bench.measure("native.graph.add_path", eh.add_path, edges)
+    pairs = [(names[rnd.randrange(v)], names[rnd.randrange(v)]) for _ in range(opts.repeat)]
+    bench.measure("native.graph.dijkstra", eh.shortest_path_json, pairs)
+    eh.shutdown()
+
+
+# --- Flask endpoints ---
+
+_client = None
+
+
+def _flask_client():
+    global _client
+    if _client is None:
+        tmp = tempfile.mkdtemp(prefix="eventhub-bench-")
+        os.environ.setdefault("BOOKING_LEDGER_DB", os.path.join(tmp, "bookings.sqlite3"))
+        os.environ.setdefault("EMAIL_OUTBOX_DB", os.path.join(tmp, "outbox.sqlite3"))
+        os.environ.setdefault("TICKET_REGISTRY_PATH", os.path.join(tmp, "registry.log"))
+        os.environ.setdefault("TRACE_LOG_PATH", os.path.join(tmp, "trace.ndjson"))
+        os.environ.setdefault("TICKET_SIGNING_KEY", "benchmark")
+        import app as app_module
+        _client = app_module.app.test_client()
+    return _client
+
+
+def _check(resp, expected=(200,)):
+    if resp.status_code not in expected:
+        raise RuntimeError(f"unexpected HTTP {resp.status_code}: {resp.get_data(as_text=True)[:200]}")
+    return resp
+
+
+@benchmark("http.catalog")
+def bench_http_catalog(bench: Bench, opts) -> None:
+    c = _flask_client()
+    n = opts.requests
+    bench.measure("http.events", lambda: _check(c.get("/events")), (() for _ in range(n)))
+    bench.measure("http.events_category", lambda: _check(c.get("/events?category=sports")), (() for _ in range(n)))
+    queries = ["rock", "mumbai", "hamlet", "concert", "zzz"]
+    bench.measure("http.api_search", lambda q: _check(c.get(f"/api/search?query={q}")),
+                  ((queries[i % len(queries)],) for i in range(n)))
+
+
+@benchmark("http.chatbot")
+def bench_http_chatbot(bench: Bench, opts) -> None:
+    c = _flask_client()
+    messages = ["something chill this weekend", "action movies in mumbai", "romantic plays",
+                "cricket match", "hello"]
+    bench.measure("http.chatbot", lambda m: _check(c.post("/chatbot", json={"message": m})),
+                  ((messages[i % len(messages)],) for i in range(opts.requests)))
+
+
+@benchmark("http.tickets")
+def bench_http_tickets(bench: Bench, opts) -> None:
+    from ticket_pdf import PDF_GENERATION_AVAILABLE
+    if not PDF_GENERATION_AVAILABLE:
+        print("  http.download_ticket skipped: reportlab not installed")
+        return
+    c = _flask_client()
+    import app as app_module
+    event = {"id": "bench-1", "name": "Benchmark Night", "category": "events", "date": "2025-02-01",
+             "time": "7:00 PM", "venue": "Bench Arena", "price": 500}
+    n = max(1, opts.requests // 10)
+    ids = [app_module.booking_ledger.record("bench@example.com", event, 1)["bookingId"] for _ in range(n)]
+    # distinct bookings: cold renders
+    bench.measure("http.download_ticket_cold", lambda b: _check(c.post("/download_ticket", json={"bookingId": b})),
+                  ((b,) for b in ids))
+    # same booking again: served from the ticket cache
+    bench.measure("http.download_ticket_cached", lambda: _check(c.post("/download_ticket", json={"bookingId": ids[0]})),
+                  (() for _ in range(n)))
+
+
+# --- driver ---
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True)
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run(opts) -> dict:
+    logging.disable(logging.INFO)   # request logging would dominate the HTTP numbers
+    bench = Bench()
+    for name, fn in BENCHMARKS.items():
+        if opts.only and not any(name.startswith(p) or p.startswith(name + ".") for p in opts.only):
+            continue
+        print(f"[{name}]", flush=True)
+        random.seed(SEED)
+        fn(bench, opts)
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "sizes": {k: getattr(opts, k) for k in ("users", "events", "bookings", "venues", "requests", "repeat")},
+        },
+        "results": bench.results,
+    }
+
+
+def compare(old_path: str, new_path: str, threshold: float = REGRESSION_THRESHOLD) -> int:
+    """Print the p50 change per benchmark; exit status 1 if any regressed."""
+    old = json.loads(Path(old_path).read_text())["results"]
+    new = json.loads(Path(new_path).read_text())["results"]
+    regressed = 0
+    for name in sorted(set(old) | set(new)):
+        a, b = old.get(name), new.get(name)
+        if not a or not b or not a.get("p50_us"):
+            print(f"{name:<40} {'only in ' + ('new' if b else 'old'):>30}")
+            continue
+        change = b["p50_us"] / a["p50_us"] - 1
+        flag = "REGRESSION" if change > threshold else ""
+        regressed += bool(flag)
+        print(f"{name:<40} {a['p50_us']:>10}us -> {b['p50_us']:>10}us {change:+8.1%} {flag}")
+    return 1 if regressed else 0
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description="EventHub benchmark suite")
+    p.add_argument("--quick", action="store_true", help="small sizes for a smoke run")
+    p.add_argument("--only", action="append", help="run benchmarks whose name starts with this (repeatable)")
+    p.add_argument("-o", "--output", help="results file (default benchmarks/results/<commit>.json)")
+    p.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="diff two result files and exit")
+    p.add_argument("--users", type=int)
+    p.add_argument("--events", type=int)
+    p.add_argument("--bookings", type=int)
+    p.add_argument("--venues", type=int)
+    p.add_argument("--requests", type=int)
+    p.add_argument("--repeat", type=int)
+    opts = p.parse_args(argv)
+    if opts.compare:
+        return compare(*opts.compare)
+
+    sizes = dict(users=1_000_000, events=100_000, bookings=200_000, venues=2_000, requests=500, repeat=1_000)
+    if opts.quick:
+        sizes = dict(users=20_000, events=5_000, bookings=10_000, venues=200, requests=50, repeat=100)
+    for k, v in sizes.items():
+        if getattr(opts, k) is None:
+            setattr(opts, k, v)
+
+    # The native module is built into / imported from the project root.
+    os.chdir(ROOT)
+    report = run(opts)
+    out = Path(opts.output) if opts.output else RESULTS_DIR / f"{report['meta']['commit'] or 'local'}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2, sort_keys=True))
+    print(f"results written to {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
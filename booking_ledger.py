@@ -0,0 +1,414 @@
+from __future__ import annotations
+
+import base64
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import logging
+logger = logging.getLogger("BookingLedger")
+if not logger.handlers:
+    h = logging.StreamHandler()
+    h.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    logger.addHandler(h)
+logger.setLevel(logging.INFO)
+
+ROOT = Path(__file__).resolve().parent
+LEDGER_DB = os.getenv("BOOKING_LEDGER_DB", str(ROOT / "bookings.sqlite3"))
+SEATS_PER_ROW = 20
+ID_ATTEMPTS = 5             # fresh booking ids tried before giving up
+
+# Native store category names -> ticket/frontend category keys.
+_CATEGORY_ALIASES = {"concerts": "events", "plays": "play"}
+
+# Column name -> booking dict key (the shape the frontend and ticket renderer use).
+_FIELDS = (
+    ("booking_id", "bookingId"),
+    ("user_id", "userId"),
+    ("event_id", "eventId"),
+    ("event_title", "eventTitle"),
+    ("category", "category"),
+    ("date", "date"),
+    ("time", "time"),
+    ("venue", "venue"),
+    ("tickets", "tickets"),
+    ("price", "price"),
+    ("total_amount", "totalAmount"),
+    ("status", "status"),
+    ("booking_date", "bookingDate"),
+    ("mood", "mood"),
+    ("description", "description"),
+    ("seat_number", "seatNumber"),
+    ("row", "row"),
+    ("gate", "gate"),
+)
+_COLUMNS = ", ".join(f'"{c}"' for c, _ in _FIELDS)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS bookings (
+    booking_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    event_id TEXT NOT NULL,
+    event_title TEXT NOT NULL,
+    category TEXT NOT NULL,
+    date TEXT,
+    time TEXT,
+    venue TEXT,
+    tickets INTEGER NOT NULL,
+    price REAL NOT NULL,
+    total_amount REAL NOT NULL,
+    status TEXT NOT NULL,
+    booking_date TEXT NOT NULL,
+    mood TEXT,
+    description TEXT,
+    seat_number TEXT,
+    "row" TEXT,
+    gate TEXT,
+    created REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS bookings_by_user ON bookings (user_id, created DESC, booking_id DESC);
+CREATE INDEX IF NOT EXISTS bookings_by_event ON bookings (event_id, status);
+CREATE TABLE IF NOT EXISTS refunds (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    booking_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    event_id TEXT NOT NULL,
+    amount REAL NOT NULL,
+    reason TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    job_id TEXT,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS refunds_by_status ON refunds (status, id);
+CREATE TABLE IF NOT EXISTS event_seats (
+    event_id TEXT PRIMARY KEY,
+    next_seat INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+# Demo bookings the frontend links to; inserted once into an empty ledger.
+SEED_BOOKINGS: List[Dict[str, Any]] = [
+    {
+        "bookingId": "BK001", "userId": "demo", "eventId": "1",
+        "eventTitle": "Avengers: Endgame", "category": "movies",
+        "date": "2025-01-15", "time": "7:00 PM", "venue": "PVR Cinemas, Phoenix Mall",
+        "tickets": 2, "totalAmount": 700, "status": "confirmed", "bookingDate": "2025-01-01",
+        "mood": "adventure",
+        "description": "The epic conclusion to the Infinity Saga that brings together all Marvel heroes for the ultimate battle.",
+        "price": 350, "seatNumber": "15", "row": "A", "gate": "Main",
+    },
+    {
+        "bookingId": "BK002", "userId": "demo", "eventId": "2",
+        "eventTitle": "Coldplay Live Concert", "category": "events",
+        "date": "2025-01-20", "time": "8:00 PM", "venue": "DY Patil Stadium",
+        "tickets": 1, "totalAmount": 2500, "status": "confirmed", "bookingDate": "2025-01-02",
+        "mood": "energetic",
+        "description": "Experience the magic of Coldplay live with their spectacular Music of the Spheres World Tour.",
+        "price": 2500, "seatNumber": "42", "row": "B", "gate": "East",
+    },
+    {
+        "bookingId": "BK003", "userId": "demo", "eventId": "3",
+        "eventTitle": "Romeo and Juliet", "category": "play",
+        "date": "2025-01-18", "time": "6:30 PM", "venue": "National Centre for Performing Arts",
+        "tickets": 2, "totalAmount": 1600, "status": "confirmed", "bookingDate": "2025-01-03",
+        "mood": "romantic",
+        "description": "Shakespeare's timeless love story brought to life with stunning performances and beautiful staging.",
+        "price": 800, "seatNumber": "04", "row": "K", "gate": "Main",
+    },
+    {
+        "bookingId": "BK004", "userId": "demo", "eventId": "4",
+        "eventTitle": "IPL Final Match", "category": "sports",
+        "date": "2025-01-25", "time": "7:30 PM", "venue": "Wankhede Stadium",
+        "tickets": 3, "totalAmount": 4500, "status": "confirmed", "bookingDate": "2025-01-04",
+        "mood": "energetic",
+        "description": "The ultimate cricket showdown between the top two teams of the season.",
+        "price": 1500, "seatNumber": "55", "row": "D", "gate": "North",
+    },
+]
+
+
+def normalize_user(user_id: str) -> str:
+    """Ledger key for a user; emails are case-insensitive."""
+    return str(user_id).strip().lower()
+
+
+def encode_cursor(created: float, booking_id: str) -> str:
+    raw = json.dumps([created, booking_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[float, str]:
+    """Inverse of encode_cursor; raises ValueError on a malformed cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created, booking_id = json.loads(raw)
+        return float(created), str(booking_id)
+    except Exception as e:
+        raise ValueError("invalid cursor") from e
+
+
+def seat_label(n: int) -> tuple:
+    """1-based seat sequence number -> (row letter, seat number)."""
+    row, seat = divmod(n - 1, SEATS_PER_ROW)
+    letters = ""
+    row += 1
+    while row:
+        row, rem = divmod(row - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters, f"{seat + 1:02d}"
+
+
+def seat_sequence(row: str, seat: str) -> int:
+    """Inverse of seat_label: (row letters, seat number) -> 1-based sequence number."""
+    n = 0
+    for ch in row.upper():
+        n = n * 26 + ord(ch) - 64
+    return (n - 1) * SEATS_PER_ROW + int(seat)
+
+
+def booking_seats(booking: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    One ticket per seat of a booking: the booking's fields with that seat's
+    row, seatNumber and 0-based seatIndex. A booking holds consecutive seats
+    from its first one; a partial cancellation gives up the highest indexes,
+    so the first `tickets` indexes are always the ones still held.
+    """
+    row, seat = booking.get("row"), booking.get("seatNumber")
+    first = seat_sequence(row, seat) if row and str(seat or "").isdigit() else None
+    seats = []
+    for i in range(int(booking.get("tickets") or 1)):
+        if i and first is not None:
+            row, seat = seat_label(first + i)
+        seats.append(dict(booking, row=row, seatNumber=seat, seatIndex=i))
+    return seats
+
+
+class BookingLedger:
+    """
+    Durable record of confirmed bookings.
+
+    Bookings are stored clustered by booking id (WITHOUT ROWID), so a detail
+    or ticket lookup is a single primary-key probe; a (user_id, created)
+    index serves per-user history without scanning other users' rows.
+    """
+
+    def __init__(self, db_path: str = LEDGER_DB, seed: bool = True):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._db().executescript(_SCHEMA)
+        if seed:
+            self._seed()
+
+    def _db(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _seed(self) -> None:
+        if self._db().execute("SELECT 1 FROM bookings LIMIT 1").fetchone():
+            return
+        now = time.time()
+        for i, b in enumerate(SEED_BOOKINGS):
+            self._insert(self._db(), b, now - len(SEED_BOOKINGS) + i, ignore=True)
+
+    @staticmethod
+    def _insert(db: sqlite3.Connection, booking: Dict[str, Any], created: float, ignore: bool = False) -> None:
+        db.execute(
+            f"INSERT {'OR IGNORE ' if ignore else ''}INTO bookings ({_COLUMNS}, created) "
+            f"VALUES ({', '.join('?' * len(_FIELDS))}, ?)",
+            [booking.get(key) for _, key in _FIELDS] + [created],
+        )
+
+    @staticmethod
+    def _row_to_booking(row) -> Dict[str, Any]:
+        booking = {key: row[i] for i, (_, key) in enumerate(_FIELDS)}
+        for key in ("price", "totalAmount"):
+            if isinstance(booking[key], float) and booking[key].is_integer():
+                booking[key] = int(booking[key])
+        return booking
+
+    def get(self, booking_id: str) -> Optional[Dict[str, Any]]:
+        row = self._db().execute(f"SELECT {_COLUMNS} FROM bookings WHERE booking_id = ?", (booking_id,)).fetchone()
+        return self._row_to_booking(row) if row else None
+
+    def record(self, user_id: str, event: Dict[str, Any], quantity: int, status: str = "confirmed") -> Dict[str, Any]:
+        """
+        Store a confirmed booking for `quantity` seats of `event` (catalog
+        shape: id, name, category, date, time, venue, price, ...). Seats are
+        allocated sequentially per event; the booking keeps its first seat.
+        """
+        db = self._db()
+        event_id = str(event.get("id"))
+        price = float(event.get("price") or 0)
+        category = (event.get("category") or "events").lower()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute("INSERT OR IGNORE INTO event_seats (event_id, next_seat) VALUES (?, 1)", (event_id,))
+            first = db.execute("SELECT next_seat FROM event_seats WHERE event_id = ?", (event_id,)).fetchone()[0]
+            db.execute("UPDATE event_seats SET next_seat = ? WHERE event_id = ?", (first + quantity, event_id))
+            row, seat = seat_label(first)
+            booking = {
+                "bookingId": None,
+                "userId": normalize_user(user_id),
+                "eventId": event_id,
+                "eventTitle": event.get("name") or event_id,
+                "category": _CATEGORY_ALIASES.get(category, category),
+                "date": event.get("date"),
+                "time": event.get("time"),
+                "venue": event.get("venue"),
+                "tickets": quantity,
+                "price": price,
+                "totalAmount": price * quantity,
+                "status": status,
+                "bookingDate": date.today().isoformat(),
+                "mood": event.get("mood"),
+                "description": event.get("description"),
+                "seatNumber": seat,
+                "row": row,
+                "gate": event.get("gate") or "Main",
+            }
+            # Ids are 40 random bits: on the rare collision draw another
+            # rather than touch the booking already holding it.
+            for attempt in range(ID_ATTEMPTS):
+                booking["bookingId"] = f"BK{uuid.uuid4().hex[:10].upper()}"
+                try:
+                    self._insert(db, booking, time.time())
+                    break
+                except sqlite3.IntegrityError:
+                    if attempt == ID_ATTEMPTS - 1:
+                        raise
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        logger.info("ledger recorded %s user=%s event=%s qty=%d seat=%s%s",
+                    booking["bookingId"], user_id, event_id, quantity, row, seat)
+        return self.get(booking["bookingId"])
+
+    def set_status(self, booking_id: str, status: str) -> bool:
+        cur = self._db().execute("UPDATE bookings SET status = ? WHERE booking_id = ?", (status, booking_id))
+        return cur.rowcount > 0
+
+    def held_tickets(self, user_id: str, event_id: str) -> int:
+        """Confirmed tickets `user_id` currently holds for `event_id`."""
+        row = self._db().execute(
+            "SELECT COALESCE(SUM(tickets), 0) FROM bookings WHERE user_id = ? AND event_id = ? AND status = 'confirmed'",
+            (normalize_user(user_id), str(event_id)),
+        ).fetchone()
+        return int(row[0])
+
+    def _cancel_locked(self, db: sqlite3.Connection, user_id: str, event_id: str, quantity: int) -> Dict[str, Any]:
+        """Cancel up to `quantity` of the user's confirmed tickets for the
+        event, newest booking first. Caller holds the write transaction."""
+        rows = db.execute(
+            "SELECT booking_id, tickets, price FROM bookings "
+            "WHERE user_id = ? AND event_id = ? AND status = 'confirmed' ORDER BY created DESC",
+            (normalize_user(user_id), str(event_id)),
+        ).fetchall()
+        remaining = quantity
+        cancelled = []
+        for booking_id, tickets, price in rows:
+            if remaining <= 0:
+                break
+            n = min(tickets, remaining)
+            if n == tickets:
+                db.execute("UPDATE bookings SET status = 'cancelled' WHERE booking_id = ?", (booking_id,))
+            else:
+                db.execute(
+                    "UPDATE bookings SET tickets = tickets - ?, total_amount = total_amount - ? WHERE booking_id = ?",
+                    (n, n * price, booking_id),
+                )
+            # Seats 0..remaining-1 stay with the booking; the rest are given up.
+            cancelled.append({"bookingId": booking_id, "quantity": n, "remaining": tickets - n, "refund": n * price})
+            remaining -= n
+        return {
+            "user": user_id,
+            "event": str(event_id),
+            "requested": quantity,
+            "cancelled": quantity - remaining,
+            "refund": sum(c["refund"] for c in cancelled),
+            "bookings": cancelled,
+        }
+
+    def cancel_batch(self, requests: List[Tuple[str, str, int]]) -> List[Dict[str, Any]]:
+        """
+        Apply many (user_id, event_id, quantity) cancellations in one write
+        transaction. Each is validated against what the user actually holds:
+        only held tickets are cancelled, the rest of the request is rejected.
+        """
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            results = [self._cancel_locked(db, u, e, int(q)) for u, e, q in requests]
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        return results
+
+    def cancel_event_batch(self, event_id: str, after: str = "", limit: int = 1000,
+                           reason: str = "event cancelled", job_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Cancel the next `limit` confirmed bookings of an event (booking id
+        order, after `after`) and write a pending refund record for each, in
+        one transaction. Returns the cancelled bookings; an empty list means
+        the event has none left. Safe to resume: already cancelled bookings
+        are never picked up again.
+        """
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            rows = db.execute(
+                f"SELECT {_COLUMNS} FROM bookings WHERE event_id = ? AND status = 'confirmed' AND booking_id > ? "
+                "ORDER BY booking_id LIMIT ?",
+                (str(event_id), after, limit),
+            ).fetchall()
+            if rows:
+                ids = [(r[0],) for r in rows]
+                db.executemany("UPDATE bookings SET status = 'cancelled' WHERE booking_id = ?", ids)
+                now = time.time()
+                db.executemany(
+                    "INSERT INTO refunds (booking_id, user_id, event_id, amount, reason, job_id, created) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(r[0], r[1], r[2], r[10], reason, job_id, now) for r in rows],
+                )
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        return [self._row_to_booking(r) for r in rows]
+
+    def list_for_user(self, user_id: str, limit: int = 20, cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        One page of a user's bookings, newest first, and the cursor for the
+        next page (None on the last page). Keyset pagination on the
+        (user_id, created, booking_id) index: every page is an index range
+        scan of `limit` rows, however deep the user pages.
+        """
+        params: list = [normalize_user(user_id)]
+        where = "user_id = ?"
+        if cursor:
+            created, booking_id = decode_cursor(cursor)
+            where += " AND (created, booking_id) < (?, ?)"
+            params += [created, booking_id]
+        rows = self._db().execute(
+            f"SELECT {_COLUMNS}, created FROM bookings WHERE {where} "
+            "ORDER BY created DESC, booking_id DESC LIMIT ?",
+            params + [limit + 1],
+        ).fetchall()
+        page = rows[:limit]
+        next_cursor = None
+        if len(rows) > limit:
+            last = page[-1]
+            next_cursor = encode_cursor(last[-1], last[0])
+        return [self._row_to_booking(r) for r in page], next_cursor
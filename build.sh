@@ -8,9 +8,12 @@ apt-get update && apt-get install -y gcc || true
 pip install --upgrade pip
 pip install -r requirements.txt
 
-# Try to compile C backend, but don't fail if it doesn't work
-echo "Attempting to compile C backend..."
-python -c "from scripts.eventhub_binding import _build_module; _build_module()" || echo "Warning: C backend compilation failed, will run in fallback mode"
+# Compile the C backend ahead of time. Workers start with
+# EVENTHUB_BUILD_ON_IMPORT=0 and refuse to boot without it, so a failed
+# compile has to fail the deploy here rather than at the first request.
+echo "Compiling C backend..."
+python scripts/eventhub_binding.py build || { echo "Error: C backend compilation failed"; exit 1; }
+python scripts/eventhub_binding.py check || exit 1
 
 # Create tickets directory
 mkdir -p tickets
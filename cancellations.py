@@ -0,0 +1,268 @@
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional
+
+from booking_ledger import LEDGER_DB
+
+import logging
+logger = logging.getLogger("Cancellations")
+if not logger.handlers:
+    h = logging.StreamHandler()
+    h.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    logger.addHandler(h)
+logger.setLevel(logging.INFO)
+
+CANCEL_BATCH = int(os.getenv("CANCEL_BATCH", "500"))
+EVENT_CANCEL_BATCH = int(os.getenv("EVENT_CANCEL_BATCH", "1000"))
+MAX_JOBS = 64
+
+# Job progress is kept next to the ledger, so any worker process can report
+# on a job another one is running.
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS event_cancellation_jobs (
+    job_id TEXT PRIMARY KEY,
+    created REAL NOT NULL,
+    state TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS event_cancellation_jobs_by_created ON event_cancellation_jobs (created);
+"""
+
+
+class EventCancellationJob:
+    """Progress of one event-wide cancellation running on a background thread."""
+
+    def __init__(self, event_id: str, delete: bool):
+        self.id = uuid.uuid4().hex
+        self.event_id = event_id
+        self.delete = delete
+        self.status = "queued"
+        self.purged: Dict[str, int] = {}
+        self.bookings = 0
+        self.tickets = 0
+        self.refund_total = 0.0
+        self.notified = 0
+        # Booking requests the purge dropped unfilled; told on the job thread.
+        self.unfilled: List[dict] = []
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.finished: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def progress(self) -> dict:
+        with self._lock:
+            return {
+                "job_id": self.id,
+                "event": self.event_id,
+                "deleted": self.delete,
+                "status": self.status,
+                "purged": dict(self.purged),
+                "bookings": self.bookings,
+                "tickets": self.tickets,
+                "refund_total": self.refund_total,
+                "notified": self.notified,
+                "error": self.error,
+                "elapsed": round((self.finished or time.time()) - self.created, 3),
+            }
+
+    def _state(self) -> str:
+        state = self.progress()
+        del state["elapsed"]
+        state.update(created=self.created, finished=self.finished)
+        return json.dumps(state)
+
+    @classmethod
+    def _from_state(cls, state: str) -> "EventCancellationJob":
+        state = json.loads(state)
+        job = cls(state["event"], state["deleted"])
+        job.id = state["job_id"]
+        for name in ("status", "purged", "bookings", "tickets", "refund_total", "notified", "error",
+                     "created", "finished"):
+            setattr(job, name, state[name])
+        return job
+
+
+class CancellationEngine:
+    """
+    Applies cancellation requests queued in the native store.
+
+    A run drains up to `max_items` requests in one native call, validates
+    them all against the booking ledger in a single transaction (a user can
+    only cancel tickets they hold), then returns capacity with one native
+    release per event rather than one per request. Released seats promote
+    waitlisted requests natively; those are recorded in the ledger here.
+    """
+
+    def __init__(self, eh, ledger, notify: Optional[Callable[[List[dict]], int]] = None,
+                 find_event: Optional[Callable[[str], Optional[dict]]] = None,
+                 on_booked: Optional[Callable[[dict], None]] = None,
+                 on_cancelled: Optional[Callable[[str, range], None]] = None,
+                 db_path: str = LEDGER_DB):
+        self.eh = eh
+        self.ledger = ledger
+        self.notify = notify
+        self.find_event = find_event
+        # Called with each booking recorded from the waitlist (tickets, email).
+        self.on_booked = on_booked
+        # Called with a booking id and the seat indexes it gave up (tickets).
+        self.on_cancelled = on_cancelled
+        # Drain + ledger + release must not interleave with another run.
+        self._lock = threading.Lock()
+        self.db_path = db_path
+        self._local = threading.local()
+        self._db().executescript(_SCHEMA)
+
+    def _db(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def process(self, max_items: int = CANCEL_BATCH) -> Dict[str, Any]:
+        with self._lock:
+            items = self.eh.drain_cancellations(max_items)
+            if not items:
+                return {"status": "empty", "message": "No cancellations to process", "processed": 0}
+            try:
+                results = self.ledger.cancel_batch([(i["user"], i["event"], i["quantity"]) for i in items])
+            except Exception:
+                # Drained natively but not applied: push them back (oldest
+                # first, so the stack order is unchanged) for the next run.
+                for i in items:
+                    self.eh.cancel(i["user"], i["event"], int(i["quantity"]))
+                logger.error("cancellations: ledger rejected a batch of %d, requeued", len(items))
+                raise
+            released: Dict[str, int] = defaultdict(int)
+            for r in results:
+                if r["cancelled"]:
+                    released[r["event"]] += r["cancelled"]
+            available = {event: self.eh.release_tickets(event, qty) for event, qty in released.items()}
+            promoted = self._record_promotions()
+        if self.on_cancelled:
+            for r in results:
+                for c in r["bookings"]:
+                    self.on_cancelled(c["bookingId"], range(c["remaining"], c["remaining"] + c["quantity"]))
+        rejected = sum(1 for r in results if r["cancelled"] < r["requested"])
+        logger.info("cancellations: processed %d, released %d ticket(s) over %d event(s), %d rejected, %d promoted",
+                    len(results), sum(released.values()), len(released), rejected, len(promoted))
+        return {
+            "status": "ok",
+            "processed": len(results),
+            "rejected": rejected,
+            "released": dict(released),
+            "available": available,
+            "refund_total": sum(r["refund"] for r in results),
+            "results": results,
+            "promoted": promoted,
+        }
+
+    def _record_promotions(self) -> List[dict]:
+        """Store waitlisted requests the native store confirmed after seats
+        were released. Caller holds self._lock."""
+        bookings = []
+        events: Dict[str, dict] = {}
+        for p in self.eh.drain_promotions():
+            event_id = p["event"]
+            if event_id not in events:
+                events[event_id] = (self.find_event(event_id) if self.find_event else None) or {"id": event_id}
+            booking = self.ledger.record(p["user"], events[event_id], int(p["quantity"]))
+            if self.on_booked:
+                self.on_booked(booking)
+            bookings.append(booking)
+        return bookings
+
+    # --- event-wide cancellation ---
+
+    def get_job(self, job_id: str) -> Optional[EventCancellationJob]:
+        row = self._db().execute("SELECT state FROM event_cancellation_jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return EventCancellationJob._from_state(row[0]) if row else None
+
+    def _save_job(self, job: EventCancellationJob) -> None:
+        self._db().execute("UPDATE event_cancellation_jobs SET state = ? WHERE job_id = ?", (job._state(), job.id))
+
+    def cancel_event(self, event_id: str, delete: bool = False) -> EventCancellationJob:
+        """
+        Call off an event. It is closed to new bookings and its queued
+        booking/cancellation and waitlisted requests are purged from the
+        native store right away (one pass); its bookings are then cancelled
+        on a background thread in ledger batches, each batch writing refund
+        records and queueing notices in one transaction. Users whose requests
+        were purged get the same notice. With `delete`, the native event is
+        removed after the purge; otherwise it stays listed as closed, its
+        seats off sale.
+        """
+        job = EventCancellationJob(str(event_id), delete)
+        event = (self.find_event(job.event_id) if self.find_event else None) or {"id": job.event_id}
+        # Purge first: if it raises there is no job left behind as "queued".
+        with self._lock:
+            if not delete:
+                self.eh.close_event(job.event_id)
+            purged = self.eh.purge_event_requests(job.event_id)
+            if delete:
+                self.eh.delete_event(job.event_id)
+        job.unfilled = [{
+            "userId": r["user"],
+            "eventTitle": event.get("name") or job.event_id,
+            "date": event.get("date"),
+            "tickets": r["quantity"],
+            "totalAmount": 0,
+        } for r in purged.pop("requests", [])]
+        job.purged = purged
+        job.status = "running"
+        db = self._db()
+        db.execute("INSERT INTO event_cancellation_jobs (job_id, created, state) VALUES (?, ?, ?)",
+                   (job.id, job.created, job._state()))
+        db.execute("DELETE FROM event_cancellation_jobs WHERE job_id NOT IN "
+                   "(SELECT job_id FROM event_cancellation_jobs ORDER BY created DESC LIMIT ?)", (MAX_JOBS,))
+        threading.Thread(target=self._run_event_job, args=(job,), name=f"event-cancel-{job.id[:8]}",
+                         daemon=True).start()
+        return job
+
+    def _run_event_job(self, job: EventCancellationJob) -> None:
+        after = ""
+        try:
+            if self.notify and job.unfilled:
+                notified = self.notify(job.unfilled)
+                with job._lock:
+                    job.notified += notified
+                self._save_job(job)
+            while True:
+                batch = self.ledger.cancel_event_batch(job.event_id, after, EVENT_CANCEL_BATCH, job_id=job.id)
+                if not batch:
+                    break
+                after = batch[-1]["bookingId"]
+                tickets = sum(b["tickets"] for b in batch)
+                if self.on_cancelled:
+                    for b in batch:
+                        self.on_cancelled(b["bookingId"], range(b["tickets"]))
+                notified = self.notify(batch) if self.notify else 0
+                with job._lock:
+                    job.bookings += len(batch)
+                    job.tickets += tickets
+                    job.refund_total += sum(b["totalAmount"] or 0 for b in batch)
+                    job.notified += notified
+                self._save_job(job)
+            status = "done"
+        except Exception as e:
+            logger.error("event cancellation %s for %s failed: %s", job.id, job.event_id, e)
+            with job._lock:
+                job.error = str(e)
+            status = "failed"
+        with job._lock:
+            job.status = status
+            job.finished = time.time()
+        try:
+            self._save_job(job)
+        except sqlite3.Error as e:
+            logger.error("event cancellation %s: saving its final state failed: %s", job.id, e)
+        logger.info("event cancellation %s for %s %s: %d booking(s), %d notice(s)",
+                    job.id, job.event_id, status, job.bookings, job.notified)
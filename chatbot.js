@@ -236,7 +236,7 @@ class EventMateAI {
             eventsHTML += `
                 <div class="event-card" data-event-id="${event.id}">
                     <div class="event-image">
-                        <img src="${event.image_url}" alt="${event.name}" onerror="this.src='/static/images/placeholder.svg'">
+                        <img src="${event.thumbnail_url || event.image_url}" loading="lazy" alt="${event.name}" onerror="this.src='/static/images/placeholder.svg'">
                     </div>
                     <div class="event-details">
                         <h5>${event.name}</h5>
@@ -0,0 +1,327 @@
+from __future__ import annotations
+
+import json
+import os
+import random
+import smtplib
+import sqlite3
+import threading
+import time
+from email.message import EmailMessage
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import logging
+logger = logging.getLogger("EmailOutbox")
+if not logger.handlers:
+    h = logging.StreamHandler()
+    h.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    logger.addHandler(h)
+logger.setLevel(logging.INFO)
+
+ROOT = Path(__file__).resolve().parent
+OUTBOX_DB = os.getenv("EMAIL_OUTBOX_DB", str(ROOT / "email_outbox.sqlite3"))
+OUTBOX_WORKERS = int(os.getenv("EMAIL_OUTBOX_WORKERS", "2"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("EMAIL_OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_BATCH = 20            # messages claimed per round trip, sent over one connection
+RETRY_BASE_SECONDS = 5.0
+RETRY_MAX_SECONDS = 3600.0
+LEASE_SECONDS = 300.0        # a claimed message is re-queued if its sender dies
+IDLE_POLL_SECONDS = 2.0
+SMTP_IDLE_SECONDS = 60.0     # probe a pooled connection with NOOP after this long
+SMTP_TIMEOUT = 30.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    to_addr TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    html TEXT NOT NULL,
+    attachments TEXT NOT NULL DEFAULT '[]',
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL,
+    lease_until REAL NOT NULL DEFAULT 0,
+    last_error TEXT,
+    created REAL NOT NULL,
+    sent_at REAL
+);
+CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt);
+"""
+
+
+def _is_permanent(exc: Exception) -> bool:
+    """5xx replies are permanent (retrying will not help); 4xx and
+    connection errors are transient. Bad credentials are retried so a
+    fixed config can drain the queue."""
+    if isinstance(exc, smtplib.SMTPAuthenticationError):
+        return False
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return all(500 <= code < 600 for code, _ in exc.recipients.values())
+    code = getattr(exc, "smtp_code", None)
+    return isinstance(code, int) and 500 <= code < 600
+
+
+def backoff_delay(attempts: int) -> float:
+    """Exponential backoff with jitter for the n-th failed attempt (1-based)."""
+    delay = min(RETRY_BASE_SECONDS * (2 ** (attempts - 1)), RETRY_MAX_SECONDS)
+    return delay * (0.5 + random.random() / 2)
+
+
+class _SmtpSession:
+    """One authenticated SMTP connection, kept open and reused by a worker."""
+
+    def __init__(self, outbox: "EmailOutbox"):
+        self.outbox = outbox
+        self.conn: Optional[smtplib.SMTP] = None
+        self.last_used = 0.0
+
+    def _connect(self) -> smtplib.SMTP:
+        o = self.outbox
+        conn = o.smtp_factory(o.host, o.port, timeout=SMTP_TIMEOUT)
+        if o.starttls:
+            conn.starttls()
+        if o.username:
+            conn.login(o.username, o.password or "")
+        return conn
+
+    def _ensure(self) -> smtplib.SMTP:
+        if self.conn is not None and time.monotonic() - self.last_used > SMTP_IDLE_SECONDS:
+            try:
+                if self.conn.noop()[0] != 250:
+                    self.close()
+            except smtplib.SMTPException:
+                self.close()
+            except OSError:
+                self.close()
+        if self.conn is None:
+            self.conn = self._connect()
+        return self.conn
+
+    def send(self, msg: EmailMessage) -> None:
+        try:
+            self._ensure().send_message(msg)
+        except (smtplib.SMTPServerDisconnected, ConnectionError):
+            # The server dropped a pooled connection; one fresh attempt.
+            self.close()
+            self._ensure().send_message(msg)
+        self.last_used = time.monotonic()
+
+    def close(self) -> None:
+        if self.conn is not None:
+            try:
+                self.conn.quit()
+            except Exception:
+                pass
+            self.conn = None
+
+
+class EmailOutbox:
+    """
+    Persistent email queue with a small pool of sender threads.
+
+    enqueue() is a single SQLite insert, so request handlers never wait on
+    SMTP. Workers claim due messages in batches (a lease makes claims safe
+    across processes sharing the database), send them over a pooled
+    connection, and reschedule failures with exponential backoff.
+    """
+
+    def __init__(
+        self,
+        db_path: str = OUTBOX_DB,
+        host: str = "localhost",
+        port: int = 25,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        starttls: bool = False,
+        sender: str = "noreply@eventhub.com",
+        workers: int = OUTBOX_WORKERS,
+        max_attempts: int = OUTBOX_MAX_ATTEMPTS,
+        smtp_factory: Callable[..., smtplib.SMTP] = smtplib.SMTP,
+        attachment_loader: Optional[Callable[[dict], Tuple[str, bytes]]] = None,
+    ):
+        self.db_path = db_path
+        self.host, self.port = host, port
+        self.username, self.password = username, password
+        self.starttls = starttls
+        self.sender = sender
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.smtp_factory = smtp_factory
+        # Resolves a stored attachment reference to (filename, pdf bytes) at
+        # send time, so the queue holds references rather than PDF blobs.
+        self.attachment_loader = attachment_loader
+        self._local = threading.local()
+        self._wake = threading.Condition()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._start_lock = threading.Lock()
+        self._db().executescript(_SCHEMA)
+        self._migrate()
+
+    # --- storage ---
+
+    def _db(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _migrate(self) -> None:
+        cols = {row[1] for row in self._db().execute("PRAGMA table_info(outbox)")}
+        if "attachments" not in cols:
+            self._db().execute("ALTER TABLE outbox ADD COLUMN attachments TEXT NOT NULL DEFAULT '[]'")
+
+    def enqueue(self, to_addr: str, subject: str, html: str, attachments: Optional[List[dict]] = None) -> int:
+        """Queue a message for delivery and return its outbox id.
+        `attachments` are JSON-serializable references handed to
+        attachment_loader when the message is sent."""
+        now = time.time()
+        cur = self._db().execute(
+            "INSERT INTO outbox (to_addr, subject, html, attachments, next_attempt, created) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (to_addr, subject, html, json.dumps(attachments or [], default=str), now, now),
+        )
+        self.start()
+        with self._wake:
+            self._wake.notify()
+        return cur.lastrowid
+
+    def enqueue_many(self, messages: List[Tuple[str, str, str]]) -> int:
+        """Queue many (to_addr, subject, html) messages in one transaction."""
+        if not messages:
+            return 0
+        now = time.time()
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.executemany(
+                "INSERT INTO outbox (to_addr, subject, html, next_attempt, created) VALUES (?, ?, ?, ?, ?)",
+                [(to_addr, subject, html, now, now) for to_addr, subject, html in messages],
+            )
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        self.start()
+        with self._wake:
+            self._wake.notify_all()
+        return len(messages)
+
+    def _claim(self, limit: int = OUTBOX_BATCH) -> List[tuple]:
+        now = time.time()
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            rows = db.execute(
+                "SELECT id, to_addr, subject, html, attachments, attempts FROM outbox "
+                "WHERE (status = 'queued' AND next_attempt <= ?) OR (status = 'sending' AND lease_until < ?) "
+                "ORDER BY next_attempt LIMIT ?",
+                (now, now, limit),
+            ).fetchall()
+            if rows:
+                db.executemany(
+                    "UPDATE outbox SET status = 'sending', lease_until = ?, attempts = attempts + 1 WHERE id = ?",
+                    [(now + LEASE_SECONDS, r[0]) for r in rows],
+                )
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        return rows
+
+    def _mark_sent(self, msg_id: int) -> None:
+        self._db().execute("UPDATE outbox SET status = 'sent', sent_at = ?, last_error = NULL WHERE id = ?",
+                           (time.time(), msg_id))
+
+    def _mark_failed(self, msg_id: int, attempts: int, error: str, permanent: bool) -> None:
+        if permanent or attempts >= self.max_attempts:
+            self._db().execute("UPDATE outbox SET status = 'failed', last_error = ? WHERE id = ?", (error, msg_id))
+            logger.error("email %d failed permanently after %d attempt(s): %s", msg_id, attempts, error)
+        else:
+            delay = backoff_delay(attempts)
+            self._db().execute(
+                "UPDATE outbox SET status = 'queued', next_attempt = ?, last_error = ? WHERE id = ?",
+                (time.time() + delay, error, msg_id),
+            )
+            logger.warning("email %d attempt %d failed (%s), retrying in %.0fs", msg_id, attempts, error, delay)
+
+    def stats(self) -> Dict[str, int]:
+        rows = self._db().execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    # --- delivery ---
+
+    def build_message(self, to_addr: str, subject: str, html: str, attachments: List[dict] = ()) -> EmailMessage:
+        msg = EmailMessage()
+        msg["From"] = f"Event Hub <{self.sender}>"
+        msg["To"] = to_addr
+        msg["Subject"] = subject
+        msg.set_content("This message requires an HTML-capable email client.")
+        msg.add_alternative(html, subtype="html")
+        if attachments and self.attachment_loader is None:
+            raise RuntimeError("message has attachments but no attachment_loader is configured")
+        for ref in attachments:
+            filename, data = self.attachment_loader(ref)
+            msg.add_attachment(data, maintype="application", subtype="pdf", filename=filename)
+        return msg
+
+    def _deliver(self, session: _SmtpSession, rows: List[tuple]) -> None:
+        for msg_id, to_addr, subject, html, attachments, attempts in rows:
+            attempts += 1
+            try:
+                msg = self.build_message(to_addr, subject, html, json.loads(attachments))
+            except Exception as e:
+                self._mark_failed(msg_id, attempts, f"attachment: {e}", False)
+                continue
+            try:
+                session.send(msg)
+            except Exception as e:
+                if not _is_permanent(e):
+                    # Connection state is unknown after a transient error.
+                    session.close()
+                self._mark_failed(msg_id, attempts, f"{e.__class__.__name__}: {e}", _is_permanent(e))
+                continue
+            self._mark_sent(msg_id)
+            logger.info("email %d sent to %s", msg_id, to_addr)
+
+    def _worker(self) -> None:
+        session = _SmtpSession(self)
+        try:
+            while not self._stop.is_set():
+                try:
+                    rows = self._claim()
+                except sqlite3.Error as e:
+                    logger.warning("outbox claim failed: %s", e)
+                    rows = []
+                if rows:
+                    self._deliver(session, rows)
+                    continue
+                with self._wake:
+                    self._wake.wait(IDLE_POLL_SECONDS)
+        finally:
+            session.close()
+
+    def start(self) -> None:
+        """Start the sender threads (idempotent)."""
+        if self._threads:
+            return
+        with self._start_lock:
+            if self._threads:
+                return
+            self._stop.clear()
+            for i in range(self.workers):
+                t = threading.Thread(target=self._worker, name=f"email-outbox-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        with self._wake:
+            self._wake.notify_all()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
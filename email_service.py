@@ -1,11 +1,13 @@
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 from datetime import datetime
+from html import escape
+from string import Template
+from typing import List, Optional
 import os
 from dotenv import load_dotenv
 import logging
 
+from email_outbox import EmailOutbox
+
 # Set up logging
 logger = logging.getLogger("EmailService")
 if not logger.handlers:
@@ -18,48 +20,28 @@ logger.setLevel(logging.INFO)
 load_dotenv()
 
 # Email configuration
-SMTP_SERVER = "smtp.gmail.com"
-SMTP_PORT = 587
+SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "1") != "0"
 SMTP_USERNAME = os.getenv("SMTP_USERNAME")
 SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
 SENDER_EMAIL = os.getenv("SENDER_EMAIL", "noreply@eventhub.com")
 
-def send_booking_confirmation(user_email: str, user_name: str, event: dict, booking_details: dict) -> bool:
-    """
-    Send booking confirmation email with ticket details
-    
-    Args:
-        user_email: Email address of the user
-        user_name: Full name of the user
-        event: Dictionary containing event details
-        booking_details: Dictionary containing booking details
-        
-    Returns:
-        bool: True if email was sent successfully, False otherwise
-    """
-    try:
-        # Create message container
-        msg = MIMEMultipart()
-        msg['From'] = f"Event Hub <{SENDER_EMAIL}>"
-        msg['To'] = user_email
-        msg['Subject'] = f"🎟️ Your Tickets for {event['name']} | Event Hub"
-
-        # Format event date
-        event_date = datetime.strptime(event['date'], "%Y-%m-%d").strftime("%B %d, %Y")
-        
-        # Create HTML email content
-        html = f"""
+# Compiled once at import; only the per-booking fields are substituted per email.
+_STYLE = """
+                body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+                .container { max-width: 600px; margin: 0 auto; padding: 20px; }
+                .header { background-color: #4a6baf; color: white; padding: 20px; text-align: center; border-radius: 5px 5px 0 0; }
+                .content { padding: 20px; border: 1px solid #ddd; border-top: none; border-radius: 0 0 5px 5px; }
+                .ticket { border: 1px solid #ddd; padding: 15px; margin: 15px 0; border-radius: 5px; background-color: #f9f9f9; }
+                .footer { margin-top: 20px; font-size: 12px; color: #777; text-align: center; }
+                .button { display: inline-block; padding: 10px 20px; background-color: #4a6baf; color: white; text-decoration: none; border-radius: 5px; margin: 10px 0; }
+"""
+
+BOOKING_CONFIRMATION_TEMPLATE = Template("""
         <html>
         <head>
-            <style>
-                body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                .header {{ background-color: #4a6baf; color: white; padding: 20px; text-align: center; border-radius: 5px 5px 0 0; }}
-                .content {{ padding: 20px; border: 1px solid #ddd; border-top: none; border-radius: 0 0 5px 5px; }}
-                .ticket {{ border: 1px solid #ddd; padding: 15px; margin: 15px 0; border-radius: 5px; background-color: #f9f9f9; }}
-                .footer {{ margin-top: 20px; font-size: 12px; color: #777; text-align: center; }}
-                .button {{ display: inline-block; padding: 10px 20px; background-color: #4a6baf; color: white; text-decoration: none; border-radius: 5px; margin: 10px 0; }}
-            </style>
+            <style>""" + _STYLE + """            </style>
         </head>
         <body>
             <div class="container">
@@ -67,46 +49,166 @@ def send_booking_confirmation(user_email: str, user_name: str, event: dict, book
                     <h1>🎉 Booking Confirmed!</h1>
                 </div>
                 <div class="content">
-                    <p>Hello {user_name},</p>
-                    <p>Thank you for booking with Event Hub! Your tickets for <strong>{event['name']}</strong> are confirmed.</p>
-                    
+                    <p>Hello $user_name,</p>
+                    <p>Thank you for booking with Event Hub! Your tickets for <strong>$event_name</strong> are confirmed.</p>
+
                     <div class="ticket">
-                        <h2>🎟️ {event['name']}</h2>
-                        <p><strong>📅 Date:</strong> {event_date} at {event['time']}</p>
-                        <p><strong>📍 Venue:</strong> {event['venue']}</p>
-                        <p><strong>🎫 Tickets:</strong> {booking_details['ticket_count']} x {booking_details['ticket_type']}</p>
-                        <p><strong>💰 Total Paid:</strong> ₹{booking_details['total_amount']}</p>
-                        <p><strong>🔖 Booking ID:</strong> {booking_details['booking_id']}</p>
+                        <h2>🎟️ $event_name</h2>
+                        <p><strong>📅 Date:</strong> $event_date at $event_time</p>
+                        <p><strong>📍 Venue:</strong> $venue</p>
+                        <p><strong>🎫 Tickets:</strong> $ticket_count x $ticket_type</p>
+                        <p><strong>💰 Total Paid:</strong> ₹$total_amount</p>
+                        <p><strong>🔖 Booking ID:</strong> $booking_id</p>
                     </div>
-                    
+
                     <p>Your tickets are attached to this email. You can also download them from your account.</p>
-                    
+
                     <p>We look forward to seeing you at the event!</p>
-                    
+
                     <p>Best regards,<br>The Event Hub Team</p>
-                    
+
                     <div class="footer">
-                        <p>© {datetime.now().year} Event Hub. All rights reserved.</p>
+                        <p>© $year Event Hub. All rights reserved.</p>
                         <p>This is an automated message, please do not reply directly to this email.</p>
                     </div>
                 </div>
             </div>
         </body>
         </html>
-        """
-
-        # Attach HTML content
-        msg.attach(MIMEText(html, 'html'))
-
-        # Connect to SMTP server and send email
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.starttls()
-            server.login(SMTP_USERNAME, SMTP_PASSWORD)
-            server.send_message(msg)
-            
-        logger.info(f"Booking confirmation email sent to {user_email}")
+        """)
+
+EVENT_CANCELLED_TEMPLATE = Template("""
+        <html>
+        <head>
+            <style>""" + _STYLE + """            </style>
+        </head>
+        <body>
+            <div class="container">
+                <div class="header">
+                    <h1>Event Cancelled</h1>
+                </div>
+                <div class="content">
+                    <p>Hello,</p>
+                    <p>We're sorry: <strong>$event_name</strong> on $event_date has been cancelled.</p>
+
+                    <div class="ticket">
+                        <p><strong>🔖 Booking ID:</strong> $booking_id</p>
+                        <p><strong>🎫 Tickets:</strong> $ticket_count</p>
+                        <p><strong>💰 Refund:</strong> ₹$refund</p>
+                    </div>
+
+                    <p>$refund_note</p>
+
+                    <p>Best regards,<br>The Event Hub Team</p>
+
+                    <div class="footer">
+                        <p>© $year Event Hub. All rights reserved.</p>
+                        <p>This is an automated message, please do not reply directly to this email.</p>
+                    </div>
+                </div>
+            </div>
+        </body>
+        </html>
+        """)
+
+# Shared outbox; the app starts its sender threads at startup.
+outbox = EmailOutbox(
+    host=SMTP_SERVER,
+    port=SMTP_PORT,
+    username=SMTP_USERNAME,
+    password=SMTP_PASSWORD,
+    starttls=SMTP_STARTTLS,
+    sender=SENDER_EMAIL,
+)
+
+
+def render_booking_confirmation(user_name: str, event: dict, booking_details: dict) -> str:
+    event_date = (datetime.strptime(event['date'], "%Y-%m-%d").strftime("%B %d, %Y")
+                  if event.get('date') else "To be announced")
+    fields = {
+        "user_name": user_name,
+        "event_name": event['name'],
+        "event_date": event_date,
+        "event_time": event.get('time') or "TBA",
+        "venue": event.get('venue') or "TBA",
+        "ticket_count": booking_details['ticket_count'],
+        "ticket_type": booking_details['ticket_type'],
+        "total_amount": booking_details['total_amount'],
+        "booking_id": booking_details['booking_id'],
+        "year": datetime.now().year,
+    }
+    return BOOKING_CONFIRMATION_TEMPLATE.substitute({k: escape(str(v)) for k, v in fields.items()})
+
+
+def send_booking_confirmation(user_email: str, user_name: str, event: dict, booking_details: dict,
+                              tickets: Optional[List[dict]] = None) -> bool:
+    """
+    Queue the booking confirmation email with ticket details.
+    Delivery happens on the outbox sender threads; this never waits on SMTP.
+
+    Args:
+        user_email: Email address of the user
+        user_name: Full name of the user
+        event: Dictionary containing event details
+        booking_details: Dictionary containing booking details
+        tickets: Ticket references ({bookingId}) to attach as PDFs; resolved
+            through outbox.attachment_loader at send time
+
+    Returns:
+        bool: True if the email was queued, False otherwise
+    """
+    try:
+        html = render_booking_confirmation(user_name, event, booking_details)
+        subject = f"🎟️ Your Tickets for {event['name']} | Event Hub"
+        msg_id = outbox.enqueue(user_email, subject, html, attachments=tickets)
+        logger.info("Booking confirmation email %s queued for %s", msg_id, user_email)
         return True
-        
+
     except Exception as e:
-        logger.error(f"Failed to send booking confirmation email: {str(e)}")
+        logger.error(f"Failed to queue booking confirmation email: {str(e)}")
         return False
+
+
+def queue_booking_confirmation(booking: dict) -> bool:
+    """Queue the confirmation for a confirmed ledger booking, its tickets
+    attached by reference ({bookingId}). Skipped when the user id is not an
+    email address."""
+    user = booking.get("userId") or ""
+    if "@" not in user:
+        return False
+    event = {"name": booking["eventTitle"], "date": booking["date"], "time": booking["time"],
+             "venue": booking["venue"]}
+    booking_details = {
+        "ticket_count": booking["tickets"],
+        "ticket_type": "Seat" if booking["tickets"] == 1 else "Seats",
+        "total_amount": booking["totalAmount"],
+        "booking_id": booking["bookingId"],
+    }
+    return send_booking_confirmation(user, user.split("@")[0], event, booking_details,
+                                     tickets=[{"bookingId": booking["bookingId"]}])
+
+
+def queue_event_cancellation_notices(bookings: List[dict]) -> int:
+    """Queue one cancellation/refund notice per booking (ledger booking dicts)
+    in a single outbox transaction. Entries without a bookingId are booking
+    requests that were never filled, so nothing was charged. Bookings whose
+    user id is not an email address are skipped. Returns the number queued."""
+    year = datetime.now().year
+    messages = []
+    for b in bookings:
+        user = b.get("userId") or ""
+        if "@" not in user:
+            continue
+        fields = {
+            "event_name": b.get("eventTitle"),
+            "event_date": b.get("date") or "the scheduled date",
+            "booking_id": b.get("bookingId") or "not confirmed (request)",
+            "ticket_count": b.get("tickets"),
+            "refund": b.get("totalAmount") or 0,
+            "refund_note": ("Your refund has been initiated to the original payment method." if b.get("bookingId")
+                            else "Your booking request was not confirmed, so nothing was charged."),
+            "year": year,
+        }
+        html = EVENT_CANCELLED_TEMPLATE.substitute({k: escape(str(v)) for k, v in fields.items()})
+        messages.append((user, f"Event cancelled: {b.get('eventTitle')} | Event Hub", html))
+    return outbox.enqueue_many(messages)
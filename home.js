@@ -42,13 +42,13 @@
   }
 
   function createCard(e){
-    const img = e.image_url || placeholders[e.category] || '/static/images/placeholder.svg'
+    const img = e.thumbnail_url || e.image_url || placeholders[e.category] || '/static/images/placeholder.svg'
     const date = e.date || ''
     const venue = e.venue || ''
     const seats = e.available_seats || ''
     return `
     <div class="event-card" onclick="location.href='event-details.html?id=${e.id}'">
-      <img src="${img}" alt="${e.name}" class="event-image" style="width:100%;height:200px;object-fit:cover;border-radius:12px;">
+      <img src="${img}" srcset="${e.image_srcset || ''}" sizes="(max-width: 600px) 100vw, 320px" loading="lazy" alt="${e.name}" class="event-image" style="width:100%;height:200px;object-fit:cover;border-radius:12px;">
       <div class="event-info">
         <div class="event-content">
           <span class="event-category">${e.category}</span>
@@ -234,7 +234,7 @@
 
     // Enhanced card creation with mood display
     function createCardWithMood(e) {
-      const img = e.image_url || placeholders[e.category] || '/static/images/placeholder.svg'
+      const img = e.thumbnail_url || e.image_url || placeholders[e.category] || '/static/images/placeholder.svg'
       const date = e.date || ''
       const venue = e.venue || ''
       const seats = e.available_seats || ''
@@ -261,7 +261,7 @@
       
       return `
       <div class="event-card" onclick="location.href='event-details.html?id=${e.id}'">
-        <img src="${img}" alt="${e.name}" class="event-image" style="width:100%;height:200px;object-fit:cover;border-radius:12px;">
+        <img src="${img}" srcset="${e.image_srcset || ''}" sizes="(max-width: 600px) 100vw, 320px" loading="lazy" alt="${e.name}" class="event-image" style="width:100%;height:200px;object-fit:cover;border-radius:12px;">
         <div class="event-info">
           <div class="event-content">
             <div class="event-badges">
@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from functools import wraps
+from typing import Callable, Optional, Tuple
+
+from flask import g, jsonify, make_response, request
+
+from booking_ledger import LEDGER_DB
+from rate_limiter import account_key, client_key
+
+import logging
+logger = logging.getLogger("Idempotency")
+if not logger.handlers:
+    h = logging.StreamHandler()
+    h.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    logger.addHandler(h)
+logger.setLevel(logging.INFO)
+
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", str(24 * 3600)))
+# Keys live next to the booking ledger, so every worker process sees them.
+IDEMPOTENCY_DB = os.getenv("IDEMPOTENCY_DB", LEDGER_DB)
+MAX_KEY_LENGTH = 255
+MAX_STORED_BODY = 1024 * 1024
+LEASE_SECONDS = 60.0         # an unfinished claim older than this is taken over
+POLL_SECONDS = 0.05          # how often a retry checks on a request in flight
+PURGE_INTERVAL = 300.0
+
+# Responses worth replaying. 5xx and 429 mean "not done", so a retry with the
+# same key must run the view again.
+_NOT_STORED = {429}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    scope TEXT NOT NULL,
+    key TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    claimed REAL NOT NULL,
+    expires REAL NOT NULL,
+    status INTEGER NOT NULL DEFAULT 0,
+    headers TEXT,
+    body BLOB,
+    ref TEXT,
+    PRIMARY KEY (scope, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idempotency_keys_expiry ON idempotency_keys (expires);
+"""
+
+
+class _Entry:
+    __slots__ = ("owner", "status", "headers", "body", "ref")
+
+    def __init__(self, owner: str, status: int = 0, headers: Optional[list] = None,
+                 body: bytes = b"", ref: Optional[str] = None):
+        self.owner = owner
+        self.status = status
+        self.headers = headers or []
+        self.body = body
+        self.ref = ref
+
+
+class IdempotencyTable:
+    """
+    TTL table of responses keyed by idempotency key, in SQLite.
+
+    The first request with a key claims it with INSERT ... ON CONFLICT DO
+    NOTHING, so exactly one worker process runs the view; retries of the
+    same key in any process wait for it and replay its response. A claim
+    whose request died is taken over after LEASE_SECONDS.
+
+    A view may store a reference instead of its response body (see
+    set_response_ref); `load_ref` turns it back into the body on replay.
+    """
+
+    def __init__(self, scope: str, db_path: str = IDEMPOTENCY_DB, ttl: float = IDEMPOTENCY_TTL,
+                 load_ref: Optional[Callable[[str], Optional[bytes]]] = None):
+        self.scope = scope
+        self.db_path = db_path
+        self.ttl = ttl
+        self.load_ref = load_ref
+        self._local = threading.local()
+        self._next_purge = 0.0
+        self._db().executescript(_SCHEMA)
+
+    def _db(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _purge(self, now: float) -> None:
+        if now < self._next_purge:
+            return
+        self._next_purge = now + PURGE_INTERVAL
+        self._db().execute("DELETE FROM idempotency_keys WHERE expires <= ?", (now,))
+
+    def begin(self, key: str, fingerprint: str) -> Tuple[str, Optional[_Entry]]:
+        """Returns ("new", entry) to run the view, ("replay", entry) for a
+        finished entry, ("pending", entry) for one still running, or
+        ("mismatch", None) when the key was used with a different request."""
+        now = time.time()
+        self._purge(now)
+        db = self._db()
+        owner = uuid.uuid4().hex
+        cur = db.execute(
+            "INSERT INTO idempotency_keys (scope, key, fingerprint, owner, claimed, expires) "
+            "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT DO NOTHING",
+            (self.scope, key, fingerprint, owner, now, now + self.ttl),
+        )
+        if cur.rowcount == 1:
+            return "new", _Entry(owner)
+        row = db.execute(
+            "SELECT fingerprint, owner, claimed, expires, status FROM idempotency_keys WHERE scope = ? AND key = ?",
+            (self.scope, key),
+        ).fetchone()
+        if row is None:
+            return self.begin(key, fingerprint)  # deleted in between
+        old_fingerprint, old_owner, claimed, expires, status = row
+        if expires > now and old_fingerprint != fingerprint:
+            return "mismatch", None
+        if expires > now and not status and claimed >= now - LEASE_SECONDS:
+            return "pending", _Entry(old_owner)
+        if expires > now and status:
+            entry = self._load(key)
+            if entry is not None and entry.owner == old_owner:
+                return "replay", entry
+        # Expired, its request died, or its stored reference is gone (e.g.
+        # evicted from the ticket cache): claim it and run the view again.
+        cur = db.execute(
+            "UPDATE idempotency_keys SET fingerprint = ?, owner = ?, claimed = ?, expires = ?, status = 0, "
+            "headers = NULL, body = NULL, ref = NULL WHERE scope = ? AND key = ? AND owner = ?",
+            (fingerprint, owner, now, now + self.ttl, self.scope, key, old_owner),
+        )
+        return ("new", _Entry(owner)) if cur.rowcount == 1 else self.begin(key, fingerprint)
+
+    def _load(self, key: str) -> Optional[_Entry]:
+        row = self._db().execute(
+            "SELECT owner, status, headers, body, ref FROM idempotency_keys WHERE scope = ? AND key = ?",
+            (self.scope, key),
+        ).fetchone()
+        if row is None:
+            return None
+        owner, status, headers, body, ref = row
+        entry = _Entry(owner, status, json.loads(headers) if headers else [], body or b"", ref)
+        if status and ref is not None:
+            data = self.load_ref(ref) if self.load_ref else None
+            if data is None:
+                return None
+            entry.body = data
+        return entry
+
+    def wait(self, key: str, entry: _Entry, timeout: float) -> Optional[_Entry]:
+        """Poll until the request holding `entry` finishes; its stored
+        response, or None if it is still running, gave up, or its stored
+        reference can no longer be loaded."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            time.sleep(POLL_SECONDS)
+            done = self._load(key)
+            if done is None or done.owner != entry.owner:
+                return None
+            if done.status:
+                return done
+        return None
+
+    def complete(self, key: str, entry: _Entry, status: int, headers: list, body: bytes,
+                 ref: Optional[str] = None) -> None:
+        self._db().execute(
+            "UPDATE idempotency_keys SET status = ?, headers = ?, body = ?, ref = ? "
+            "WHERE scope = ? AND key = ? AND owner = ?",
+            (status, json.dumps(headers), None if ref is not None else body, ref, self.scope, key, entry.owner),
+        )
+
+    def abandon(self, key: str, entry: _Entry) -> None:
+        """Forget a key whose request did not complete, so a retry runs again."""
+        self._db().execute("DELETE FROM idempotency_keys WHERE scope = ? AND key = ? AND owner = ?",
+                           (self.scope, key, entry.owner))
+
+    def __len__(self) -> int:
+        return self._db().execute("SELECT COUNT(*) FROM idempotency_keys WHERE scope = ?",
+                                  (self.scope,)).fetchone()[0]
+
+
+booking_idempotency = IdempotencyTable("booking")
+ticket_idempotency = IdempotencyTable("ticket")
+
+
+def set_response_ref(ref: str) -> None:
+    """Called by a view: store `ref` for this response instead of its body;
+    the table's load_ref resolves it on replay."""
+    g.idempotency_ref = ref
+
+
+def _fingerprint() -> str:
+    h = hashlib.sha256()
+    h.update(request.method.encode())
+    h.update(b"\0")
+    h.update(request.path.encode())
+    h.update(b"\0")
+    h.update(request.get_data(cache=True))
+    return h.hexdigest()
+
+
+def _replay(entry: _Entry):
+    resp = make_response(entry.body, entry.status)
+    resp.headers.clear()
+    for name, value in entry.headers:
+        resp.headers.add(name, value)
+    resp.headers["Idempotent-Replayed"] = "true"
+    return resp
+
+
+def idempotent(table: IdempotencyTable, wait_seconds: float = 10.0,
+               scope_func: Callable[[], str] = lambda: account_key() or client_key()):
+    """
+    Decorator honoring an `Idempotency-Key` request header on a Flask view.
+
+    The first request with a key runs the view and its response is stored
+    for the table's TTL; repeats with the same key (scoped per account, or
+    per client IP) get the stored response back without running the view.
+    Reusing a key for a different request body is rejected with 422.
+    Requests without the header are not affected.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = request.headers.get("Idempotency-Key", "").strip()
+            if not key:
+                return view(*args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return jsonify(error="Idempotency-Key too long"), 400
+            scoped = f"{request.endpoint}\0{scope_func()}\0{key}"
+            state, entry = table.begin(scoped, _fingerprint())
+            if state == "mismatch":
+                return jsonify(error="Idempotency-Key reused with a different request"), 422
+            if state == "pending":
+                entry = table.wait(scoped, entry, wait_seconds)
+                if entry is None:
+                    resp = jsonify(error="a request with this Idempotency-Key is still in progress")
+                    resp.headers["Retry-After"] = "1"
+                    return resp, 409
+                state = "replay"
+            if state == "replay":
+                logger.info("idempotency: replaying %s for key %s", request.endpoint, key)
+                return _replay(entry)
+
+            g.pop("idempotency_ref", None)
+            try:
+                resp = make_response(view(*args, **kwargs))
+            except Exception:
+                table.abandon(scoped, entry)
+                raise
+            status = resp.status_code
+            if status >= 500 or status in _NOT_STORED:
+                table.abandon(scoped, entry)
+                return resp
+            ref = g.pop("idempotency_ref", None)
+            if ref is not None:
+                table.complete(scoped, entry, status, list(resp.headers.items()), b"", ref=ref)
+                return resp
+            resp.direct_passthrough = False
+            body = resp.get_data()
+            if len(body) > MAX_STORED_BODY:
+                table.abandon(scoped, entry)
+                return resp
+            table.complete(scoped, entry, status, list(resp.headers.items()), body)
+            return resp
+        return wrapper
+    return decorator
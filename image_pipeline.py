@@ -0,0 +1,238 @@
+from __future__ import annotations
+
+import hashlib
+import importlib.util
+import multiprocessing
+import os
+import shutil
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from flask import Response, request, send_file
+
+import logging
+logger = logging.getLogger("ImagePipeline")
+if not logger.handlers:
+    h = logging.StreamHandler()
+    h.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    logger.addHandler(h)
+logger.setLevel(logging.INFO)
+
+# Pillow is imported where images are actually opened (workers, cache
+# misses), not at app startup; without it /img serves the original files.
+PIL_AVAILABLE = importlib.util.find_spec("PIL") is not None
+
+ROOT = Path(__file__).resolve().parent
+IMAGE_SOURCE_DIR = ROOT / "static" / "images"
+IMAGE_CACHE_DIR = Path(os.getenv("IMAGE_CACHE_DIR", str(ROOT / ".cache" / "images")))
+# Warm every variant in a process pool at startup (1) or once the first /img
+# request comes in (0, the default: keeps Pillow and the pool off worker boot).
+IMAGE_WARM_ON_START = os.getenv("IMAGE_WARM_ON_START", "0") == "1"
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+
+WIDTHS = (160, 320, 640)
+CARD_WIDTH = 320                         # what the listing cards ask for
+SOURCE_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp"}
+FORMATS = {"webp": ("WEBP", "image/webp"), "jpeg": ("JPEG", "image/jpeg")}
+QUALITY = {"webp": 80, "jpeg": 82}
+CACHE_CONTROL = "public, max-age=604800"  # a week; URLs change with the source hash
+
+
+def render_variant(src: str, out: str, width: int, fmt: str) -> int:
+    """
+    Resize `src` to `width` (never upscaling) and write it to `out` as `fmt`.
+    Runs in pool workers, so it only touches its arguments; returns the
+    number of bytes written.
+    """
+    from PIL import Image, ImageOps
+    with Image.open(src) as im:
+        source_format = im.format
+        im = ImageOps.exif_transpose(im)
+        resized = im.width > width
+        if resized:
+            im = im.resize((width, max(1, round(im.height * width / im.width))), Image.LANCZOS)
+        if fmt == "jpeg" and im.mode not in ("RGB", "L"):
+            # JPEG has no alpha: flatten onto white
+            rgba = im.convert("RGBA")
+            im = Image.new("RGB", rgba.size, (255, 255, 255))
+            im.paste(rgba, mask=rgba.getchannel("A"))
+        elif fmt == "webp" and im.mode not in ("RGB", "RGBA"):
+            im = im.convert("RGBA" if "A" in im.getbands() or "transparency" in im.info else "RGB")
+        tmp = f"{out}.{os.getpid()}.tmp"
+        im.save(tmp, FORMATS[fmt][0], quality=QUALITY[fmt], optimize=fmt == "jpeg", method=4 if fmt == "webp" else 0)
+    if not resized and source_format == FORMATS[fmt][0] and os.path.getsize(tmp) > os.path.getsize(src):
+        # re-encoding a small, already-compressed source only made it bigger
+        shutil.copyfile(src, tmp)
+    os.replace(tmp, out)
+    return os.path.getsize(out)
+
+
+class ImagePipeline:
+    """
+    Resized WebP/JPEG variants of the catalog images at fixed widths.
+
+    Variants are cached on disk under a name that includes the first bytes of
+    the source's SHA-256, so an edited image gets new files (and new ETags)
+    without anything being invalidated by hand. They are generated in a
+    spawn process pool in the background (at startup, or after the first
+    request), and synchronously on a request that arrives before its variant
+    exists.
+    """
+
+    def __init__(self, source_dir: Path = IMAGE_SOURCE_DIR, cache_dir: Path = IMAGE_CACHE_DIR,
+                 widths: Tuple[int, ...] = WIDTHS, workers: int = IMAGE_WORKERS):
+        self.source_dir = source_dir
+        self.cache_dir = cache_dir
+        self.widths = tuple(sorted(widths))
+        self.workers = workers
+        self._sources: Dict[str, Tuple[float, str, int]] = {}
+        self._locks: Dict[Path, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    # --- naming ---
+
+    def source(self, name: str) -> Optional[Path]:
+        path = (self.source_dir / name).resolve()
+        if path.suffix.lower() not in SOURCE_SUFFIXES or self.source_dir.resolve() not in path.parents:
+            return None
+        return path if path.is_file() else None
+
+    def _info(self, path: Path) -> Tuple[str, int]:
+        """(content hash, pixel width) of a source, re-read when it changes."""
+        mtime = path.stat().st_mtime
+        cached = self._sources.get(str(path))
+        if cached is None or cached[0] != mtime:
+            from PIL import Image, ImageOps
+            with Image.open(path) as im:
+                width = ImageOps.exif_transpose(im).width
+            cached = (mtime, hashlib.sha256(path.read_bytes()).hexdigest()[:16], width)
+            self._sources[str(path)] = cached
+        return cached[1], cached[2]
+
+    def snap(self, width: Optional[int]) -> int:
+        """Smallest configured width >= `width` (the largest if none is)."""
+        if not width:
+            return self.widths[-1]
+        for w in self.widths:
+            if w >= width:
+                return w
+        return self.widths[-1]
+
+    def variant_path(self, path: Path, width: int, fmt: str) -> Path:
+        # Never upscale: widths past the source's own share one file.
+        digest, source_width = self._info(path)
+        return self.cache_dir / f"{path.stem}-{digest}-{min(width, source_width)}.{fmt}"
+
+    def url(self, name: str, width: int = CARD_WIDTH) -> str:
+        return f"/img/{name}?w={width}"
+
+    def srcset(self, name: str) -> str:
+        return ", ".join(f"{self.url(name, w)} {w}w" for w in self.widths)
+
+    def responsive(self, image_url: Optional[str]) -> Dict[str, str]:
+        """thumbnail_url / image_srcset for a catalog image_url under
+        /static/images; empty for icons, missing files and anything not
+        resizable."""
+        prefix = "/static/images/"
+        if not PIL_AVAILABLE or not image_url or not image_url.startswith(prefix):
+            return {}
+        name = image_url[len(prefix):]
+        if self.source(name) is None:
+            return {}
+        return {"thumbnail_url": self.url(name), "image_srcset": self.srcset(name)}
+
+    # --- generation ---
+
+    def _lock_for(self, out: Path) -> threading.Lock:
+        with self._locks_lock:
+            lock = self._locks.get(out)
+            if lock is None:
+                lock = self._locks[out] = threading.Lock()
+            return lock
+
+    def ensure(self, path: Path, width: int, fmt: str) -> Path:
+        """Path of the variant, rendering it now if it is not cached yet."""
+        out = self.variant_path(path, width, fmt)
+        if out.exists():
+            return out
+        with self._lock_for(out):
+            if not out.exists():
+                self.cache_dir.mkdir(parents=True, exist_ok=True)
+                size = render_variant(str(path), str(out), width, fmt)
+                logger.info("image: rendered %s (%d bytes) on request", out.name, size)
+        return out
+
+    def _missing(self) -> List[Tuple[str, str, int, str]]:
+        jobs = []
+        seen = set()
+        for path in sorted(self.source_dir.rglob("*")):
+            if path.suffix.lower() not in SOURCE_SUFFIXES or self.cache_dir in path.parents:
+                continue
+            for width in self.widths:
+                for fmt in FORMATS:
+                    out = self.variant_path(path, width, fmt)
+                    if not out.exists() and str(out) not in seen:
+                        seen.add(str(out))
+                        jobs.append((str(path), str(out), width, fmt))
+        return jobs
+
+    def warm(self) -> int:
+        """Render every missing variant in a process pool; returns how many."""
+        jobs = self._missing()
+        if not jobs:
+            return 0
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        # spawn: workers must not inherit the web server's threads or the native store
+        with ProcessPoolExecutor(max_workers=self.workers,
+                                 mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = [pool.submit(render_variant, *job) for job in jobs]
+            total = 0
+            for job, future in zip(jobs, futures):
+                try:
+                    total += future.result()
+                except Exception as e:
+                    logger.warning("image: %s failed: %s", os.path.basename(job[1]), e)
+        logger.info("image: warmed %d variant(s), %.1f KiB", len(jobs), total / 1024)
+        return len(jobs)
+
+    def start(self) -> None:
+        """Warm the cache on a background thread (idempotent)."""
+        if self._thread is not None or not PIL_AVAILABLE:
+            return
+        if multiprocessing.parent_process() is not None:
+            # a spawn worker re-importing the app module: never warm from there
+            return
+        with self._start_lock:
+            if self._thread is not None:
+                return
+
+            def run():
+                try:
+                    self.warm()
+                except Exception as e:
+                    logger.error("image warm-up failed: %s", e)
+
+            self._thread = threading.Thread(target=run, name="image-warm", daemon=True)
+            self._thread.start()
+
+    # --- serving ---
+
+    def serve(self, name: str, width: Optional[int]) -> Optional[Response]:
+        """Response for /img/<name>?w=<width>, or None for unknown images."""
+        path = self.source(name)
+        if path is None:
+            return None
+        self.start()
+        if not PIL_AVAILABLE:
+            resp = send_file(path, conditional=True)
+        else:
+            fmt = "webp" if "image/webp" in request.headers.get("Accept", "") else "jpeg"
+            out = self.ensure(path, self.snap(width), fmt)
+            resp = send_file(out, mimetype=FORMATS[fmt][1], conditional=True, etag=out.stem + "-" + fmt)
+            resp.vary.add("Accept")
+        resp.headers["Cache-Control"] = CACHE_CONTROL
+        return resp
@@ -0,0 +1,349 @@
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+from flask import Flask, g, request
+
+from booking_ledger import LEDGER_DB
+
+import logging
+logger = logging.getLogger("Metrics")
+if not logger.handlers:
+    h = logging.StreamHandler()
+    h.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    logger.addHandler(h)
+logger.setLevel(logging.INFO)
+
+# Upper bounds in seconds; native calls sit in the microsecond buckets,
+# requests further up.
+LATENCY_BUCKETS = (
+    0.000005, 0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+_HISTOGRAMS = {
+    "eventhub_native_call_seconds": ("Latency of eh_* calls into the native store.", ("function",)),
+    "http_request_duration_seconds": ("Latency of Flask requests by route.", ("endpoint", "method")),
+}
+_COUNTERS = {
+    "http_requests_total": ("Flask requests by route and status.", ("endpoint", "method", "status")),
+    "eventhub_native_errors_total": ("eh_* calls that raised.", ("function",)),
+}
+
+Series = Tuple[str, Tuple[str, ...]]
+
+# Each worker process publishes its totals here every METRICS_PUBLISH_SECONDS
+# (and when it serves a scrape); a scrape sums every worker of the running
+# server. Rows of earlier server runs are dropped after METRICS_RETAIN_SECONDS.
+METRICS_DB = os.getenv("METRICS_DB", LEDGER_DB)
+METRICS_PUBLISH_SECONDS = float(os.getenv("METRICS_PUBLISH_SECONDS", "5"))
+METRICS_RETAIN_SECONDS = 24 * 3600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS metrics_workers (
+    run TEXT NOT NULL,
+    worker TEXT NOT NULL,
+    updated REAL NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (run, worker)
+) WITHOUT ROWID;
+"""
+
+
+def _server_run() -> str:
+    """Identity shared by the workers of one server (see the native binding's
+    server_generation); the process itself when that is unavailable."""
+    try:
+        from scripts.eventhub_binding import server_generation
+    except ImportError:
+        return str(os.getpid())
+    return server_generation()
+
+
+class MetricsRegistry:
+    """
+    Fixed-bucket latency histograms and counters.
+
+    Each thread accumulates into its own dicts, so recording takes no lock;
+    the process's totals sum every thread's dicts. Shards of finished
+    threads are kept so totals never go backwards.
+
+    With a `db_path`, a background thread publishes the process's totals to
+    SQLite and a scrape sums those of every worker process of the server, so
+    /metrics answers for the whole server whichever worker serves it. Rows of
+    workers that have exited are kept for the same reason.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS, db_path: Optional[str] = None,
+                 publish_interval: float = METRICS_PUBLISH_SECONDS):
+        self.buckets = buckets
+        self.db_path = db_path
+        self.publish_interval = publish_interval
+        self._run: Optional[str] = None
+        self._reset()
+        if hasattr(os, "register_at_fork"):
+            # A worker forked from a master that recorded anything starts
+            # from zero under its own id, with its own connection and thread.
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self) -> None:
+        self._local = threading.local()
+        self._shards: List[Tuple[dict, dict]] = []
+        self._shards_lock = threading.Lock()
+        self._worker: Optional[str] = None
+        self._db_local = threading.local()
+
+    def _shard(self) -> Tuple[dict, dict]:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = ({}, {})
+            self._local.shard = shard
+            with self._shards_lock:
+                self._shards.append(shard)
+            if self.db_path:
+                self._start_publisher()
+        return shard
+
+    def observe(self, name: str, labels: Tuple[str, ...], seconds: float) -> None:
+        hist = self._shard()[0]
+        key = (name, labels)
+        cell = hist.get(key)
+        if cell is None:
+            # bucket counts..., +Inf count, sum
+            cell = hist[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        cell[bisect_left(self.buckets, seconds)] += 1
+        cell[-1] += seconds
+
+    def inc(self, name: str, labels: Tuple[str, ...], amount: int = 1) -> None:
+        counters = self._shard()[1]
+        key = (name, labels)
+        counters[key] = counters.get(key, 0) + amount
+
+    # --- scrape ---
+
+    def _merged(self) -> Tuple[Dict[Series, list], Dict[Series, int]]:
+        with self._shards_lock:
+            shards = list(self._shards)
+        hist: Dict[Series, list] = {}
+        counters: Dict[Series, int] = {}
+        for h, c in shards:
+            # list() so a thread adding a new series mid-scrape cannot break iteration
+            for key, cell in list(h.items()):
+                acc = hist.get(key)
+                if acc is None:
+                    hist[key] = list(cell)
+                else:
+                    for i, v in enumerate(cell):
+                        acc[i] += v
+            for key, v in list(c.items()):
+                counters[key] = counters.get(key, 0) + v
+        return hist, counters
+
+    # --- sharing between worker processes ---
+
+    def _db(self) -> sqlite3.Connection:
+        conn = getattr(self._db_local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._db_local.conn = conn
+        return conn
+
+    def _start_publisher(self) -> None:
+        """Start this process's publishing thread, once."""
+        with self._shards_lock:
+            if self._worker is not None:
+                return
+            self._worker = uuid.uuid4().hex
+            if self._run is None:
+                self._run = _server_run()
+
+        def run():
+            while True:
+                time.sleep(self.publish_interval)
+                try:
+                    self.publish()
+                except Exception as e:
+                    logger.warning("metrics: publishing failed: %s", e)
+
+        threading.Thread(target=run, name="metrics-publish", daemon=True).start()
+
+    def publish(self) -> None:
+        """Store this process's totals for other workers' scrapes."""
+        if not self.db_path or self._worker is None:
+            return
+        hist, counters = self._merged()
+        data = json.dumps({
+            "hist": [[name, list(labels), cell] for (name, labels), cell in hist.items()],
+            "counters": [[name, list(labels), v] for (name, labels), v in counters.items()],
+        }, separators=(",", ":"))
+        now = time.time()
+        db = self._db()
+        db.execute(
+            "INSERT INTO metrics_workers (run, worker, updated, data) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (run, worker) DO UPDATE SET updated = excluded.updated, data = excluded.data",
+            (self._run, self._worker, now, data),
+        )
+        db.execute("DELETE FROM metrics_workers WHERE run != ? AND updated < ?",
+                   (self._run, now - METRICS_RETAIN_SECONDS))
+
+    def _collect(self) -> Tuple[Dict[Series, list], Dict[Series, int]]:
+        """Totals of every worker of this server (this process's own when
+        nothing is shared)."""
+        if not self.db_path:
+            return self._merged()
+        self._start_publisher()
+        try:
+            self.publish()
+            rows = self._db().execute("SELECT data FROM metrics_workers WHERE run = ?", (self._run,)).fetchall()
+        except sqlite3.Error as e:
+            logger.warning("metrics: reading other workers failed, reporting this one only: %s", e)
+            return self._merged()
+        hist: Dict[Series, list] = {}
+        counters: Dict[Series, int] = {}
+        for (data,) in rows:
+            data = json.loads(data)
+            for name, labels, cell in data["hist"]:
+                key = (name, tuple(labels))
+                acc = hist.get(key)
+                if acc is None:
+                    hist[key] = cell
+                else:
+                    for i, v in enumerate(cell):
+                        acc[i] += v
+            for name, labels, v in data["counters"]:
+                key = (name, tuple(labels))
+                counters[key] = counters.get(key, 0) + v
+        return hist, counters
+
+    def _quantile(self, cell: list, q: float) -> Optional[float]:
+        """Bucket upper bound at quantile q (what histogram_quantile would
+        interpolate towards); None when empty."""
+        total = sum(cell[:-1])
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for i, n in enumerate(cell[:-1]):
+            seen += n
+            if seen >= rank:
+                return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return float("inf")
+
+    def summary(self) -> Dict[str, List[dict]]:
+        """Per-series count, mean, p50 and p99 (bucket bounds), for humans."""
+        hist, _ = self._collect()
+        out: Dict[str, List[dict]] = {}
+        for (name, labels), cell in sorted(hist.items()):
+            count = sum(cell[:-1])
+            out.setdefault(name, []).append({
+                **dict(zip(_HISTOGRAMS[name][1], labels)),
+                "count": count,
+                "mean": cell[-1] / count if count else None,
+                "p50": self._quantile(cell, 0.5),
+                "p99": self._quantile(cell, 0.99),
+            })
+        for entries in out.values():
+            entries.sort(key=lambda e: -(e["mean"] or 0) * e["count"])
+        return out
+
+    def render_prometheus(self) -> str:
+        hist, counters = self._collect()
+        lines: List[str] = []
+        for name, (help_text, label_names) in _HISTOGRAMS.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for (series, labels), cell in sorted(hist.items()):
+                if series != name:
+                    continue
+                base = _labels(label_names, labels)
+                cumulative = 0
+                for bound, n in zip(self.buckets, cell):
+                    cumulative += n
+                    lines.append(f'{name}_bucket{{{base},le="{bound:g}"}} {cumulative}')
+                cumulative += cell[len(self.buckets)]
+                lines.append(f'{name}_bucket{{{base},le="+Inf"}} {cumulative}')
+                lines.append(f"{name}_sum{{{base}}} {cell[-1]:.9f}")
+                lines.append(f"{name}_count{{{base}}} {cumulative}")
+        for name, (help_text, label_names) in _COUNTERS.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for (series, labels), value in sorted(counters.items()):
+                if series == name:
+                    lines.append(f"{name}{{{_labels(label_names, labels)}}} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    return ",".join(f'{n}="{_escape(str(v))}"' for n, v in zip(names, values))
+
+
+registry = MetricsRegistry(db_path=METRICS_DB)
+
+
+class _TimedLib:
+    """Stands in for the cffi `lib` of an EventHub and times every eh_* call.
+    Wrappers are built on first use and cached on the instance."""
+
+    def __init__(self, lib, metrics: MetricsRegistry):
+        self._lib = lib
+        self._metrics = metrics
+
+    def __getattr__(self, name: str):
+        fn = getattr(self._lib, name)
+        if not (name.startswith("eh_") and callable(fn)):
+            return fn
+        metrics, labels, clock = self._metrics, (name,), time.perf_counter
+
+        def timed(*args):
+            start = clock()
+            try:
+                return fn(*args)
+            except Exception:
+                metrics.inc("eventhub_native_errors_total", labels)
+                raise
+            finally:
+                metrics.observe("eventhub_native_call_seconds", labels, clock() - start)
+
+        timed.__name__ = name
+        setattr(self, name, timed)
+        return timed
+
+
+def instrument_eventhub(eh, metrics: MetricsRegistry = registry):
+    """Time every native call made through `eh` (an EventHub instance)."""
+    if eh is not None and not isinstance(eh.lib, _TimedLib):
+        eh.lib = _TimedLib(eh.lib, metrics)
+    return eh
+
+
+def instrument_app(app: Flask, metrics: MetricsRegistry = registry) -> None:
+    """Time every Flask request, labelled by route rule (not raw path, so
+    ids do not explode the series count)."""
+
+    @app.before_request
+    def _metrics_start():
+        g._metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _metrics_record(response):
+        start = g.pop("_metrics_start", None)
+        if start is not None:
+            endpoint = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+            elapsed = time.perf_counter() - start
+            metrics.observe("http_request_duration_seconds", (endpoint, request.method), elapsed)
+            metrics.inc("http_requests_total", (endpoint, request.method, str(response.status_code)))
+        return response
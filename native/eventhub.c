@@ -2,11 +2,53 @@
 #include <stdlib.h>
 #include <string.h>
 #include <stdio.h>
+#include <stdarg.h>
 #include <limits.h>
+#include <stddef.h>
+#include <errno.h>
+
+#ifndef _WIN32
+#include <fcntl.h>
+#include <pthread.h>
+#include <sys/file.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+#else
+#include <process.h>
+#define getpid _getpid
+#endif
+
+/* =========================
+   Tracing
+   ========================= */
+// Per-operation trace lines. Build with -DEH_NO_TRACE to compile them out;
+// otherwise eh_set_trace() picks off / sampled (every Nth line) / full at
+// runtime. Full is the default so the plain library behaves as before.
+static int eh_trace_mode = EH_TRACE_FULL;
+static int eh_trace_every = 100;
+static unsigned long eh_trace_seq = 0;
+
+#ifdef EH_NO_TRACE
+#define EH_TRACE(...) ((void)0)
+#else
+#define EH_TRACE(...) do { \
+    if (eh_trace_mode == EH_TRACE_FULL || \
+        (eh_trace_mode == EH_TRACE_SAMPLED && ++eh_trace_seq % (unsigned long)eh_trace_every == 0)) \
+      printf(__VA_ARGS__); \
+  } while (0)
+#endif
+
+void eh_set_trace(int mode, int sample_every) {
+  if (mode < EH_TRACE_OFF || mode > EH_TRACE_FULL) mode = EH_TRACE_FULL;
+  eh_trace_mode = mode;
+  eh_trace_every = sample_every > 0 ? sample_every : 1;
+}
 
 /* =========================
    Utilities
    ========================= */
+// Result strings handed to the caller live on the process heap (eh_free).
 static char* eh_strdup(const char* s) {
   if (!s) return NULL;
   size_t n = strlen(s) + 1;
@@ -19,6 +61,86 @@ void eh_free(char* ptr) {
   free(ptr);
 }
 
+// Growable JSON result string. String values go through jb_str(), which
+// escapes them; jb_fmt() is for numbers. On allocation failure the buffer is
+// marked failed and jb_finish() returns NULL.
+typedef struct JsonBuf {
+  char*  s;
+  size_t len;
+  size_t cap;
+  int    failed;
+} JsonBuf;
+
+static int jb_reserve(JsonBuf* b, size_t extra) {
+  if (b->failed) return 0;
+  if (b->len + extra < b->cap) return 1;
+  size_t cap = b->cap ? b->cap : 256;
+  while (b->len + extra >= cap) cap *= 2;
+  char* s = (char*)realloc(b->s, cap);
+  if (!s) { b->failed = 1; return 0; }
+  b->s = s;
+  b->cap = cap;
+  return 1;
+}
+
+static void jb_raw(JsonBuf* b, const char* s, size_t n) {
+  if (!jb_reserve(b, n)) return;
+  memcpy(b->s + b->len, s, n);
+  b->len += n;
+  b->s[b->len] = '\0';
+}
+
+static void jb_lit(JsonBuf* b, const char* s) { jb_raw(b, s, strlen(s)); }
+
+static void jb_fmt(JsonBuf* b, const char* fmt, ...) {
+  va_list ap;
+  va_start(ap, fmt);
+  int n = vsnprintf(NULL, 0, fmt, ap);
+  va_end(ap);
+  if (n < 0 || !jb_reserve(b, (size_t)n)) return;
+  va_start(ap, fmt);
+  vsnprintf(b->s + b->len, (size_t)n + 1, fmt, ap);
+  va_end(ap);
+  b->len += (size_t)n;
+}
+
+static void jb_str(JsonBuf* b, const char* s) {
+  jb_raw(b, "\"", 1);
+  const char* run = s;
+  for (; s && *s; s++) {
+    unsigned char c = (unsigned char)*s;
+    if (c != '"' && c != '\\' && c >= 0x20) continue;
+    jb_raw(b, run, (size_t)(s - run));
+    char esc[8];
+    if (c == '"' || c == '\\') { esc[0] = '\\'; esc[1] = (char)c; jb_raw(b, esc, 2); }
+    else { snprintf(esc, sizeof(esc), "\\u%04x", c); jb_raw(b, esc, 6); }
+    run = s + 1;
+  }
+  if (run) jb_raw(b, run, (size_t)(s - run));
+  jb_raw(b, "\"", 1);
+}
+
+// A JSON string, or null for a missing/empty one.
+static void jb_str_or_null(JsonBuf* b, const char* s) {
+  if (s && *s) jb_str(b, s);
+  else jb_lit(b, "null");
+}
+
+static char* jb_finish(JsonBuf* b) {
+  if (b->failed) { free(b->s); return NULL; }
+  return b->s;
+}
+
+// "user":..,"event":..,"quantity":N of a queued request, ids escaped.
+static void jb_request(JsonBuf* b, const char* user_id, const char* event_id, int quantity) {
+  jb_lit(b, "\"user\":");
+  jb_str(b, user_id);
+  jb_lit(b, ",\"event\":");
+  jb_str(b, event_id);
+  jb_fmt(b, ",\"quantity\":%d", quantity);
+}
+
+
 static unsigned long hash_str(const char* str) {
   // djb2
   unsigned long hash = 5381;
@@ -34,185 +156,539 @@ static int streq(const char* a, const char* b) {
 }
 
 /* =========================
-   Users Hash Table
+   Arena
    ========================= */
+// Every record of the store lives in one arena: a private anonymous mapping
+// by default, or a file mapped MAP_SHARED by every worker process
+// (eh_init_shared). The mapping sits at a different address in each
+// process, so records link to each other by byte offset from the arena base
+// (0 = none) and only become pointers locally, through at().
+//
+// Allocation is power-of-two size classes with one free list per class; an
+// 8-byte block header remembers the class. A process-shared mutex in the
+// header serializes every eh_* call across threads and processes.
+//
+// Because nothing in the arena is a pointer, its used bytes are also the
+// on-disk snapshot format (eh_save_snapshot): records, strings and hash
+// buckets as they are. eh_init_snapshot maps a snapshot copy-on-write and
+// uses it as the store directly, and eh_init_shared links it in as the
+// shared store file, so startup does not depend on its size.
 #define USERS_BUCKETS 1024
+#define EVENTS_BUCKETS 1024
+#define VENUE_BUCKETS 257
+#define ARENA_MAGIC 0x42554845u   /* "EHUB" */
+#define ARENA_VERSION 4u
+#define ARENA_CLASSES 28          /* 16 bytes .. 2 GiB blocks */
+#define ARENA_GEN_LEN 64
+#define ARENA_MIN_SIZE ((uint64_t)1 << 20)
+#define ARENA_MAX_SIZE ((uint64_t)UINT32_MAX & ~(uint64_t)0xFFFF)
 
-typedef struct UserNode {
-  char* user_id;
-  char* pwd_hash;
-  struct UserNode* next;
-} UserNode;
+typedef uint32_t eh_off;
 
-static UserNode* users_ht[USERS_BUCKETS];
+typedef struct ArenaHeader {
+  uint32_t magic;
+  uint32_t version;
+  uint64_t size;                      // bytes mapped
+  char     generation[ARENA_GEN_LEN]; // which server run the shared file belongs to
+  uint64_t used;                      // bump pointer
+  uint64_t changes;                   // mutating calls so far
+  uint64_t saved_changes;             // `changes` when the last snapshot was taken
+  eh_off   free_lists[ARENA_CLASSES];
+#ifndef _WIN32
+  pthread_mutex_t lock;
+#endif
+  // Store roots (what used to be file-level statics)
+  uint64_t wl_seq;
+  int32_t  venue_count;
+  eh_off   categories_root;
+  eh_off   q_head, q_tail;            // booking queue
+  eh_off   s_top;                     // cancellation stack
+  eh_off   p_head, p_tail;            // waitlist promotions
+  eh_off   users_ht[USERS_BUCKETS];
+  eh_off   events_ht[EVENTS_BUCKETS];
+  eh_off   venues_ht[VENUE_BUCKETS];
+} ArenaHeader;
 
-static void users_ht_init(void) {
-  memset(users_ht, 0, sizeof(users_ht));
-}
-static void users_ht_free(void) {
-  for (size_t i = 0; i < USERS_BUCKETS; i++) {
-    UserNode* n = users_ht[i];
-    while (n) {
-      UserNode* tmp = n->next;
-      free(n->user_id);
-      free(n->pwd_hash);
-      free(n);
-      n = tmp;
+typedef struct BlockHeader {
+  uint32_t cls;
+  uint32_t reserved;
+} BlockHeader;
+
+static char* arena_base = NULL;
+static ArenaHeader* H = NULL;
+static int arena_shared = 0;
+static int arena_full_reported = 0;
+
+static inline void* at(eh_off off) { return off ? (void*)(arena_base + off) : NULL; }
+static inline const char* S(eh_off off) { return (const char*)at(off); }
+#define REC(T, off) ((T*)at(off))
+
+static eh_off arena_alloc(size_t n) {
+  size_t need = n + sizeof(BlockHeader);
+  uint32_t cls = 0;
+  while (cls < ARENA_CLASSES && ((size_t)16 << cls) < need) cls++;
+  if (cls >= ARENA_CLASSES) return 0;
+  eh_off block = H->free_lists[cls];
+  if (block) {
+    H->free_lists[cls] = *(eh_off*)(arena_base + block + sizeof(BlockHeader));
+  } else {
+    uint64_t bytes = (uint64_t)16 << cls;
+    if (H->used + bytes > H->size) {
+      if (!arena_full_reported) {
+        fprintf(stderr, "eventhub: store arena full (%llu bytes); raise its size\n", (unsigned long long)H->size);
+        arena_full_reported = 1;
+      }
+      return 0;
     }
-    users_ht[i] = NULL;
+    block = (eh_off)H->used;
+    H->used += bytes;
+    ((BlockHeader*)(arena_base + block))->cls = cls;
   }
+  eh_off payload = block + (eh_off)sizeof(BlockHeader);
+  memset(arena_base + payload, 0, n);
+  return payload;
+}
+
+static void arena_free(eh_off payload) {
+  if (!payload) return;
+  eh_off block = payload - (eh_off)sizeof(BlockHeader);
+  uint32_t cls = ((BlockHeader*)(arena_base + block))->cls;
+  *(eh_off*)(arena_base + payload) = H->free_lists[cls];
+  H->free_lists[cls] = block;
+}
+
+static eh_off arena_strdup(const char* s) {
+  if (!s) return 0;
+  size_t n = strlen(s) + 1;
+  eh_off off = arena_alloc(n);
+  if (off) memcpy(arena_base + off, s, n);
+  return off;
 }
+
+static void categories_init(void);
+
+static void arena_init_lock(ArenaHeader* h, int shared) {
+#ifndef _WIN32
+  pthread_mutexattr_t attr;
+  pthread_mutexattr_init(&attr);
+  if (shared) pthread_mutexattr_setpshared(&attr, PTHREAD_PROCESS_SHARED);
+#ifdef PTHREAD_MUTEX_ROBUST
+  // A worker killed mid-call must not wedge every other worker.
+  if (shared) pthread_mutexattr_setrobust(&attr, PTHREAD_MUTEX_ROBUST);
+#endif
+  pthread_mutex_init(&h->lock, &attr);
+  pthread_mutexattr_destroy(&attr);
+#else
+  (void)h; (void)shared;
+#endif
+}
+
+// Lay out a fresh store in the mapping at `base`.
+static void arena_format(char* base, uint64_t size, const char* generation, int shared) {
+  ArenaHeader* h = (ArenaHeader*)base;
+  memset(h, 0, sizeof(ArenaHeader));
+  h->magic = ARENA_MAGIC;
+  h->version = ARENA_VERSION;
+  h->size = size;
+  snprintf(h->generation, sizeof(h->generation), "%s", generation ? generation : "");
+  h->used = (sizeof(ArenaHeader) + 15) & ~(uint64_t)15;
+  arena_init_lock(h, shared);
+  arena_base = base;
+  H = h;
+  categories_init();
+}
+
+// Take over a snapshot image already placed at `base`: only the fields that
+// describe this mapping (size, generation, lock) are rewritten.
+static void arena_adopt(char* base, uint64_t size, const char* generation, int shared) {
+  ArenaHeader* h = (ArenaHeader*)base;
+  h->size = size;
+  snprintf(h->generation, sizeof(h->generation), "%s", generation ? generation : "");
+  h->saved_changes = h->changes;
+  arena_init_lock(h, shared);
+  arena_base = base;
+  H = h;
+}
+
+// Whether `h` (read from a file of `file_size` bytes) is a snapshot this
+// build can use.
+static int snapshot_valid(const ArenaHeader* h, uint64_t file_size) {
+  return h->magic == ARENA_MAGIC && h->version == ARENA_VERSION &&
+         h->used >= sizeof(ArenaHeader) && h->used <= file_size && h->used <= ARENA_MAX_SIZE;
+}
+
+static uint64_t arena_round(uint64_t n) {
+  return (n + 0xFFFF) & ~(uint64_t)0xFFFF;
+}
+
+static void arena_unmap(void) {
+  if (!arena_base) return;
+#ifndef _WIN32
+  munmap(arena_base, (size_t)H->size);
+#else
+  free(arena_base);
+#endif
+  arena_base = NULL;
+  H = NULL;
+  arena_shared = 0;
+}
+
+static int arena_init_private(uint64_t size) {
+  arena_unmap();
+#ifndef _WIN32
+  // Pages are only committed once touched, so reserving generously is cheap.
+  void* base = mmap(NULL, (size_t)size, PROT_READ | PROT_WRITE, MAP_PRIVATE | MAP_ANONYMOUS | MAP_NORESERVE, -1, 0);
+  if (base == MAP_FAILED) return 0;
+#else
+  void* base = calloc(1, (size_t)size);
+  if (!base) return 0;
+#endif
+  arena_full_reported = 0;
+  arena_format((char*)base, size, "", 0);
+  return 1;
+}
+
+static void store_lock(void) {
+  if (!H) arena_init_private(EH_DEFAULT_STORE_SIZE);
+#ifndef _WIN32
+  int rc = pthread_mutex_lock(&H->lock);
+#ifdef PTHREAD_MUTEX_ROBUST
+  if (rc == EOWNERDEAD) {
+    fprintf(stderr, "eventhub: a process died holding the store lock; continuing with its partial update\n");
+    pthread_mutex_consistent(&H->lock);
+  }
+#else
+  (void)rc;
+#endif
+#endif
+}
+
+static void store_unlock(void) {
+#ifndef _WIN32
+  pthread_mutex_unlock(&H->lock);
+#endif
+}
+
+/* =========================
+   Users Hash Table
+   ========================= */
+typedef struct UserNode {
+  eh_off user_id;
+  eh_off pwd_hash;
+  eh_off next;
+} UserNode;
+
 static UserNode* users_ht_get(const char* user_id) {
   unsigned long h = hash_str(user_id) % USERS_BUCKETS;
-  UserNode* n = users_ht[h];
+  UserNode* n = REC(UserNode, H->users_ht[h]);
   while (n) {
-    if (streq(n->user_id, user_id)) return n;
-    n = n->next;
+    if (streq(S(n->user_id), user_id)) return n;
+    n = REC(UserNode, n->next);
   }
   return NULL;
 }
 static int users_ht_set(const char* user_id, const char* pwd_hash) {
   unsigned long h = hash_str(user_id) % USERS_BUCKETS;
-  UserNode* n = users_ht[h];
+  UserNode* n = REC(UserNode, H->users_ht[h]);
   while (n) {
-    if (streq(n->user_id, user_id)) {
+    if (streq(S(n->user_id), user_id)) {
       // update
-      free(n->pwd_hash);
-      n->pwd_hash = eh_strdup(pwd_hash);
+      eh_off nh = arena_strdup(pwd_hash);
+      if (!nh) return 0;
+      arena_free(n->pwd_hash);
+      n->pwd_hash = nh;
       return 1;
     }
-    n = n->next;
+    n = REC(UserNode, n->next);
   }
   // insert
-  UserNode* u = (UserNode*)calloc(1, sizeof(UserNode));
-  if (!u) return 0;
-  u->user_id = eh_strdup(user_id);
-  u->pwd_hash = eh_strdup(pwd_hash);
-  u->next = users_ht[h];
-  users_ht[h] = u;
+  eh_off uo = arena_alloc(sizeof(UserNode));
+  eh_off id = arena_strdup(user_id);
+  eh_off ph = arena_strdup(pwd_hash);
+  if (!uo || !id || !ph) { arena_free(uo); arena_free(id); arena_free(ph); return 0; }
+  UserNode* u = REC(UserNode, uo);
+  u->user_id = id;
+  u->pwd_hash = ph;
+  u->next = H->users_ht[h];
+  H->users_ht[h] = uo;
   return 1;
 }
 
-int eh_register_user(const char* user_id, const char* password_hash) {
+static int register_user(const char* user_id, const char* password_hash) {
   if (!user_id || !password_hash) return 0;
-  printf("[USERS] register user_id=%s\n", user_id);
+  EH_TRACE("[USERS] register user_id=%s\n", user_id);
   return users_ht_set(user_id, password_hash);
 }
-int eh_login_user(const char* user_id, const char* password_hash) {
+static int login_user(const char* user_id, const char* password_hash) {
   if (!user_id || !password_hash) return 0;
   UserNode* u = users_ht_get(user_id);
-  printf("[USERS] login user_id=%s result=%s\n", user_id, (u && streq(u->pwd_hash, password_hash))?"ok":"fail");
-  return (u && streq(u->pwd_hash, password_hash)) ? 1 : 0;
+  EH_TRACE("[USERS] login user_id=%s result=%s\n", user_id, (u && streq(S(u->pwd_hash), password_hash))?"ok":"fail");
+  return (u && streq(S(u->pwd_hash), password_hash)) ? 1 : 0;
 }
 
 /* =========================
    Events Hash Table + Category Tree
    ========================= */
-#define EVENTS_BUCKETS 1024
+// Waitlisted booking request; per-event min-heap ordered by seq (arrival).
+typedef struct WaitEntry {
+  eh_off   user_id;
+  int32_t  quantity;
+  uint64_t seq;
+} WaitEntry;
 
 typedef struct Event {
-  char* id;
-  char* name;
-  char* category;
-  char* venue;
-  int   total;
-  int   available;
-  struct Event* next; // hash chain
+  eh_off id;
+  eh_off name;
+  eh_off category;
+  eh_off venue;
+  eh_off date;       // "YYYY-MM-DD", 0 if not set
+  eh_off time;       // display time, 0 if not set
+  double price;
+  int32_t total;
+  int32_t available;
+  eh_off  wl;        // waitlist heap (WaitEntry array)
+  int32_t wl_len;
+  int32_t wl_cap;
+  int32_t closed;    // called off: takes no new bookings, keeps its seats
+  eh_off  next;      // hash chain
 } Event;
 
-static Event* events_ht[EVENTS_BUCKETS];
+#define WL(e) REC(WaitEntry, (e)->wl)
 
-static void events_ht_init(void) { memset(events_ht, 0, sizeof(events_ht)); }
-static void events_ht_free(void) {
-  for (size_t i = 0; i < EVENTS_BUCKETS; i++) {
-    Event* e = events_ht[i];
-    while (e) {
-      Event* tmp = e->next;
-      free(e->id);
-      free(e->name);
-      free(e->category);
-      free(e->venue);
-      free(e);
-      e = tmp;
-    }
-    events_ht[i] = NULL;
-  }
+static void waitlist_free(Event* e) {
+  WaitEntry* wl = WL(e);
+  for (int i = 0; i < e->wl_len; i++) arena_free(wl[i].user_id);
+  arena_free(e->wl);
+  e->wl = 0;
+  e->wl_len = e->wl_cap = 0;
+}
+
+static void event_free(eh_off off) {
+  Event* e = REC(Event, off);
+  waitlist_free(e);
+  arena_free(e->id);
+  arena_free(e->name);
+  arena_free(e->category);
+  arena_free(e->venue);
+  arena_free(e->date);
+  arena_free(e->time);
+  arena_free(off);
 }
+
 static Event* events_ht_get(const char* id) {
   unsigned long h = hash_str(id) % EVENTS_BUCKETS;
-  Event* e = events_ht[h];
+  Event* e = REC(Event, H->events_ht[h]);
   while (e) {
-    if (streq(e->id, id)) return e;
-    e = e->next;
+    if (streq(S(e->id), id)) return e;
+    e = REC(Event, e->next);
   }
   return NULL;
 }
-static int events_ht_set(const char* id, const char* name, const char* category, const char* venue, int total) {
+// Optional string field: 0 for NULL/empty, else a copy (0 on failure too,
+// so callers compare against the input).
+static eh_off arena_strdup_opt(const char* s) {
+  return (s && *s) ? arena_strdup(s) : 0;
+}
+
+static int events_ht_set(const char* id, const char* name, const char* category, const char* venue,
+                         const char* date, const char* time, double price, int total) {
   unsigned long h = hash_str(id) % EVENTS_BUCKETS;
-  Event* e = events_ht[h];
+  Event* e = REC(Event, H->events_ht[h]);
   while (e) {
-    if (streq(e->id, id)) {
+    if (streq(S(e->id), id)) {
       // update existing
-      free(e->name); e->name = eh_strdup(name);
-      free(e->category); e->category = eh_strdup(category);
-      free(e->venue); e->venue = eh_strdup(venue);
+      eh_off nn = arena_strdup(name), nc = arena_strdup(category), nv = arena_strdup(venue);
+      eh_off nd = arena_strdup_opt(date), nt = arena_strdup_opt(time);
+      if (!nn || !nc || !nv || (!nd && date && *date) || (!nt && time && *time)) {
+        arena_free(nn); arena_free(nc); arena_free(nv); arena_free(nd); arena_free(nt);
+        return 0;
+      }
+      arena_free(e->name); e->name = nn;
+      arena_free(e->category); e->category = nc;
+      arena_free(e->venue); e->venue = nv;
+      arena_free(e->date); e->date = nd;
+      arena_free(e->time); e->time = nt;
+      e->price = price;
       e->total = total;
       if (e->available > total) e->available = total;
       return 1;
     }
-    e = e->next;
+    e = REC(Event, e->next);
   }
   // insert
-  Event* ne = (Event*)calloc(1, sizeof(Event));
-  if (!ne) return 0;
-  ne->id = eh_strdup(id);
-  ne->name = eh_strdup(name);
-  ne->category = eh_strdup(category);
-  ne->venue = eh_strdup(venue);
+  eh_off off = arena_alloc(sizeof(Event));
+  if (!off) return 0;
+  Event* ne = REC(Event, off);
+  ne->id = arena_strdup(id);
+  ne->name = arena_strdup(name);
+  ne->category = arena_strdup(category);
+  ne->venue = arena_strdup(venue);
+  ne->date = arena_strdup_opt(date);
+  ne->time = arena_strdup_opt(time);
+  if (!ne->id || !ne->name || !ne->category || !ne->venue ||
+      (!ne->date && date && *date) || (!ne->time && time && *time)) { event_free(off); return 0; }
+  ne->price = price;
   ne->total = total;
   ne->available = total;
-  ne->next = events_ht[h];
-  events_ht[h] = ne;
+  ne->next = H->events_ht[h];
+  H->events_ht[h] = off;
   return 1;
 }
 static int events_ht_del(const char* id) {
   unsigned long h = hash_str(id) % EVENTS_BUCKETS;
-  Event* e = events_ht[h];
-  Event* prev = NULL;
-  while (e) {
-    if (streq(e->id, id)) {
-      if (prev) prev->next = e->next; else events_ht[h] = e->next;
-      free(e->id);
-      free(e->name);
-      free(e->category);
-      free(e->venue);
-      free(e);
+  eh_off* link = &H->events_ht[h];
+  while (*link) {
+    eh_off off = *link;
+    Event* e = REC(Event, off);
+    if (streq(S(e->id), id)) {
+      *link = e->next;
+      event_free(off);
       return 1;
     }
-    prev = e; e = e->next;
+    link = &e->next;
   }
   return 0;
 }
 
+/* =========================
+   Waitlist (per-event min-heap) + promotions
+   ========================= */
+// Bookings that could not be filled wait on their event's heap. Whenever
+// capacity comes back, waitlist_promote() confirms waiting requests and
+// records them on the promotions list, which the caller drains to persist
+// them (eh_drain_promotions).
+typedef struct Promotion {
+  eh_off  user_id;
+  eh_off  event_id;
+  int32_t quantity;
+  eh_off  next;
+} Promotion;
+
+static void wl_swap(WaitEntry* a, WaitEntry* b) { WaitEntry t = *a; *a = *b; *b = t; }
+
+static void wl_sift_up(Event* e, int i) {
+  WaitEntry* wl = WL(e);
+  while (i > 0) {
+    int parent = (i - 1) / 2;
+    if (wl[parent].seq <= wl[i].seq) break;
+    wl_swap(&wl[parent], &wl[i]);
+    i = parent;
+  }
+}
+
+static void wl_sift_down(Event* e, int i) {
+  WaitEntry* wl = WL(e);
+  for (;;) {
+    int l = 2 * i + 1, r = l + 1, m = i;
+    if (l < e->wl_len && wl[l].seq < wl[m].seq) m = l;
+    if (r < e->wl_len && wl[r].seq < wl[m].seq) m = r;
+    if (m == i) break;
+    wl_swap(&wl[m], &wl[i]);
+    i = m;
+  }
+}
+
+static int waitlist_push(Event* e, const char* user_id, int quantity) {
+  if (e->wl_len == e->wl_cap) {
+    int cap = e->wl_cap ? e->wl_cap * 2 : 8;
+    eh_off nw = arena_alloc((size_t)cap * sizeof(WaitEntry));
+    if (!nw) return 0;
+    if (e->wl_len) memcpy(at(nw), WL(e), (size_t)e->wl_len * sizeof(WaitEntry));
+    arena_free(e->wl);
+    e->wl = nw;
+    e->wl_cap = cap;
+  }
+  eh_off uid = arena_strdup(user_id);
+  if (!uid) return 0;
+  WaitEntry* w = &WL(e)[e->wl_len];
+  w->user_id = uid;
+  w->quantity = quantity;
+  w->seq = ++H->wl_seq;
+  wl_sift_up(e, e->wl_len++);
+  return 1;
+}
+
+// Remove heap entry i; ownership of its user_id passes to the caller.
+static WaitEntry waitlist_take(Event* e, int i) {
+  WaitEntry* wl = WL(e);
+  WaitEntry out = wl[i];
+  wl[i] = wl[--e->wl_len];
+  if (i < e->wl_len) {
+    wl_sift_down(e, i);
+    wl_sift_up(e, i);
+  }
+  return out;
+}
+
+// A promotion record for `event_id`, allocated before any state changes so
+// running out of arena space leaves the waitlist and capacity untouched.
+static eh_off promotion_new(eh_off event_id) {
+  eh_off off = arena_alloc(sizeof(Promotion));
+  eh_off eid = arena_strdup(S(event_id));
+  if (!off || !eid) { arena_free(off); arena_free(eid); return 0; }
+  REC(Promotion, off)->event_id = eid;
+  return off;
+}
+
+// Confirm waitlist entry i of `e` into the promotion `off` from promotion_new.
+static void promotion_append(Event* e, int i, eh_off off) {
+  WaitEntry w = waitlist_take(e, i);
+  e->available -= w.quantity;
+  Promotion* p = REC(Promotion, off);
+  p->user_id = w.user_id;
+  p->quantity = w.quantity;
+  if (H->p_tail) REC(Promotion, H->p_tail)->next = off; else H->p_head = off;
+  H->p_tail = off;
+}
+
+// Fill returned capacity from the waitlist: first in arrival order while
+// the oldest request fits, then a best-fit pass (largest request that still
+// fits, oldest first on ties) so small requests can use the remaining gap.
+// Stops early if the arena is full; the rest stay waiting for the next one.
+static int waitlist_promote(Event* e) {
+  int promoted = 0, full = 0;
+  while (e->wl_len > 0 && WL(e)[0].quantity <= e->available) {
+    eh_off off = promotion_new(e->id);
+    if (!off) { full = 1; break; }
+    promotion_append(e, 0, off);
+    promoted++;
+  }
+  while (!full && e->wl_len > 0 && e->available > 0) {
+    WaitEntry* wl = WL(e);
+    int best = -1;
+    for (int i = 0; i < e->wl_len; i++) {
+      int q = wl[i].quantity;
+      if (q > e->available) continue;
+      if (best < 0 || q > wl[best].quantity ||
+          (q == wl[best].quantity && wl[i].seq < wl[best].seq)) best = i;
+    }
+    if (best < 0) break;
+    eh_off off = promotion_new(e->id);
+    if (!off) break;
+    promotion_append(e, best, off);
+    promoted++;
+  }
+  if (promoted) EH_TRACE("[WAITLIST] promoted %d request(s) event=%s available=%d waiting=%d\n", promoted, S(e->id), e->available, e->wl_len);
+  return promoted;
+}
+
 // Category Tree: fixed root categories; Each node holds event IDs list
 typedef struct CatEventNode {
-  char* event_id;
-  struct CatEventNode* next;
+  eh_off event_id;
+  eh_off next;
 } CatEventNode;
 
 typedef struct CategoryNode {
-  char* name;
-  CatEventNode* events;      // linked list of event ids in this category
-  struct CategoryNode* next; // siblings (we use a simple list for the four root categories)
+  eh_off name;
+  eh_off events;  // linked list of event ids in this category
+  eh_off next;    // siblings (we use a simple list for the four root categories)
 } CategoryNode;
 
-static CategoryNode* categories_root = NULL;
-
 static CategoryNode* category_find(const char* name) {
-  CategoryNode* c = categories_root;
+  CategoryNode* c = REC(CategoryNode, H->categories_root);
   while (c) {
-    if (streq(c->name, name)) return c;
-    c = c->next;
+    if (streq(S(c->name), name)) return c;
+    c = REC(CategoryNode, c->next);
   }
   return NULL;
 }
@@ -221,103 +697,101 @@ static void category_add_event(const char* category, const char* event_id) {
   CategoryNode* c = category_find(category);
   if (!c) return;
   // prevent duplicates
-  CatEventNode* n = c->events;
+  CatEventNode* n = REC(CatEventNode, c->events);
   while (n) {
-    if (streq(n->event_id, event_id)) return;
-    n = n->next;
+    if (streq(S(n->event_id), event_id)) return;
+    n = REC(CatEventNode, n->next);
   }
   // prepend
-  CatEventNode* ce = (CatEventNode*)calloc(1, sizeof(CatEventNode));
-  if (!ce) return;
-  ce->event_id = eh_strdup(event_id);
+  eh_off off = arena_alloc(sizeof(CatEventNode));
+  eh_off eid = arena_strdup(event_id);
+  if (!off || !eid) { arena_free(off); arena_free(eid); return; }
+  CatEventNode* ce = REC(CatEventNode, off);
+  ce->event_id = eid;
   ce->next = c->events;
-  c->events = ce;
+  c->events = off;
 }
 
 static void category_remove_event(const char* category, const char* event_id) {
   CategoryNode* c = category_find(category);
   if (!c) return;
-  CatEventNode* n = c->events;
-  CatEventNode* prev = NULL;
-  while (n) {
-    if (streq(n->event_id, event_id)) {
-      if (prev) prev->next = n->next; else c->events = n->next;
-      free(n->event_id); free(n);
+  eh_off* link = &c->events;
+  while (*link) {
+    eh_off off = *link;
+    CatEventNode* n = REC(CatEventNode, off);
+    if (streq(S(n->event_id), event_id)) {
+      *link = n->next;
+      arena_free(n->event_id); arena_free(off);
       return;
     }
-    prev = n; n = n->next;
+    link = &n->next;
   }
 }
 
 static void categories_init(void) {
   // Create four root categories: Movies, Plays, Sports, Concerts
   const char* names[4] = {"Movies","Plays","Sports","Concerts"};
-  CategoryNode* head = NULL;
-  CategoryNode* tail = NULL;
+  eh_off* link = &H->categories_root;
   for (int i = 0; i < 4; i++) {
-    CategoryNode* c = (CategoryNode*)calloc(1, sizeof(CategoryNode));
-    c->name = eh_strdup(names[i]);
-    c->events = NULL;
-    c->next = NULL;
-    if (!head) { head = tail = c; } else { tail->next = c; tail = c; }
+    eh_off off = arena_alloc(sizeof(CategoryNode));
+    REC(CategoryNode, off)->name = arena_strdup(names[i]);
+    *link = off;
+    link = &REC(CategoryNode, off)->next;
   }
-  categories_root = head;
 }
 
-static void categories_free(void) {
-  CategoryNode* c = categories_root;
-  while (c) {
-    CategoryNode* tmp = c->next;
-    CatEventNode* e = c->events;
-    while (e) {
-      CatEventNode* et = e->next;
-      free(e->event_id);
-      free(e);
-      e = et;
-    }
-    free(c->name);
-    free(c);
-    c = tmp;
-  }
-  categories_root = NULL;
-}
-
-int eh_add_event(const char* event_id, const char* name, const char* category, const char* venue, int total_tickets) {
-  if (!event_id || !name || !category || !venue || total_tickets < 0) return 0;
+static int add_event(const char* event_id, const char* name, const char* category, const char* venue,
+                     const char* date, const char* time, double price, int total_tickets) {
+  if (!event_id || !name || !category || !venue || total_tickets < 0 || !(price >= 0)) return 0;
   if (!streq(category,"Movies") && !streq(category,"Plays") && !streq(category,"Sports") && !streq(category,"Concerts")) {
-    printf("[EVENTS] add_event rejected id=%s name=%s category=%s venue=%s total=%d\n", event_id, name, category, venue, total_tickets);
+    EH_TRACE("[EVENTS] add_event rejected id=%s name=%s category=%s venue=%s total=%d\n", event_id, name, category, venue, total_tickets);
     return 0;
   }
-  printf("[EVENTS] add_event id=%s name=%s category=%s venue=%s total=%d\n", event_id, name, category, venue, total_tickets);
-  if (!events_ht_set(event_id, name, category, venue, total_tickets)) return 0;
+  EH_TRACE("[EVENTS] add_event id=%s name=%s category=%s venue=%s total=%d\n", event_id, name, category, venue, total_tickets);
+  if (!events_ht_set(event_id, name, category, venue, date, time, price, total_tickets)) return 0;
   category_add_event(category, event_id);
   return 1;
 }
 
-int eh_delete_event(const char* event_id) {
+static int delete_event(const char* event_id) {
   if (!event_id) return 0;
-  printf("[EVENTS] delete_event id=%s\n", event_id);
+  EH_TRACE("[EVENTS] delete_event id=%s\n", event_id);
   Event* e = events_ht_get(event_id);
   if (!e) return 0;
-  category_remove_event(e->category, event_id);
+  category_remove_event(S(e->category), event_id);
   return events_ht_del(event_id);
 }
 
-char* eh_search_event(const char* event_id) {
+// Call an event off without deleting it: no further bookings are taken and
+// its seats are not sold again. Returns 0 for an unknown event.
+static int close_event(const char* event_id) {
+  Event* e = event_id ? events_ht_get(event_id) : NULL;
+  if (!e) return 0;
+  EH_TRACE("[EVENTS] close_event id=%s\n", event_id);
+  e->closed = 1;
+  e->available = 0;
+  return 1;
+}
+
+static char* search_event(const char* event_id) {
   if (!event_id) return NULL;
   Event* e = events_ht_get(event_id);
-  printf("[EVENTS] search_event id=%s found=%s\n", event_id, e?"yes":"no");
+  EH_TRACE("[EVENTS] search_event id=%s found=%s\n", event_id, e?"yes":"no");
   if (!e) return NULL;
-  // build JSON
-  char buf[1024];
-  snprintf(buf, sizeof(buf),
-    "{\"id\":\"%s\",\"name\":\"%s\",\"category\":\"%s\",\"venue\":\"%s\",\"total\":%d,\"available\":%d}",
-    e->id, e->name, e->category, e->venue, e->total, e->available);
-  return eh_strdup(buf);
+  JsonBuf b = {0};
+  jb_lit(&b, "{\"id\":");         jb_str(&b, S(e->id));
+  jb_lit(&b, ",\"name\":");       jb_str(&b, S(e->name));
+  jb_lit(&b, ",\"category\":");   jb_str(&b, S(e->category));
+  jb_lit(&b, ",\"venue\":");      jb_str(&b, S(e->venue));
+  jb_lit(&b, ",\"date\":");       jb_str_or_null(&b, S(e->date));
+  jb_lit(&b, ",\"time\":");       jb_str_or_null(&b, S(e->time));
+  jb_fmt(&b, ",\"price\":%.15g,\"total\":%d,\"available\":%d,\"waitlist\":%d,\"closed\":%s}",
+         e->price, e->total, e->available, e->wl_len, e->closed ? "true" : "false");
+  return jb_finish(&b);
 }
 
-char* eh_list_categories_tree(void) {
-  printf("[EVENTS] list_categories_tree\n");
+static char* list_categories_tree(void) {
+  EH_TRACE("[EVENTS] list_categories_tree\n");
   // Build JSON: [{ "name": "...", "events": ["id1","id2"] }, ...]
   // Simple buffer growth strategy
   size_t cap = 4096;
@@ -339,22 +813,22 @@ char* eh_list_categories_tree(void) {
   } while (0)
 
   APPEND_FMT("%s","[");
-  CategoryNode* c = categories_root;
+  CategoryNode* c = REC(CategoryNode, H->categories_root);
   int firstCat = 1;
   while (c) {
     if (!firstCat) APPEND_FMT("%s",",");
     firstCat = 0;
-    APPEND_FMT("{\"name\":\"%s\",\"events\":[", c->name);
-    CatEventNode* e = c->events;
+    APPEND_FMT("{\"name\":\"%s\",\"events\":[", S(c->name));
+    CatEventNode* e = REC(CatEventNode, c->events);
     int firstEv = 1;
     while (e) {
       if (!firstEv) APPEND_FMT("%s",",");
       firstEv = 0;
-      APPEND_FMT("\"%s\"", e->event_id);
-      e = e->next;
+      APPEND_FMT("\"%s\"", S(e->event_id));
+      e = REC(CatEventNode, e->next);
     }
     APPEND_FMT("%s","]}");
-    c = c->next;
+    c = REC(CategoryNode, c->next);
   }
   APPEND_FMT("%s","]");
   #undef APPEND_FMT
@@ -365,97 +839,113 @@ char* eh_list_categories_tree(void) {
    Booking Queue
    ========================= */
 typedef struct BookingReq {
-  char* user_id;
-  char* event_id;
-  int quantity;
-  struct BookingReq* next;
+  eh_off  user_id;
+  eh_off  event_id;
+  int32_t quantity;
+  eh_off  next;
 } BookingReq;
 
-static BookingReq* q_head = NULL;
-static BookingReq* q_tail = NULL;
+static void request_free(eh_off off) {
+  BookingReq* r = REC(BookingReq, off);
+  arena_free(r->user_id); arena_free(r->event_id); arena_free(off);
+}
 
-int eh_book_tickets(const char* user_id, const char* event_id, int quantity) {
+static int book_tickets(const char* user_id, const char* event_id, int quantity) {
   if (!user_id || !event_id || quantity <= 0) return 0;
-  BookingReq* br = (BookingReq*)calloc(1, sizeof(BookingReq));
-  if (!br) return 0;
-  br->user_id = eh_strdup(user_id);
-  br->event_id = eh_strdup(event_id);
+  eh_off off = arena_alloc(sizeof(BookingReq));
+  if (!off) return 0;
+  BookingReq* br = REC(BookingReq, off);
+  br->user_id = arena_strdup(user_id);
+  br->event_id = arena_strdup(event_id);
+  if (!br->user_id || !br->event_id) { request_free(off); return 0; }
   br->quantity = quantity;
-  br->next = NULL;
-  if (!q_tail) { q_head = q_tail = br; }
-  else { q_tail->next = br; q_tail = br; }
-  printf("[QUEUE] book_tickets enqueue user=%s event=%s qty=%d\n", user_id, event_id, quantity);
+  br->next = 0;
+  if (!H->q_tail) { H->q_head = H->q_tail = off; }
+  else { REC(BookingReq, H->q_tail)->next = off; H->q_tail = off; }
+  EH_TRACE("[QUEUE] book_tickets enqueue user=%s event=%s qty=%d\n", user_id, event_id, quantity);
   return 1;
 }
 
-char* eh_process_next_booking(void) {
-  if (!q_head) {
-    printf("[QUEUE] process_next empty\n");
+static char* process_next_booking(void) {
+  if (!H->q_head) {
+    EH_TRACE("[QUEUE] process_next empty\n");
     return eh_strdup("{\"status\":\"empty\",\"message\":\"No pending bookings\"}");
   }
-  BookingReq* br = q_head;
-  q_head = br->next;
-  if (!q_head) q_tail = NULL;
+  eh_off off = H->q_head;
+  BookingReq* br = REC(BookingReq, off);
+  H->q_head = br->next;
+  if (!H->q_head) H->q_tail = 0;
 
-  Event* e = events_ht_get(br->event_id);
-  int ok = 0;
-  if (e && e->available >= br->quantity) {
+  const char* user_id = S(br->user_id);
+  const char* event_id = S(br->event_id);
+  Event* e = events_ht_get(event_id);
+  int ok = 0, waitlisted = 0;
+  if (e && e->closed) {
+    // called off after this request was queued: fail it below
+  } else if (e && e->available >= br->quantity) {
     e->available -= br->quantity;
     ok = 1;
+  } else if (e && br->quantity <= e->total && waitlist_push(e, user_id, br->quantity)) {
+    waitlisted = 1;
   }
-  char buf[512];
+  JsonBuf b = {0};
   if (ok) {
-    snprintf(buf, sizeof(buf),
-      "{\"status\":\"ok\",\"user\":\"%s\",\"event\":\"%s\",\"quantity\":%d,\"remaining\":%d}",
-      br->user_id, br->event_id, br->quantity, e ? e->available : -1);
-    printf("[QUEUE] processed OK user=%s event=%s qty=%d remaining=%d\n", br->user_id, br->event_id, br->quantity, e?e->available:-1);
+    jb_lit(&b, "{\"status\":\"ok\",");
+    jb_request(&b, user_id, event_id, br->quantity);
+    jb_fmt(&b, ",\"remaining\":%d}", e ? e->available : -1);
+    EH_TRACE("[QUEUE] processed OK user=%s event=%s qty=%d remaining=%d\n", user_id, event_id, br->quantity, e?e->available:-1);
+  } else if (waitlisted) {
+    jb_lit(&b, "{\"status\":\"waitlisted\",");
+    jb_request(&b, user_id, event_id, br->quantity);
+    jb_fmt(&b, ",\"waiting\":%d}", e->wl_len);
+    EH_TRACE("[QUEUE] processed WAITLIST user=%s event=%s qty=%d waiting=%d\n", user_id, event_id, br->quantity, e->wl_len);
   } else {
-    snprintf(buf, sizeof(buf),
-      "{\"status\":\"fail\",\"user\":\"%s\",\"event\":\"%s\",\"quantity\":%d,\"reason\":\"insufficient or unknown event\"}",
-      br->user_id, br->event_id, br->quantity);
-    printf("[QUEUE] processed FAIL user=%s event=%s qty=%d\n", br->user_id, br->event_id, br->quantity);
+    jb_lit(&b, "{\"status\":\"fail\",");
+    jb_request(&b, user_id, event_id, br->quantity);
+    jb_lit(&b, (e && e->closed) ? ",\"reason\":\"event cancelled\"}" : ",\"reason\":\"insufficient or unknown event\"}");
+    EH_TRACE("[QUEUE] processed FAIL user=%s event=%s qty=%d\n", user_id, event_id, br->quantity);
   }
 
-  free(br->user_id); free(br->event_id); free(br);
-  return eh_strdup(buf);
+  request_free(off);
+  return jb_finish(&b);
 }
 
 /* =========================
    Cancellation Stack
    ========================= */
-typedef struct CancelReq {
-  char* user_id;
-  char* event_id;
-  int quantity;
-  struct CancelReq* next;
-} CancelReq;
+typedef BookingReq CancelReq;   // same record, linked as a stack
 
-static CancelReq* s_top = NULL;
-
-int eh_cancel_tickets(const char* user_id, const char* event_id, int quantity) {
+static int cancel_tickets(const char* user_id, const char* event_id, int quantity) {
   if (!user_id || !event_id || quantity <= 0) return 0;
-  CancelReq* cr = (CancelReq*)calloc(1, sizeof(CancelReq));
-  if (!cr) return 0;
-  cr->user_id = eh_strdup(user_id);
-  cr->event_id = eh_strdup(event_id);
+  eh_off off = arena_alloc(sizeof(CancelReq));
+  if (!off) return 0;
+  CancelReq* cr = REC(CancelReq, off);
+  cr->user_id = arena_strdup(user_id);
+  cr->event_id = arena_strdup(event_id);
+  if (!cr->user_id || !cr->event_id) { request_free(off); return 0; }
   cr->quantity = quantity;
-  cr->next = s_top;
-  s_top = cr;
-  printf("[STACK] cancel_tickets push user=%s event=%s qty=%d\n", user_id, event_id, quantity);
+  cr->next = H->s_top;
+  H->s_top = off;
+  EH_TRACE("[STACK] cancel_tickets push user=%s event=%s qty=%d\n", user_id, event_id, quantity);
   return 1;
 }
 
-char* eh_process_last_cancellation(void) {
-  if (!s_top) {
-    printf("[STACK] process_last empty\n");
+static char* process_last_cancellation(void) {
+  if (!H->s_top) {
+    EH_TRACE("[STACK] process_last empty\n");
     return eh_strdup("{\"status\":\"empty\",\"message\":\"No cancellations to process\"}");
   }
-  CancelReq* cr = s_top;
-  s_top = cr->next;
+  eh_off off = H->s_top;
+  CancelReq* cr = REC(CancelReq, off);
+  H->s_top = cr->next;
 
-  Event* e = events_ht_get(cr->event_id);
-  int ok = 0;
-  if (e) {
+  const char* user_id = S(cr->user_id);
+  const char* event_id = S(cr->event_id);
+  Event* e = events_ht_get(event_id);
+  int ok = 0, promoted = 0;
+  if (e && e->closed) {
+    ok = 1;  // seats of a called-off event are not sold again
+  } else if (e) {
     // return tickets
     if (e->available + cr->quantity <= e->total) {
       e->available += cr->quantity;
@@ -465,112 +955,288 @@ char* eh_process_last_cancellation(void) {
       e->available = e->total;
       ok = 1;
     }
+    promoted = waitlist_promote(e);
   }
-  char buf[512];
+  JsonBuf b = {0};
   if (ok) {
-    snprintf(buf, sizeof(buf),
-      "{\"status\":\"ok\",\"user\":\"%s\",\"event\":\"%s\",\"quantity\":%d,\"available\":%d}",
-      cr->user_id, cr->event_id, cr->quantity, e ? e->available : -1);
-    printf("[STACK] processed OK user=%s event=%s qty=%d available=%d\n", cr->user_id, cr->event_id, cr->quantity, e?e->available:-1);
+    jb_lit(&b, "{\"status\":\"ok\",");
+    jb_request(&b, user_id, event_id, cr->quantity);
+    jb_fmt(&b, ",\"available\":%d,\"promoted\":%d}", e ? e->available : -1, promoted);
+    EH_TRACE("[STACK] processed OK user=%s event=%s qty=%d available=%d\n", user_id, event_id, cr->quantity, e?e->available:-1);
   } else {
-    snprintf(buf, sizeof(buf),
-      "{\"status\":\"fail\",\"user\":\"%s\",\"event\":\"%s\",\"quantity\":%d,\"reason\":\"unknown event\"}",
-      cr->user_id, cr->event_id, cr->quantity);
-    printf("[STACK] processed FAIL user=%s event=%s qty=%d\n", cr->user_id, cr->event_id, cr->quantity);
+    jb_lit(&b, "{\"status\":\"fail\",");
+    jb_request(&b, user_id, event_id, cr->quantity);
+    jb_lit(&b, ",\"reason\":\"unknown event\"}");
+    EH_TRACE("[STACK] processed FAIL user=%s event=%s qty=%d\n", user_id, event_id, cr->quantity);
   }
 
-  free(cr->user_id); free(cr->event_id); free(cr);
-  return eh_strdup(buf);
+  request_free(off);
+  return jb_finish(&b);
 }
 
-/* =========================
-   Venues Graph + Dijkstra
-   ========================= */
-#define VENUE_BUCKETS 257
+// Pop up to `max_items` pending cancellations in one call and hand them to the
+// caller (which validates them against the booking ledger). Returns a JSON
+// array in arrival order: [{"user":"..","event":"..","quantity":N}, ...]
+static char* drain_cancellations(int max_items) {
+  if (max_items <= 0) max_items = INT_MAX;
+  // Detach the top `max_items` nodes, reversing them so the oldest comes first.
+  eh_off batch = 0;
+  int count = 0;
+  while (H->s_top && count < max_items) {
+    eh_off off = H->s_top;
+    CancelReq* cr = REC(CancelReq, off);
+    H->s_top = cr->next;
+    cr->next = batch;
+    batch = off;
+    count++;
+  }
 
-typedef struct Venue Venue;
-typedef struct Edge Edge;
+  JsonBuf b = {0};
+  jb_lit(&b, "[");
+  for (eh_off off = batch; off; off = REC(CancelReq, off)->next) {
+    CancelReq* cr = REC(CancelReq, off);
+    jb_lit(&b, off == batch ? "{" : ",{");
+    jb_request(&b, S(cr->user_id), S(cr->event_id), cr->quantity);
+    jb_lit(&b, "}");
+  }
+  jb_lit(&b, "]");
+  char* json = jb_finish(&b);
 
-struct Edge {
-  Venue* to;
-  int w;
-  Edge* next;
-};
+  if (!json) {
+    // Out of memory: put the batch back (newest on top) so nothing is lost.
+    while (batch) {
+      eh_off off = batch;
+      CancelReq* cr = REC(CancelReq, off);
+      batch = cr->next;
+      cr->next = H->s_top;
+      H->s_top = off;
+    }
+    return NULL;
+  }
+  while (batch) {
+    eh_off next = REC(CancelReq, batch)->next;
+    request_free(batch);
+    batch = next;
+  }
+  EH_TRACE("[STACK] drained %d cancellation(s)\n", count);
+  return json;
+}
 
-struct Venue {
-  char* name;
-  int id;      // index for Dijkstra arrays
-  Edge* adj;   // adjacency list
-  Venue* next; // hash chain
-};
+// Return `quantity` validated tickets to an event's capacity (never above its
+// total). Returns the new available count, or -1 for an unknown event. A
+// closed event keeps its seats off sale.
+static int release_tickets(const char* event_id, int quantity) {
+  if (!event_id || quantity <= 0) return -1;
+  Event* e = events_ht_get(event_id);
+  if (!e) return -1;
+  if (e->closed) return e->available;
+  e->available += quantity;
+  if (e->available > e->total) e->available = e->total;
+  EH_TRACE("[EVENTS] release_tickets event=%s qty=%d available=%d\n", event_id, quantity, e->available);
+  waitlist_promote(e);
+  return e->available;
+}
 
-static Venue* venues_ht[VENUE_BUCKETS];
-static int venue_count = 0;
+// Remove every queued booking and pending cancellation that references
+// `event_id`, in a single pass over the queue and the stack. Used when an
+// event is deleted or called off so no request is left pointing at it. The
+// unfilled booking requests dropped (queued, waitlisted, promoted but not
+// yet drained) are listed so their users can be told.
+static char* purge_event_requests(const char* event_id) {
+  if (!event_id) return NULL;
+  int bookings = 0, cancellations = 0, listed = 0;
+  JsonBuf b = {0};
+  jb_lit(&b, "{\"requests\":[");
 
-static void venues_init(void) {
-  memset(venues_ht, 0, sizeof(venues_ht));
-  venue_count = 0;
+  eh_off prev = 0;
+  eh_off off = H->q_head;
+  while (off) {
+    BookingReq* br = REC(BookingReq, off);
+    eh_off next = br->next;
+    if (streq(S(br->event_id), event_id)) {
+      jb_lit(&b, listed++ ? ",{" : "{");
+      jb_request(&b, S(br->user_id), event_id, br->quantity);
+      jb_lit(&b, "}");
+      if (prev) REC(BookingReq, prev)->next = next; else H->q_head = next;
+      if (H->q_tail == off) H->q_tail = prev;
+      request_free(off);
+      bookings++;
+    } else {
+      prev = off;
+    }
+    off = next;
+  }
+
+  eh_off* link = &H->s_top;
+  while (*link) {
+    eh_off cur = *link;
+    CancelReq* cr = REC(CancelReq, cur);
+    if (streq(S(cr->event_id), event_id)) {
+      *link = cr->next;
+      request_free(cur);
+      cancellations++;
+    } else {
+      link = &cr->next;
+    }
+  }
+
+  // Waiting requests, and promotions not yet drained, are unfilled bookings too.
+  int waitlisted = 0;
+  Event* e = events_ht_get(event_id);
+  if (e) {
+    WaitEntry* wl = WL(e);
+    for (int i = 0; i < e->wl_len; i++) {
+      jb_lit(&b, listed++ ? ",{" : "{");
+      jb_request(&b, S(wl[i].user_id), event_id, wl[i].quantity);
+      jb_lit(&b, "}");
+    }
+    waitlisted = e->wl_len;
+    waitlist_free(e);
+  }
+  eh_off pprev = 0;
+  eh_off po = H->p_head;
+  while (po) {
+    Promotion* p = REC(Promotion, po);
+    eh_off next = p->next;
+    if (streq(S(p->event_id), event_id)) {
+      jb_lit(&b, listed++ ? ",{" : "{");
+      jb_request(&b, S(p->user_id), event_id, p->quantity);
+      jb_lit(&b, "}");
+      if (pprev) REC(Promotion, pprev)->next = next; else H->p_head = next;
+      if (H->p_tail == po) H->p_tail = pprev;
+      arena_free(p->user_id); arena_free(p->event_id); arena_free(po);
+      bookings++;
+    } else {
+      pprev = po;
+    }
+    po = next;
+  }
+
+  jb_lit(&b, "],\"event\":");
+  jb_str(&b, event_id);
+  jb_fmt(&b, ",\"bookings\":%d,\"cancellations\":%d,\"waitlisted\":%d}", bookings, cancellations, waitlisted);
+  EH_TRACE("[QUEUE] purge event=%s bookings=%d cancellations=%d waitlisted=%d\n", event_id, bookings, cancellations, waitlisted);
+  return jb_finish(&b);
 }
-static void venues_free(void) {
-  for (size_t i = 0; i < VENUE_BUCKETS; i++) {
-    Venue* v = venues_ht[i];
-    while (v) {
-      Venue* tmp = v->next;
-      Edge* e = v->adj;
-      while (e) { Edge* et = e->next; free(e); e = et; }
-      free(v->name);
-      free(v);
-      v = tmp;
+
+// Bulk capacity lookup for pricing: fills available[i]/total[i] for each id
+// (-1/-1 when unknown) and returns how many were found.
+static int event_capacity(const char** event_ids, int n, int* available, int* total) {
+  if (!event_ids || !available || !total || n <= 0) return 0;
+  int found = 0;
+  for (int i = 0; i < n; i++) {
+    Event* e = event_ids[i] ? events_ht_get(event_ids[i]) : NULL;
+    if (e) {
+      available[i] = e->available;
+      total[i] = e->total;
+      found++;
+    } else {
+      available[i] = total[i] = -1;
     }
-    venues_ht[i] = NULL;
   }
-  venue_count = 0;
+  return found;
+}
+
+// Hand confirmed waitlist promotions (oldest first) to the caller so it can
+// record them: [{"user":"..","event":"..","quantity":N}, ...]
+static char* drain_promotions(int max_items) {
+  if (max_items <= 0) max_items = INT_MAX;
+  // Write the JSON first and unlink only once it is complete, so a failed
+  // allocation leaves every promotion queued.
+  JsonBuf b = {0};
+  int count = 0;
+  jb_lit(&b, "[");
+  for (eh_off off = H->p_head; off && count < max_items; off = REC(Promotion, off)->next) {
+    Promotion* p = REC(Promotion, off);
+    jb_lit(&b, count ? ",{" : "{");
+    jb_request(&b, S(p->user_id), S(p->event_id), p->quantity);
+    jb_lit(&b, "}");
+    count++;
+  }
+  jb_lit(&b, "]");
+  char* json = jb_finish(&b);
+  if (!json) return NULL;
+  while (count--) {
+    eh_off off = H->p_head;
+    Promotion* p = REC(Promotion, off);
+    H->p_head = p->next;
+    if (!H->p_head) H->p_tail = 0;
+    arena_free(p->user_id); arena_free(p->event_id); arena_free(off);
+  }
+  return json;
+}
+
+static int waitlist_length(const char* event_id) {
+  Event* e = event_id ? events_ht_get(event_id) : NULL;
+  return e ? e->wl_len : -1;
 }
+
+/* =========================
+   Venues Graph + Dijkstra
+   ========================= */
+typedef struct Venue {
+  eh_off  name;
+  int32_t id;     // index for Dijkstra arrays
+  eh_off  adj;    // adjacency list (Edge)
+  eh_off  next;   // hash chain
+} Venue;
+
+typedef struct Edge {
+  eh_off  to;     // Venue
+  int32_t w;
+  eh_off  next;
+} Edge;
+
 static Venue* venues_get(const char* name) {
   unsigned long h = hash_str(name) % VENUE_BUCKETS;
-  Venue* v = venues_ht[h];
+  Venue* v = REC(Venue, H->venues_ht[h]);
   while (v) {
-    if (streq(v->name, name)) return v;
-    v = v->next;
+    if (streq(S(v->name), name)) return v;
+    v = REC(Venue, v->next);
   }
   return NULL;
 }
-static Venue* venues_put(const char* name) {
+static eh_off venues_put(const char* name) {
   unsigned long h = hash_str(name) % VENUE_BUCKETS;
-  Venue* v = venues_ht[h];
-  while (v) {
-    if (streq(v->name, name)) return v; // exists
-    v = v->next;
+  eh_off off = H->venues_ht[h];
+  while (off) {
+    Venue* v = REC(Venue, off);
+    if (streq(S(v->name), name)) return off; // exists
+    off = v->next;
   }
   // new
-  Venue* nv = (Venue*)calloc(1, sizeof(Venue));
-  if (!nv) return NULL;
-  nv->name = eh_strdup(name);
-  nv->id = venue_count++;
-  nv->adj = NULL;
-  nv->next = venues_ht[h];
-  venues_ht[h] = nv;
-  return nv;
+  off = arena_alloc(sizeof(Venue));
+  eh_off nm = arena_strdup(name);
+  if (!off || !nm) { arena_free(off); arena_free(nm); return 0; }
+  Venue* nv = REC(Venue, off);
+  nv->name = nm;
+  nv->id = H->venue_count++;
+  nv->adj = 0;
+  nv->next = H->venues_ht[h];
+  H->venues_ht[h] = off;
+  return off;
 }
 
-int eh_add_venue(const char* venue_name) {
+static int add_venue(const char* venue_name) {
   if (!venue_name) return 0;
-  printf("[GRAPH] add_venue name=%s\n", venue_name);
-  return venues_put(venue_name) != NULL;
+  EH_TRACE("[GRAPH] add_venue name=%s\n", venue_name);
+  return venues_put(venue_name) != 0;
 }
 
-int eh_add_path(const char* from_venue, const char* to_venue, int distance) {
+static int add_path(const char* from_venue, const char* to_venue, int distance) {
   if (!from_venue || !to_venue || distance <= 0) return 0;
-  printf("[GRAPH] add_path %s -> %s dist=%d\n", from_venue, to_venue, distance);
-  Venue* a = venues_put(from_venue);
-  Venue* b = venues_put(to_venue);
+  EH_TRACE("[GRAPH] add_path %s -> %s dist=%d\n", from_venue, to_venue, distance);
+  eh_off a = venues_put(from_venue);
+  eh_off b = venues_put(to_venue);
   if (!a || !b) return 0;
   // undirected: add both ways
-  Edge* e1 = (Edge*)calloc(1, sizeof(Edge));
-  Edge* e2 = (Edge*)calloc(1, sizeof(Edge));
-  if (!e1 || !e2) { free(e1); free(e2); return 0; }
-  e1->to = b; e1->w = distance; e1->next = a->adj; a->adj = e1;
-  e2->to = a; e2->w = distance; e2->next = b->adj; b->adj = e2;
+  eh_off e1 = arena_alloc(sizeof(Edge));
+  eh_off e2 = arena_alloc(sizeof(Edge));
+  if (!e1 || !e2) { arena_free(e1); arena_free(e2); return 0; }
+  Venue* va = REC(Venue, a);
+  Venue* vb = REC(Venue, b);
+  REC(Edge, e1)->to = b; REC(Edge, e1)->w = distance; REC(Edge, e1)->next = va->adj; va->adj = e1;
+  REC(Edge, e2)->to = a; REC(Edge, e2)->w = distance; REC(Edge, e2)->next = vb->adj; vb->adj = e2;
   return 1;
 }
 
@@ -644,13 +1310,13 @@ static void heap_decrease_key(MinHeap* h, int id, int newDist) {
   heap_up(h, i);
 }
 
-char* eh_shortest_path(const char* from_venue, const char* to_venue) {
+static char* shortest_path(const char* from_venue, const char* to_venue) {
   if (!from_venue || !to_venue) return NULL;
-  printf("[GRAPH] shortest_path from=%s to=%s\n", from_venue, to_venue);
+  EH_TRACE("[GRAPH] shortest_path from=%s to=%s\n", from_venue, to_venue);
   Venue* src = venues_get(from_venue);
   Venue* dst = venues_get(to_venue);
   if (!src || !dst) return NULL;
-  int n = venue_count;
+  int n = H->venue_count;
   int* dist = (int*)malloc(sizeof(int)*n);
   int* prev = (int*)malloc(sizeof(int)*n);
   int* visited = (int*)calloc(n, sizeof(int));
@@ -666,10 +1332,10 @@ char* eh_shortest_path(const char* from_venue, const char* to_venue) {
   if (!id2v) { heap_free(h); free(dist); free(prev); free(visited); return NULL; }
   // iterate hash table
   for (int b=0;b<VENUE_BUCKETS;b++) {
-    Venue* v = venues_ht[b];
+    Venue* v = REC(Venue, H->venues_ht[b]);
     while (v) {
       id2v[v->id] = v;
-      v = v->next;
+      v = REC(Venue, v->next);
     }
   }
   for (int i=0;i<n;i++) {
@@ -684,15 +1350,15 @@ char* eh_shortest_path(const char* from_venue, const char* to_venue) {
     visited[u] = 1;
     if (u == dst->id) break;
     Venue* uv = id2v[u];
-    Edge* e = uv->adj;
+    Edge* e = REC(Edge, uv->adj);
     while (e) {
-      int v = e->to->id;
+      int v = REC(Venue, e->to)->id;
       if (!visited[v] && dist[u] != INT_MAX/2 && dist[u] + e->w < dist[v]) {
         dist[v] = dist[u] + e->w;
         prev[v] = u;
         heap_decrease_key(h, v, dist[v]);
       }
-      e = e->next;
+      e = REC(Edge, e->next);
     }
   }
 
@@ -720,9 +1386,9 @@ char* eh_shortest_path(const char* from_venue, const char* to_venue) {
     memcpy(json+len, tmp, n); len += n; json[len] = '\0'; \
   } while(0)
 
-  APP("{\"from\":\"%s\",\"to\":\"%s\",\"distance\":%d,\"path\":[", src->name, dst->name, dist[dst->id]);
+  APP("{\"from\":\"%s\",\"to\":\"%s\",\"distance\":%d,\"path\":[", S(src->name), S(dst->name), dist[dst->id]);
   for (int i=0;i<pathLen;i++) {
-    APP("%s\"%s\"", (i? ",":""), id2v[path[i]]->name);
+    APP("%s\"%s\"", (i? ",":""), S(id2v[path[i]]->name));
   }
   APP("%s","]}");
 
@@ -738,28 +1404,348 @@ char* eh_shortest_path(const char* from_venue, const char* to_venue) {
    Lifecycle
    ========================= */
 void eh_init(void) {
-  users_ht_init();
-  events_ht_init();
-  categories_init();
-  venues_init();
-  printf("[LIFECYCLE] init\n");
+  arena_init_private(EH_DEFAULT_STORE_SIZE);
+  EH_TRACE("[LIFECYCLE] init\n");
+}
+
+// Arena size for a request of `size_bytes` that must hold `used` bytes of
+// snapshot with room to grow.
+static uint64_t store_size(uint64_t size_bytes, uint64_t used) {
+  uint64_t size = size_bytes < ARENA_MIN_SIZE ? ARENA_MIN_SIZE : size_bytes;
+  if (size < used + ARENA_MIN_SIZE) size = used + ARENA_MIN_SIZE;
+  if (size > ARENA_MAX_SIZE) size = ARENA_MAX_SIZE;
+  return arena_round(size);
+}
+
+#ifndef _WIN32
+// Open the snapshot at `path` and read its header; -1 if it is missing or
+// not usable by this build.
+static int snapshot_open(const char* path, ArenaHeader* hdr) {
+  int fd = open(path, O_RDONLY);
+  if (fd < 0) {
+    if (errno != ENOENT) fprintf(stderr, "eventhub: open snapshot %s: %s\n", path, strerror(errno));
+    return -1;
+  }
+  struct stat st;
+  if (fstat(fd, &st) != 0 || (uint64_t)st.st_size < sizeof(ArenaHeader) ||
+      pread(fd, hdr, sizeof(ArenaHeader), 0) != (ssize_t)sizeof(ArenaHeader) ||
+      !snapshot_valid(hdr, (uint64_t)st.st_size)) {
+    fprintf(stderr, "eventhub: %s is not a usable snapshot; ignoring it\n", path);
+    close(fd);
+    return -1;
+  }
+  return fd;
+}
+
+static int read_full(int fd, char* buf, uint64_t n) {
+  uint64_t done = 0;
+  while (done < n) {
+    ssize_t r = pread(fd, buf + done, (size_t)(n - done), (off_t)done);
+    if (r <= 0) return 0;
+    done += (uint64_t)r;
+  }
+  return 1;
+}
+
+// Make the snapshot `snapshot` (open as `seed_fd`) the shared store at
+// `path` by hard-linking it there, so its pages are mapped rather than
+// copied and startup does not depend on its size. Called with the empty
+// store file at `path` flocked; the snapshot's inode is flocked in turn
+// before it replaces that file, so waiting processes attach only once it
+// has been adopted. Until the next eh_save_snapshot renames a fresh image
+// over it, the snapshot path names the live store, so the store is marked
+// changed to make that save happen. Returns 0, changing nothing, when the
+// two paths are on different filesystems or the snapshot was replaced
+// since it was opened; the caller then copies it in instead.
+static int store_link_snapshot(const char* path, const char* snapshot, int seed_fd,
+                               uint64_t map_size, const char* generation) {
+  char tmp[4096];
+  snprintf(tmp, sizeof(tmp), "%s.%ld.link", path, (long)getpid());
+  unlink(tmp);
+  if (link(snapshot, tmp) != 0) {
+    EH_TRACE("[LIFECYCLE] cannot link snapshot %s to %s: %s\n", snapshot, tmp, strerror(errno));
+    return 0;
+  }
+  struct stat seed_st, st;
+  int fd = open(tmp, O_RDWR);
+  if (fd < 0 || fstat(seed_fd, &seed_st) != 0 || fstat(fd, &st) != 0 ||
+      st.st_ino != seed_st.st_ino || st.st_dev != seed_st.st_dev || flock(fd, LOCK_EX) != 0 ||
+      ((uint64_t)st.st_size < map_size && ftruncate(fd, (off_t)map_size) != 0)) {
+    if (fd >= 0) close(fd);
+    unlink(tmp);
+    return 0;
+  }
+  void* base = mmap(NULL, (size_t)map_size, PROT_READ | PROT_WRITE, MAP_SHARED, fd, 0);
+  if (base == MAP_FAILED || rename(tmp, path) != 0) {
+    fprintf(stderr, "eventhub: linking snapshot %s as %s: %s\n", snapshot, path, strerror(errno));
+    if (base != MAP_FAILED) munmap(base, (size_t)map_size);
+    close(fd);
+    unlink(tmp);
+    return 0;
+  }
+  arena_unmap();
+  arena_adopt((char*)base, map_size, generation, 1);
+  H->saved_changes = H->changes + 1;
+  flock(fd, LOCK_UN);
+  close(fd);
+  return 1;
 }
+#endif
 
+// Use the snapshot at `path` as this process's private store. It is mapped
+// copy-on-write: pages come from the file only when touched and updates
+// never reach it, so startup costs the same for ten users or a million.
+// Returns 0 and keeps the current store if there is no usable snapshot.
+int eh_init_snapshot(const char* path, uint64_t size_bytes) {
+  if (!path || !*path) return 0;
+#ifndef _WIN32
+  ArenaHeader hdr;
+  int fd = snapshot_open(path, &hdr);
+  if (fd < 0) return 0;
+  uint64_t size = store_size(size_bytes, hdr.used);
+  // Reserve the whole arena, then lay the snapshot over its start.
+  void* base = mmap(NULL, (size_t)size, PROT_READ | PROT_WRITE, MAP_PRIVATE | MAP_ANONYMOUS | MAP_NORESERVE, -1, 0);
+  if (base == MAP_FAILED) { close(fd); return 0; }
+  if (mmap(base, (size_t)hdr.used, PROT_READ | PROT_WRITE, MAP_PRIVATE | MAP_FIXED, fd, 0) == MAP_FAILED) {
+    fprintf(stderr, "eventhub: mmap snapshot %s: %s\n", path, strerror(errno));
+    munmap(base, (size_t)size);
+    close(fd);
+    return 0;
+  }
+  close(fd);
+#else
+  ArenaHeader hdr;
+  FILE* f = fopen(path, "rb");
+  if (!f) return 0;
+  if (fread(&hdr, sizeof(hdr), 1, f) != 1 || fseek(f, 0, SEEK_END) != 0 || !snapshot_valid(&hdr, (uint64_t)ftell(f))) {
+    fprintf(stderr, "eventhub: %s is not a usable snapshot; ignoring it\n", path);
+    fclose(f);
+    return 0;
+  }
+  uint64_t size = store_size(size_bytes, hdr.used);
+  char* base = (char*)calloc(1, (size_t)size);
+  if (!base || fseek(f, 0, SEEK_SET) != 0 || fread(base, 1, (size_t)hdr.used, f) != (size_t)hdr.used) {
+    free(base);
+    fclose(f);
+    return 0;
+  }
+  fclose(f);
+#endif
+  arena_unmap();
+  arena_full_reported = 0;
+  arena_adopt((char*)base, size, "", 0);
+  EH_TRACE("[LIFECYCLE] init from snapshot %s used=%llu\n", path, (unsigned long long)H->used);
+  return 1;
+}
+
+// Write the store to `path` as a snapshot: the arena's used bytes, through a
+// temp file and rename so a snapshot some process has mapped is never
+// changed under it. Unless `force`, nothing is written when no mutating call
+// has run since the last snapshot (EH_SNAPSHOT_UNCHANGED); with a shared
+// store that also keeps every worker from writing the same image.
+int eh_save_snapshot(const char* path, int force) {
+  if (!path || !*path) return 0;
+  store_lock();
+  if (!force && H->changes == H->saved_changes) {
+    store_unlock();
+    return EH_SNAPSHOT_UNCHANGED;
+  }
+  // Copy under the lock (one memcpy), write to disk after releasing it.
+  uint64_t used = H->used, changes = H->changes;
+  char* image = (char*)malloc((size_t)used);
+  if (image) {
+    memcpy(image, arena_base, (size_t)used);
+    H->saved_changes = changes;
+  }
+  store_unlock();
+  if (!image) return 0;
+
+  char tmp[4096];
+  snprintf(tmp, sizeof(tmp), "%s.%ld.tmp", path, (long)getpid());
+#ifndef _WIN32
+  int tfd = open(tmp, O_WRONLY | O_CREAT | O_TRUNC, 0600);  // holds credentials
+  FILE* f = tfd >= 0 ? fdopen(tfd, "wb") : NULL;
+  if (!f && tfd >= 0) close(tfd);
+#else
+  FILE* f = fopen(tmp, "wb");
+#endif
+  int ok = f && fwrite(image, 1, (size_t)used, f) == (size_t)used && fflush(f) == 0;
+#ifndef _WIN32
+  ok = ok && fsync(fileno(f)) == 0;
+#endif
+  if (f && fclose(f) != 0) ok = 0;
+  free(image);
+#ifdef _WIN32
+  if (ok) remove(path);
+#endif
+  ok = ok && rename(tmp, path) == 0;
+  if (!ok) {
+    fprintf(stderr, "eventhub: writing snapshot %s failed: %s\n", path, strerror(errno));
+    remove(tmp);
+    store_lock();
+    if (H->saved_changes == changes) H->saved_changes = 0;  // try again next time
+    store_unlock();
+    return 0;
+  }
+  EH_TRACE("[LIFECYCLE] snapshot %s written bytes=%llu\n", path, (unsigned long long)used);
+  return 1;
+}
+
+// Map the store file at `path` MAP_SHARED. Attach/create is serialized with
+// flock on the file itself; a file stamped with another generation (an
+// earlier server run) is unlinked and replaced, never reset in place, so
+// processes still mapping it are unaffected. The process that creates the
+// store starts it from `snapshot` when one is given and usable: linked in
+// when both are on one filesystem (store_link_snapshot), copied otherwise.
+int eh_init_shared(const char* path, uint64_t size_bytes, const char* generation, const char* snapshot) {
+#ifdef _WIN32
+  (void)path; (void)size_bytes; (void)generation; (void)snapshot;
+  fprintf(stderr, "eventhub: shared store is not supported on this platform\n");
+  return 0;
+#else
+  if (!path || !*path) return 0;
+  if (!generation) generation = "";
+  uint64_t size = store_size(size_bytes, 0);
+
+  for (int attempt = 0; attempt < 8; attempt++) {
+    int fd = open(path, O_RDWR | O_CREAT, 0600);
+    if (fd < 0) {
+      fprintf(stderr, "eventhub: open %s: %s\n", path, strerror(errno));
+      return 0;
+    }
+    if (flock(fd, LOCK_EX) != 0) {
+      fprintf(stderr, "eventhub: flock %s: %s\n", path, strerror(errno));
+      close(fd);
+      return 0;
+    }
+    struct stat st, cur;
+    if (fstat(fd, &st) != 0 || stat(path, &cur) != 0 || st.st_ino != cur.st_ino || st.st_dev != cur.st_dev) {
+      // Replaced by another process between open() and flock(): use the new one.
+      close(fd);
+      continue;
+    }
+
+    ArenaHeader probe;
+    int existing = (uint64_t)st.st_size >= sizeof(ArenaHeader) &&
+                   pread(fd, &probe, offsetof(ArenaHeader, used), 0) == (ssize_t)offsetof(ArenaHeader, used);
+    if (existing && (probe.magic != ARENA_MAGIC || probe.version != ARENA_VERSION ||
+                     strncmp(probe.generation, generation, ARENA_GEN_LEN) != 0 ||
+                     probe.size > (uint64_t)st.st_size)) {
+      EH_TRACE("[LIFECYCLE] replacing store %s (generation '%.*s')\n", path, ARENA_GEN_LEN, probe.generation);
+      unlink(path);
+      close(fd);
+      continue;
+    }
+    if (!existing && st.st_size != 0) {
+      unlink(path);
+      close(fd);
+      continue;
+    }
+
+    uint64_t map_size = existing ? probe.size : size;
+    ArenaHeader seed;
+    int seed_fd = !existing && snapshot && *snapshot ? snapshot_open(snapshot, &seed) : -1;
+    if (seed_fd >= 0) map_size = store_size(size_bytes, seed.used);
+    if (seed_fd >= 0 && store_link_snapshot(path, snapshot, seed_fd, map_size, generation)) {
+      close(seed_fd);
+      close(fd);  // the empty file it replaced
+      arena_full_reported = 0;
+      arena_shared = 1;
+      EH_TRACE("[LIFECYCLE] init shared %s from linked snapshot %s used=%llu\n", path, snapshot,
+               (unsigned long long)H->used);
+      return EH_STORE_RESTORED;
+    }
+    if (!existing && ftruncate(fd, (off_t)map_size) != 0) {
+      fprintf(stderr, "eventhub: ftruncate %s: %s\n", path, strerror(errno));
+      if (seed_fd >= 0) close(seed_fd);
+      close(fd);
+      return 0;
+    }
+    void* base = mmap(NULL, (size_t)map_size, PROT_READ | PROT_WRITE, MAP_SHARED, fd, 0);
+    if (base == MAP_FAILED) {
+      fprintf(stderr, "eventhub: mmap %s: %s\n", path, strerror(errno));
+      if (seed_fd >= 0) close(seed_fd);
+      close(fd);
+      return 0;
+    }
+    arena_unmap();
+    arena_full_reported = 0;
+    int status = EH_STORE_CREATED;
+    if (existing) {
+      arena_base = (char*)base;
+      H = (ArenaHeader*)base;
+      status = EH_STORE_ATTACHED;
+    } else if (seed_fd >= 0 && read_full(seed_fd, (char*)base, seed.used)) {
+      // The snapshot could not be linked in (another filesystem), so the
+      // image is copied in once; still a read of the file rather than a
+      // replay of its records.
+      arena_adopt((char*)base, map_size, generation, 1);
+      status = EH_STORE_RESTORED;
+    } else {
+      arena_format((char*)base, map_size, generation, 1);
+    }
+    if (seed_fd >= 0) close(seed_fd);
+    arena_shared = 1;
+    flock(fd, LOCK_UN);
+    close(fd);  // the mapping keeps the file alive
+    EH_TRACE("[LIFECYCLE] init shared %s status=%d size=%llu used=%llu\n", path, status,
+             (unsigned long long)H->size, (unsigned long long)H->used);
+    return status;
+  }
+  fprintf(stderr, "eventhub: could not settle on a store file at %s\n", path);
+  return 0;
+#endif
+}
+
+// Detach from the store. A private store disappears with its mapping; a
+// shared one stays for the other processes using it.
 void eh_shutdown(void) {
-  printf("[LIFECYCLE] shutdown\n");
-  // clear queue
-  while (q_head) {
-    BookingReq* t = q_head; q_head = q_head->next;
-    free(t->user_id); free(t->event_id); free(t);
-  }
-  q_tail = NULL;
-  // clear stack
-  while (s_top) {
-    CancelReq* t = s_top; s_top = s_top->next;
-    free(t->user_id); free(t->event_id); free(t);
-  }
-  users_ht_free();
-  events_ht_free();
-  categories_free();
-  venues_free();
+  EH_TRACE("[LIFECYCLE] shutdown\n");
+  arena_unmap();
+}
+
+/* =========================
+   Public API (locked)
+   ========================= */
+// Every entry point runs under the store lock: worker threads call in with
+// the GIL released, and with a shared store so do other processes.
+// LOCKED_W marks calls that may change the store, for eh_save_snapshot.
+#define LOCKED(type, call) { type r_; store_lock(); r_ = (call); store_unlock(); return r_; }
+#define LOCKED_W(type, call) { type r_; store_lock(); r_ = (call); H->changes++; store_unlock(); return r_; }
+
+int eh_register_user(const char* user_id, const char* password_hash) LOCKED_W(int, register_user(user_id, password_hash))
+int eh_login_user(const char* user_id, const char* password_hash) LOCKED(int, login_user(user_id, password_hash))
+
+int eh_add_event(const char* event_id, const char* name, const char* category, const char* venue,
+                 const char* date, const char* time, double price, int total_tickets)
+  LOCKED_W(int, add_event(event_id, name, category, venue, date, time, price, total_tickets))
+int eh_delete_event(const char* event_id) LOCKED_W(int, delete_event(event_id))
+char* eh_search_event(const char* event_id) LOCKED(char*, search_event(event_id))
+char* eh_list_categories_tree(void) LOCKED(char*, list_categories_tree())
+int eh_event_capacity(const char** event_ids, int n, int* available, int* total)
+  LOCKED(int, event_capacity(event_ids, n, available, total))
+
+int eh_book_tickets(const char* user_id, const char* event_id, int quantity) LOCKED_W(int, book_tickets(user_id, event_id, quantity))
+char* eh_process_next_booking(void) LOCKED_W(char*, process_next_booking())
+char* eh_drain_promotions(int max_items) LOCKED_W(char*, drain_promotions(max_items))
+int eh_waitlist_length(const char* event_id) LOCKED(int, waitlist_length(event_id))
+
+int eh_cancel_tickets(const char* user_id, const char* event_id, int quantity) LOCKED_W(int, cancel_tickets(user_id, event_id, quantity))
+char* eh_process_last_cancellation(void) LOCKED_W(char*, process_last_cancellation())
+char* eh_drain_cancellations(int max_items) LOCKED_W(char*, drain_cancellations(max_items))
+int eh_release_tickets(const char* event_id, int quantity) LOCKED_W(int, release_tickets(event_id, quantity))
+char* eh_purge_event_requests(const char* event_id) LOCKED_W(char*, purge_event_requests(event_id))
+int eh_close_event(const char* event_id) LOCKED_W(int, close_event(event_id))
+
+int eh_add_venue(const char* venue_name) LOCKED_W(int, add_venue(venue_name))
+int eh_add_path(const char* from_venue, const char* to_venue, int distance) LOCKED_W(int, add_path(from_venue, to_venue, distance))
+char* eh_shortest_path(const char* from_venue, const char* to_venue) LOCKED(char*, shortest_path(from_venue, to_venue))
+
+static char* store_stats(void) {
+  char buf[256];
+  snprintf(buf, sizeof(buf), "{\"shared\":%s,\"generation\":\"%s\",\"size\":%llu,\"used\":%llu,\"changes\":%llu}",
+           arena_shared ? "true" : "false", H->generation,
+           (unsigned long long)H->size, (unsigned long long)H->used, (unsigned long long)H->changes);
+  return eh_strdup(buf);
 }
+char* eh_store_stats(void) LOCKED(char*, store_stats())
@@ -9,8 +9,30 @@ extern "C" {
 #include <stdint.h>
 
 // Initialization / Shutdown
-void eh_init(void);
-void eh_shutdown(void);
+// Every record lives in one arena. eh_init() gives the process a private
+// one; eh_init_shared() maps a file that all worker processes share, so they
+// see the same users, events and inventory. Calls are serialized by a
+// process-shared lock in the arena.
+#define EH_DEFAULT_STORE_SIZE ((uint64_t)256 << 20)
+#define EH_STORE_ATTACHED 1   // eh_init_shared: joined a store another process created
+#define EH_STORE_CREATED  2   // eh_init_shared: started an empty store (0 = error)
+#define EH_STORE_RESTORED 3   // eh_init_shared: started a store from the snapshot
+void  eh_init(void);
+int   eh_init_shared(const char* path, uint64_t size_bytes, const char* generation,
+                     const char* snapshot);                                          // a file from another generation is replaced; snapshot may be NULL
+void  eh_shutdown(void);                                                             // detaches; a shared store outlives it
+char* eh_store_stats(void);                                                          // JSON: shared, generation, size, used, changes
+
+// Snapshots: the arena image on disk, used in place (copy-on-write) at startup
+#define EH_SNAPSHOT_UNCHANGED 2
+int   eh_init_snapshot(const char* path, uint64_t size_bytes);  // 0 if missing/unusable (store left as is)
+int   eh_save_snapshot(const char* path, int force);            // 1 written, EH_SNAPSHOT_UNCHANGED, 0 error
+
+// Tracing of per-operation lines on stdout (compile out with -DEH_NO_TRACE)
+#define EH_TRACE_OFF     0
+#define EH_TRACE_SAMPLED 1
+#define EH_TRACE_FULL    2
+void eh_set_trace(int mode, int sample_every);   // sample_every applies to EH_TRACE_SAMPLED
 
 // Memory management for JSON strings returned by the library
 void eh_free(char* ptr);
@@ -21,18 +43,29 @@ int eh_login_user(const char* user_id, const char* password_hash);
 
 // ===== Events (Hashing + Tree categories) =====
 // categories must be one of: "Movies", "Plays", "Sports", "Concerts"
-int   eh_add_event(const char* event_id, const char* name, const char* category, const char* venue, int total_tickets);
+// date ("YYYY-MM-DD") and time may be NULL/empty when not scheduled yet
+int   eh_add_event(const char* event_id, const char* name, const char* category, const char* venue,
+                   const char* date, const char* time, double price, int total_tickets);
 int   eh_delete_event(const char* event_id);
 char* eh_search_event(const char* event_id);            // returns JSON or NULL
 char* eh_list_categories_tree(void);                    // returns JSON tree of categories and events
+int   eh_event_capacity(const char** event_ids, int n, int* available, int* total); // bulk lookup, -1 for unknown ids
 
 // ===== Bookings (Queue) =====
 int   eh_book_tickets(const char* user_id, const char* event_id, int quantity); // enqueue request
-char* eh_process_next_booking(void);                                             // process FIFO booking, returns JSON result
+char* eh_process_next_booking(void);                                             // process FIFO booking, returns JSON result (waitlists if sold out)
+
+// ===== Waitlist (per-event heap) =====
+char* eh_drain_promotions(int max_items);                                        // waitlisted requests confirmed since last drain, JSON array
+int   eh_waitlist_length(const char* event_id);                                  // -1 if unknown event
 
 // ===== Cancellations (Stack) =====
 int   eh_cancel_tickets(const char* user_id, const char* event_id, int quantity); // push cancellation
 char* eh_process_last_cancellation(void);                                         // pop LIFO, returns JSON result
+char* eh_drain_cancellations(int max_items);                                      // pop up to N, returns JSON array (oldest first)
+int   eh_release_tickets(const char* event_id, int quantity);                     // return capacity, -1 if unknown event
+char* eh_purge_event_requests(const char* event_id);                              // drop queued bookings/cancellations for an event, returns JSON counts and the unfilled requests
+int   eh_close_event(const char* event_id);                                       // call an event off: no new bookings, seats stay off sale
 
 // ===== Venues Graph (Shortest Path) =====
 int   eh_add_venue(const char* venue_name);
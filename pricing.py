@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+import importlib.util
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+# numpy is imported by the first load(), not at startup (it adds ~60ms to a
+# worker boot); without it the pure-Python fallback uses the same formula.
+NUMPY_AVAILABLE = importlib.util.find_spec("numpy") is not None
+np = None
+
+import logging
+logger = logging.getLogger("Pricing")
+if not logger.handlers:
+    h = logging.StreamHandler()
+    h.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    logger.addHandler(h)
+logger.setLevel(logging.INFO)
+
+PRICE_REFRESH_SECONDS = float(os.getenv("PRICE_REFRESH_SECONDS", "60"))
+DEMAND_WEIGHT = float(os.getenv("PRICE_DEMAND_WEIGHT", "0.8"))
+URGENCY_WEIGHT = float(os.getenv("PRICE_URGENCY_WEIGHT", "0.5"))
+TARGET_SELL_THROUGH = float(os.getenv("PRICE_TARGET_SELL_THROUGH", "0.5"))
+HORIZON_DAYS = 60.0
+# The multiplier is 1.0 for an event without seat counts or far in the future.
+# Selling above target raises it; selling below target only lowers it as the
+# date approaches (scaled by urgency), so an unsold event is not discounted
+# just for being new.
+# Allowed multipliers of the base price; a computed multiplier snaps down to
+# the nearest tier so prices move in steps rather than on every sale.
+PRICE_TIERS = (0.8, 0.9, 1.0, 1.1, 1.25, 1.5, 1.75, 2.0)
+
+_SEATS_RE = re.compile(r"(\d+)\s*/\s*(\d+)")
+
+CapacitySource = Callable[..., Tuple[Sequence[int], Sequence[int]]]
+
+
+def _parse_seats(text: Any) -> Tuple[int, int]:
+    """'37/60 seats available' -> (37, 60); (-1, -1) when absent."""
+    m = _SEATS_RE.search(str(text or ""))
+    return (int(m.group(1)), int(m.group(2))) if m else (-1, -1)
+
+
+def _event_ts(event: Dict[str, Any]) -> float:
+    try:
+        return datetime.strptime(str(event.get("date")), "%Y-%m-%d").timestamp()
+    except ValueError:
+        return float("nan")
+
+
+def _import_numpy() -> None:
+    global np
+    if np is None:
+        import numpy
+        np = numpy
+
+
+class PriceTable:
+    """
+    Demand-based prices for the whole catalog, recomputed on a schedule.
+
+    The catalog's static prices are the base. Each refresh reads sell-through
+    (1 - available/total) for every event in one native call, combines it with
+    time to the event, and snaps the resulting multiplier to PRICE_TIERS, all
+    as array operations over the catalog. The finished table is swapped in
+    whole, so catalog endpoints only do a dict lookup per event.
+    """
+
+    def __init__(
+        self,
+        catalog_source: Callable[[], List[Dict[str, Any]]],
+        capacity_source: Optional[CapacitySource] = None,
+        interval: float = PRICE_REFRESH_SECONDS,
+    ):
+        self.catalog_source = catalog_source
+        # eh.event_capacity(ids, available=None, total=None); optional so the
+        # table still works (catalog seat counts only) without the native store.
+        self.capacity_source = capacity_source
+        self.interval = interval
+        self._prices: Dict[str, Tuple[int, float]] = {}
+        self._load_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._loaded = False
+        self.updated = 0.0
+        self.last_duration = 0.0
+
+    # --- catalog arrays ---
+
+    def load(self) -> None:
+        """Snapshot the base catalog into arrays (ids, base price, event time,
+        catalog seat counts used when the native store does not know an id)."""
+        catalog = self.catalog_source()
+        ids = [str(e.get("id")) for e in catalog]
+        base = [float(e.get("price") or 0) for e in catalog]
+        when = [_event_ts(e) for e in catalog]
+        seats = [_parse_seats(e.get("available_seats")) for e in catalog]
+        with self._load_lock:
+            self.ids = ids
+            if NUMPY_AVAILABLE:
+                _import_numpy()
+                self.base = np.asarray(base, dtype=np.float64)
+                self.when = np.asarray(when, dtype=np.float64)
+                self.seed_available = np.asarray([s[0] for s in seats], dtype=np.int32)
+                self.seed_total = np.asarray([s[1] for s in seats], dtype=np.int32)
+                self.tiers = np.asarray(PRICE_TIERS, dtype=np.float64)
+            else:
+                self.base, self.when = base, when
+                self.seed_available = [s[0] for s in seats]
+                self.seed_total = [s[1] for s in seats]
+            self._loaded = True
+
+    # --- recompute ---
+
+    def _capacity(self):
+        n = len(self.ids)
+        if NUMPY_AVAILABLE:
+            available = self.seed_available.copy()
+            total = self.seed_total.copy()
+            if self.capacity_source is not None:
+                live_a = np.empty(n, dtype=np.int32)
+                live_t = np.empty(n, dtype=np.int32)
+                self.capacity_source(self.ids, live_a, live_t)
+                known = live_t > 0
+                available[known] = live_a[known]
+                total[known] = live_t[known]
+            return available, total
+        available, total = list(self.seed_available), list(self.seed_total)
+        if self.capacity_source is not None:
+            live_a, live_t = self.capacity_source(self.ids)
+            for i in range(n):
+                if live_t[i] > 0:
+                    available[i], total[i] = live_a[i], live_t[i]
+        return available, total
+
+    def _compute_numpy(self, available, total, now: float):
+        safe_total = np.where(total > 0, total, 1)
+        sell_through = np.where(total > 0, 1.0 - available / safe_total, 0.0)
+        days = np.nan_to_num((self.when - now) / 86400.0, nan=HORIZON_DAYS)
+        urgency = 1.0 - np.clip(days, 0.0, HORIZON_DAYS) / HORIZON_DAYS
+        demand = np.where(total > 0, sell_through - TARGET_SELL_THROUGH, 0.0)
+        demand = np.where(demand < 0, demand * urgency, demand)
+        mult = 1.0 + DEMAND_WEIGHT * demand + URGENCY_WEIGHT * urgency * sell_through
+        idx = np.clip(np.searchsorted(self.tiers, mult, side="right") - 1, 0, len(self.tiers) - 1)
+        tier = self.tiers[idx]
+        prices = np.rint(self.base * tier).astype(np.int64)
+        return prices.tolist(), tier.tolist()
+
+    def _compute_py(self, available, total, now: float):
+        prices, tiers = [], []
+        for base, when, a, t in zip(self.base, self.when, available, total):
+            sell_through = 1.0 - a / t if t > 0 else 0.0
+            days = HORIZON_DAYS if when != when else (when - now) / 86400.0
+            urgency = 1.0 - min(max(days, 0.0), HORIZON_DAYS) / HORIZON_DAYS
+            demand = sell_through - TARGET_SELL_THROUGH if t > 0 else 0.0
+            if demand < 0:
+                demand *= urgency
+            mult = 1.0 + DEMAND_WEIGHT * demand + URGENCY_WEIGHT * urgency * sell_through
+            tier = PRICE_TIERS[0]
+            for candidate in PRICE_TIERS:
+                if candidate <= mult:
+                    tier = candidate
+            prices.append(int(round(base * tier)))
+            tiers.append(tier)
+        return prices, tiers
+
+    def refresh(self, now: Optional[float] = None) -> int:
+        """Recompute every catalog price and swap the table in. Returns the
+        number of events priced."""
+        if not self._loaded:
+            self.load()
+        now = time.time() if now is None else now
+        with self._refresh_lock:
+            started = time.perf_counter()
+            with self._load_lock:
+                available, total = self._capacity()
+                if NUMPY_AVAILABLE:
+                    prices, tiers = self._compute_numpy(available, total, now)
+                else:
+                    prices, tiers = self._compute_py(available, total, now)
+                table = dict(zip(self.ids, zip(prices, tiers)))
+            self._prices = table
+            self.updated = now
+            self.last_duration = time.perf_counter() - started
+        logger.debug("pricing: %d event(s) repriced in %.2fms", len(table), self.last_duration * 1000)
+        return len(table)
+
+    # --- scheduler ---
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error("pricing refresh failed: %s", e)
+
+    def start(self) -> None:
+        """Compute the first table now and keep refreshing in the background
+        (idempotent)."""
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self.refresh()
+            thread = threading.Thread(target=self._run, name="price-table", daemon=True)
+            thread.start()
+            self._thread = thread
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread = None
+
+    # --- reads ---
+
+    def price(self, event_id: Any, default: Optional[int] = None) -> Optional[int]:
+        self.start()
+        entry = self._prices.get(str(event_id))
+        return entry[0] if entry else default
+
+    def apply(self, events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Copies of `events` with the current price; the catalog price is
+        kept as base_price. Events the table does not know are unchanged."""
+        self.start()
+        table = self._prices
+        out = []
+        for e in events:
+            entry = table.get(str(e.get("id")))
+            if entry is None:
+                out.append(e)
+            else:
+                out.append(dict(e, price=entry[0], base_price=e.get("price"), price_tier=entry[1]))
+        return out
@@ -75,6 +75,29 @@ const profileSystem = {
     this.loadUserProfile()
     this.loadBookings()
     this.loadFavorites()
+
+    // Merge bookings recorded by the server (first page; more on demand)
+    this.bookingsCursor = null
+    this.syncServerBookings()
+  },
+
+  // Fetch one page of server-side bookings and merge them into bookingsData
+  async syncServerBookings(cursor = null) {
+    if (!window.ehApi?.myBookings) return
+    try {
+      const page = await window.ehApi.myBookings(cursor)
+      const known = new Set(this.bookingsData.map((b) => b.bookingId))
+      const fresh = (page.bookings || []).filter((b) => !known.has(b.bookingId))
+      this.bookingsCursor = page.next_cursor || null
+      if (fresh.length) {
+        this.bookingsData = [...this.bookingsData, ...fresh]
+        this.saveBookingsData()
+        this.loadBookings()
+      }
+    } catch (err) {
+      // Not signed in on the server or backend unavailable: keep local data
+      console.warn("Could not load server bookings:", err)
+    }
   },
 
   // Sample bookings for testing ticket downloads (only used for manual testing)
@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Optional
+
+from flask import Flask, abort, g, jsonify, request, send_file
+
+import logging
+logger = logging.getLogger("Profiler")
+if not logger.handlers:
+    h = logging.StreamHandler()
+    h.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    logger.addHandler(h)
+logger.setLevel(logging.INFO)
+
+ROOT = Path(__file__).resolve().parent
+# Profiling is only wired in when a token is configured; without one the app
+# has no profiler hooks or routes at all.
+PROFILER_TOKEN = os.getenv("PROFILER_TOKEN", "")
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", str(ROOT / "logs" / "profiles")))
+SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.001"))
+MAX_WINDOW_SECONDS = 120.0
+MAX_PROFILES = 50
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+def collapse(frame) -> str:
+    """Stack of `frame` in collapsed (folded) form, root first: a;b;c"""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return ";".join(labels)
+
+
+class StackSampler:
+    """
+    Samples Python stacks on a background thread every `interval` seconds:
+    one thread (a single request) or every other thread (a time window).
+    Output is the collapsed-stack format flamegraph.pl / speedscope read.
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL, thread_id: Optional[int] = None):
+        self.interval = interval
+        self.thread_id = thread_id
+        self.counts: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        counts = self.counts
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            if self.thread_id is not None:
+                frame = frames.get(self.thread_id)
+                stacks = [frame] if frame is not None else []
+            else:
+                stacks = [f for tid, f in frames.items() if tid != own]
+            for frame in stacks:
+                counts[collapse(frame)] += 1
+            self.samples += 1
+
+    def start(self) -> "StackSampler":
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> "StackSampler":
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {n}\n" for stack, n in self.counts.most_common())
+
+
+class ProfileStore:
+    """Finished profiles on disk (newest MAX_PROFILES kept) plus running windows."""
+
+    def __init__(self, directory: Path = PROFILE_DIR):
+        self.directory = directory
+        self._running: Dict[str, StackSampler] = {}
+        self._lock = threading.Lock()
+
+    def save(self, profile_id: str, suffix: str, data: str) -> Path:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"{profile_id}{suffix}"
+        path.write_text(data, encoding="utf-8")
+        files = sorted(self.directory.glob("*.*"), key=lambda p: p.stat().st_mtime)
+        for old in files[:-MAX_PROFILES]:
+            old.unlink(missing_ok=True)
+        return path
+
+    def find(self, profile_id: str) -> Optional[Path]:
+        if not profile_id.isalnum():
+            return None
+        for suffix in (".folded", ".txt"):
+            path = self.directory / f"{profile_id}{suffix}"
+            if path.exists():
+                return path
+        return None
+
+    def start_window(self, seconds: float, interval: float) -> str:
+        profile_id = uuid.uuid4().hex
+        sampler = StackSampler(interval).start()
+        with self._lock:
+            self._running[profile_id] = sampler
+
+        def finish():
+            time.sleep(seconds)
+            sampler.stop()
+            self.save(profile_id, ".folded", sampler.folded())
+            with self._lock:
+                self._running.pop(profile_id, None)
+            logger.info("profile window %s done: %d samples", profile_id, sampler.samples)
+
+        threading.Thread(target=finish, name=f"profile-window-{profile_id[:8]}", daemon=True).start()
+        return profile_id
+
+    def is_running(self, profile_id: str) -> bool:
+        with self._lock:
+            return profile_id in self._running
+
+
+def _authorized(token: str) -> bool:
+    return bool(token) and hmac.compare_digest(token, PROFILER_TOKEN)
+
+
+def _request_token() -> str:
+    return request.headers.get("X-Profile-Token") or request.args.get("_profile_token") or ""
+
+
+def install_profiler(app: Flask, store: Optional[ProfileStore] = None) -> bool:
+    """
+    Wire per-request profiling into `app` if PROFILER_TOKEN is set; returns
+    whether it was installed. A request opts in with `X-Profile: sample` (stack
+    sampler) or `X-Profile: cprofile` plus `X-Profile-Token: <token>` (or the
+    `_profile` / `_profile_token` query parameters). The response carries
+    X-Profile-Id and the profile is fetched from /admin/profiles/<id>.
+    """
+    if not PROFILER_TOKEN:
+        return False
+    store = store or ProfileStore()
+
+    @app.before_request
+    def _profile_start():
+        mode = request.headers.get("X-Profile") or request.args.get("_profile")
+        if not mode or not _authorized(_request_token()):
+            return None
+        if mode == "cprofile":
+            profiler = cProfile.Profile()
+            g._profile = ("cprofile", profiler)
+            profiler.enable()
+        elif mode == "sample":
+            g._profile = ("sample", StackSampler(thread_id=threading.get_ident()).start())
+        return None
+
+    @app.after_request
+    def _profile_finish(response):
+        active = g.pop("_profile", None)
+        if active is None:
+            return response
+        mode, profiler = active
+        profile_id = uuid.uuid4().hex
+        if mode == "cprofile":
+            profiler.disable()
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(60)
+            store.save(profile_id, ".txt", out.getvalue())
+        else:
+            profiler.stop()
+            store.save(profile_id, ".folded", profiler.folded())
+        logger.info("profiled %s %s (%s) -> %s", request.method, request.path, mode, profile_id)
+        response.headers["X-Profile-Id"] = profile_id
+        response.headers["X-Profile-Url"] = f"/admin/profiles/{profile_id}"
+        return response
+
+    def start_window():
+        if not _authorized(_request_token()):
+            abort(403)
+        seconds = min(float(request.args.get("seconds", 10)), MAX_WINDOW_SECONDS)
+        interval = max(float(request.args.get("interval", 0.005)), 0.0005)
+        profile_id = store.start_window(seconds, interval)
+        return jsonify(profile_id=profile_id, seconds=seconds, url=f"/admin/profiles/{profile_id}"), 202
+
+    def get_profile(profile_id: str):
+        if not _authorized(_request_token()):
+            abort(403)
+        if store.is_running(profile_id):
+            resp = jsonify(status="running")
+            resp.headers["Retry-After"] = "1"
+            return resp, 202
+        path = store.find(profile_id)
+        if path is None:
+            return jsonify(error="not found"), 404
+        return send_file(path, mimetype="text/plain")
+
+    app.add_url_rule("/admin/profile/window", "profile_window", start_window, methods=["POST"])
+    app.add_url_rule("/admin/profiles/<profile_id>", "profile_get", get_profile, methods=["GET"])
+    logger.info("profiler hooks installed (profiles in %s)", store.directory)
+    return True
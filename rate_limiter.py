@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import math
+import os
+import sqlite3
+import threading
+import time
+from functools import wraps
+from typing import Callable, Optional, Tuple
+
+from flask import jsonify, request
+
+from booking_ledger import LEDGER_DB
+
+import logging
+logger = logging.getLogger("RateLimiter")
+if not logger.handlers:
+    h = logging.StreamHandler()
+    h.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    logger.addHandler(h)
+logger.setLevel(logging.INFO)
+
+# Number of reverse proxies in front of the app (Render runs one). When > 0 the
+# client address is taken from X-Forwarded-For, counting hops from the right so
+# a client cannot spoof its own key.
+TRUSTED_PROXIES = int(os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "0"))
+# Buckets live next to the booking ledger, so every worker process charges them.
+RATE_LIMIT_DB = os.getenv("RATE_LIMIT_DB", LEDGER_DB)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rate_buckets (
+    name TEXT NOT NULL,
+    key TEXT NOT NULL,
+    tokens REAL NOT NULL,
+    stamp REAL NOT NULL,
+    PRIMARY KEY (name, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS rate_buckets_by_stamp ON rate_buckets (name, stamp);
+"""
+
+
+class TokenBucketTable:
+    """
+    Table of token buckets keyed by string (IP or account id), in SQLite.
+
+    Every worker process charges the same buckets, so a limit holds however
+    many workers serve the requests. A bucket is one (tokens, stamp) row,
+    read and rewritten inside one write transaction. A bucket that has
+    refilled to capacity is indistinguishable from an absent one, so
+    compaction simply deletes those rows; past `max_keys` live buckets the
+    least recently touched half is dropped.
+    """
+
+    def __init__(self, name: str, capacity: float, refill_per_sec: float, max_keys: int = 65536,
+                 compact_interval: float = 60.0, db_path: str = RATE_LIMIT_DB):
+        self.name = name
+        self.capacity = float(capacity)
+        self.rate = float(refill_per_sec)
+        self.max_keys = max_keys
+        self.compact_interval = compact_interval
+        self.db_path = db_path
+        self._local = threading.local()
+        self._next_compact = time.time() + compact_interval
+        self._db().executescript(_SCHEMA)
+
+    def _db(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _tokens(self, row, now: float) -> float:
+        if row is None:
+            return self.capacity
+        return min(self.capacity, row[0] + max(0.0, now - row[1]) * self.rate)
+
+    def consume(self, key: str, cost: float = 1.0, now: Optional[float] = None) -> float:
+        """Take `cost` tokens from `key`'s bucket.
+        Returns 0.0 when allowed, otherwise the seconds until the request would be allowed."""
+        if now is None:
+            now = time.time()
+        db = self._db()
+        if now >= self._next_compact:
+            self._compact(db, now)
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            tokens = self._tokens(db.execute("SELECT tokens, stamp FROM rate_buckets WHERE name = ? AND key = ?",
+                                             (self.name, key)).fetchone(), now)
+            wait = 0.0 if tokens >= cost else (cost - tokens) / self.rate
+            if not wait:
+                tokens -= cost
+            db.execute(
+                "INSERT INTO rate_buckets (name, key, tokens, stamp) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (name, key) DO UPDATE SET tokens = excluded.tokens, stamp = excluded.stamp",
+                (self.name, key, tokens, now),
+            )
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        return wait
+
+    def retry_after(self, key: str, cost: float = 1.0, now: Optional[float] = None) -> float:
+        """Like consume() but without taking tokens."""
+        if now is None:
+            now = time.time()
+        tokens = self._tokens(self._db().execute("SELECT tokens, stamp FROM rate_buckets WHERE name = ? AND key = ?",
+                                                 (self.name, key)).fetchone(), now)
+        return 0.0 if tokens >= cost else (cost - tokens) / self.rate
+
+    def reset(self, key: str) -> None:
+        self._db().execute("DELETE FROM rate_buckets WHERE name = ? AND key = ?", (self.name, key))
+
+    def __len__(self) -> int:
+        return self._db().execute("SELECT COUNT(*) FROM rate_buckets WHERE name = ?", (self.name,)).fetchone()[0]
+
+    def _compact(self, db: sqlite3.Connection, now: float) -> None:
+        """Delete every bucket that has refilled to capacity; past max_keys,
+        the least recently touched half as well (e.g. a wide spray of IPs)."""
+        self._next_compact = now + self.compact_interval
+        idle = db.execute("DELETE FROM rate_buckets WHERE name = ? AND tokens + (? - stamp) * ? >= ?",
+                          (self.name, now, self.rate, self.capacity)).rowcount
+        live = len(self)
+        if live > self.max_keys:
+            db.execute(
+                "DELETE FROM rate_buckets WHERE name = ? AND key IN "
+                "(SELECT key FROM rate_buckets WHERE name = ? ORDER BY stamp LIMIT ?)",
+                (self.name, self.name, live // 2),
+            )
+            logger.warning("rate limiter %s full: evicted %d buckets", self.name, live // 2)
+        if idle:
+            logger.debug("compacted %d idle %s buckets (%d live)", idle, self.name, len(self))
+
+
+# Shared tables. Login failures lock an account for roughly 15 minutes after 5
+# misses; the per-IP tables bound raw request rates.
+auth_ip_limiter = TokenBucketTable("auth_ip", capacity=20, refill_per_sec=0.5)
+login_failure_limiter = TokenBucketTable("login_failure", capacity=5, refill_per_sec=5 / 900.0)
+booking_ip_limiter = TokenBucketTable("booking_ip", capacity=30, refill_per_sec=2.0)
+booking_account_limiter = TokenBucketTable("booking_account", capacity=10, refill_per_sec=0.5)
+
+
+def client_key() -> str:
+    if TRUSTED_PROXIES > 0:
+        route = request.access_route
+        if len(route) >= TRUSTED_PROXIES:
+            return route[-TRUSTED_PROXIES]
+    return request.remote_addr or "unknown"
+
+
+def account_key() -> str:
+    data = request.get_json(silent=True) or {}
+    return str(data.get("email") or data.get("user_id") or "").strip().lower()
+
+
+def _too_many(wait: float, reason: str):
+    resp = jsonify(error="too many requests", reason=reason)
+    resp.status_code = 429
+    resp.headers["Retry-After"] = str(max(1, math.ceil(wait)))
+    return resp
+
+
+def rate_limit(ip_table: Optional[TokenBucketTable] = None,
+               account_table: Optional[TokenBucketTable] = None,
+               charge_account_on: Optional[Tuple[int, ...]] = None,
+               key_func: Callable[[], str] = account_key):
+    """
+    Decorator applying per-IP and per-account token buckets to a Flask view.
+
+    The IP bucket is charged on every call. The account bucket is charged on
+    every call too, unless `charge_account_on` is given: then it is only
+    checked up front and charged when the view answers with one of those
+    status codes (e.g. 401 for failed logins), which gives a lockout; a
+    successful response clears the account's bucket.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if ip_table is not None:
+                wait = ip_table.consume(client_key())
+                if wait:
+                    return _too_many(wait, "ip")
+            account = key_func() if account_table is not None else ""
+            if account:
+                if charge_account_on is None:
+                    wait = account_table.consume(account)
+                else:
+                    wait = account_table.retry_after(account)
+                if wait:
+                    logger.warning("rate limit: account %s throttled for %.0fs", account, wait)
+                    return _too_many(wait, "account")
+            rv = view(*args, **kwargs)
+            if account and charge_account_on is not None:
+                status = rv[1] if isinstance(rv, tuple) else getattr(rv, "status_code", 200)
+                if status in charge_account_on:
+                    account_table.consume(account)
+                elif status < 400:
+                    account_table.reset(account)
+            return rv
+        return wrapper
+    return decorator
@@ -3,7 +3,6 @@ from __future__ import annotations
 import os
 from pathlib import Path
 import sys
-from cffi import FFI
 
 ROOT = Path(__file__).resolve().parents[1]
 # Ensure the project root (where the compiled _eventhub_cffi*.pyd is written) is importable
@@ -11,52 +10,119 @@ if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 NATIVE_DIR = ROOT / "native"
 
-_ffi = FFI()
-_ffi.cdef(
-    """
-    void eh_init(void);
-    void eh_shutdown(void);
-    void eh_free(char* ptr);
+# Only needed to build the extension: the prebuilt module carries its own
+# declarations, so cffi's C parser stays out of the app's import path.
+_CDEF = """
+    void  eh_init(void);
+    int   eh_init_shared(const char* path, uint64_t size_bytes, const char* generation, const char* snapshot);
+    void  eh_shutdown(void);
+    char* eh_store_stats(void);
+    int   eh_init_snapshot(const char* path, uint64_t size_bytes);
+    int   eh_save_snapshot(const char* path, int force);
+    void  eh_free(char* ptr);
 
     int eh_register_user(const char* user_id, const char* password_hash);
     int eh_login_user(const char* user_id, const char* password_hash);
 
-    int   eh_add_event(const char* event_id, const char* name, const char* category, const char* venue, int total_tickets);
+    int   eh_add_event(const char* event_id, const char* name, const char* category, const char* venue,
+                       const char* date, const char* time, double price, int total_tickets);
     int   eh_delete_event(const char* event_id);
     char* eh_search_event(const char* event_id);
     char* eh_list_categories_tree(void);
+    int   eh_event_capacity(const char** event_ids, int n, int* available, int* total);
 
     int   eh_book_tickets(const char* user_id, const char* event_id, int quantity);
     char* eh_process_next_booking(void);
+    char* eh_drain_promotions(int max_items);
+    int   eh_waitlist_length(const char* event_id);
 
     int   eh_cancel_tickets(const char* user_id, const char* event_id, int quantity);
     char* eh_process_last_cancellation(void);
+    char* eh_drain_cancellations(int max_items);
+    int   eh_release_tickets(const char* event_id, int quantity);
+    char* eh_purge_event_requests(const char* event_id);
+    int   eh_close_event(const char* event_id);
 
     int   eh_add_venue(const char* venue_name);
     int   eh_add_path(const char* from_venue, const char* to_venue, int distance);
     char* eh_shortest_path(const char* from_venue, const char* to_venue);
+
+    void  eh_set_trace(int mode, int sample_every);
 """
-)
 
 _sources = [str(NATIVE_DIR / "eventhub.c")]
 _include_dirs = [str(NATIVE_DIR)]
+# EVENTHUB_NO_TRACE=1 at build time compiles the native trace lines out.
+_compile_args = ["-DEH_NO_TRACE"] if os.getenv("EVENTHUB_NO_TRACE") == "1" else []
+
+# The extension should be built ahead of time (build.sh runs
+# `python scripts/eventhub_binding.py build`); compiling it inside a booting
+# worker takes seconds. EVENTHUB_BUILD_ON_IMPORT=0 turns a missing or stale
+# module into an immediate NativeBuildError instead of a compile.
+BUILD_ON_IMPORT = os.getenv("EVENTHUB_BUILD_ON_IMPORT", "1") == "1"
+_native_inputs = [NATIVE_DIR / "eventhub.c", NATIVE_DIR / "eventhub.h"]
+
 
-def _build_module():
+class NativeBuildError(ImportError):
+    """The _eventhub_cffi extension is missing, stale or failed to compile."""
+
+
+def _build_module() -> Path:
+    """Compile _eventhub_cffi into the project root; returns its path."""
+    import shutil
+    import tempfile
+    from cffi import FFI
+    _ffi = FFI()
+    _ffi.cdef(_CDEF)
     _ffi.set_source(
         "_eventhub_cffi",
         '#include "eventhub.h"',
         sources=_sources,
         include_dirs=_include_dirs,
-        extra_compile_args=[],
+        extra_compile_args=_compile_args,
+        libraries=[] if os.name == "nt" else ["pthread"],
     )
-    _ffi.compile(verbose=True)
+    # Intermediate .c/.o files stay in a scratch dir; only the extension
+    # lands next to the app, wherever the build was started from.
+    with tempfile.TemporaryDirectory(prefix="eventhub-build-") as tmp:
+        try:
+            built = Path(_ffi.compile(tmpdir=tmp, verbose=True))
+        except Exception as e:
+            raise NativeBuildError(f"compiling native/eventhub.c failed: {e}") from e
+        target = ROOT / built.name
+        shutil.copy2(built, target)
+    return target
+
+
+def _module_path() -> Path | None:
+    import importlib.util
+    spec = importlib.util.find_spec("_eventhub_cffi")
+    return Path(spec.origin) if spec is not None and spec.origin else None
+
+
+def _is_stale(path: Path) -> bool:
+    built = path.stat().st_mtime
+    return any(src.exists() and src.stat().st_mtime > built for src in _native_inputs)
+
 
 def get_lib():
-    try:
-        import _eventhub_cffi  # type: ignore
-    except Exception:
+    path = _module_path()
+    problem = None
+    if path is None:
+        problem = "the _eventhub_cffi extension has not been built"
+    elif _is_stale(path):
+        problem = f"{path.name} is older than native/eventhub.c"
+    if problem is not None:
+        if not BUILD_ON_IMPORT:
+            raise NativeBuildError(
+                f"{problem}; run `python scripts/eventhub_binding.py build` before starting the app")
+        started = time.perf_counter()
+        logger.warning("%s; compiling it now (build it ahead of time to skip this)", problem)
         _build_module()
-        import _eventhub_cffi  # type: ignore
+        import importlib
+        importlib.invalidate_caches()
+        logger.warning("native module built in %.1fs", time.perf_counter() - started)
+    import _eventhub_cffi  # type: ignore
     return _eventhub_cffi.ffi, _eventhub_cffi.lib
 
 # Convenience helpers
@@ -66,9 +132,12 @@ def _cstr(ffi, s: str):
 # Enhanced logging: print which functions are invoked so the terminal shows when
 # frontend actions cause native EventHub calls. Passwords and sensitive
 # data are not logged.
+import atexit
+import itertools
 import logging
 import sys
-from datetime import datetime
+import threading
+import time
 
 # Create enhanced logger with colored output
 logger = logging.getLogger("EventHub")
@@ -89,11 +158,12 @@ if not logger.handlers:
         
         def format(self, record):
             color = self.COLORS.get(record.levelname, '')
-            timestamp = datetime.now().strftime('%H:%M:%S.%f')[:-3]
-            
+            # record.created is already stamped; no second clock read per line
+            timestamp = "%s.%03d" % (time.strftime('%H:%M:%S', time.localtime(record.created)), record.msecs)
+
             # Enhanced format with function tracking
-            formatted = f"{color}[{timestamp}] {self.BOLD}EVENTHUB.C{self.RESET}{color} → {record.getMessage()}{self.RESET}"
-            return formatted
+            return "%s[%s] %sEVENTHUB.C%s%s → %s%s" % (
+                color, timestamp, self.BOLD, self.RESET, color, record.getMessage(), self.RESET)
     
     handler.setFormatter(ColoredFormatter())
     logger.addHandler(handler)
@@ -101,61 +171,224 @@ if not logger.handlers:
 
 logger.setLevel(logging.INFO)
 
+# Tracing mode for both layers (native printf lines and the Python log lines
+# below): EVENTHUB_TRACE=off | sampled | full. "sampled" keeps one call in
+# EVENTHUB_TRACE_SAMPLE. Defaults to full so local runs still show the trace.
+TRACE_MODES = {"off": 0, "sampled": 1, "full": 2}
+TRACE_MODE = os.getenv("EVENTHUB_TRACE", "full").strip().lower()
+TRACE_SAMPLE_EVERY = max(1, int(os.getenv("EVENTHUB_TRACE_SAMPLE", "100")))
+_trace_level = TRACE_MODES.get(TRACE_MODE, TRACE_MODES["full"])
+_trace_counter = itertools.count(1)
+
+# Shared store: with EVENTHUB_SHARED_STORE=<file>, every worker process maps
+# the same arena file, so users, events and inventory are consistent across
+# gunicorn workers. Unset, each process keeps a private store as before.
+# EVENTHUB_STORE_MB is the arena size (reserved address space; pages are only
+# used as records are written).
+SHARED_STORE_PATH = os.getenv("EVENTHUB_SHARED_STORE", "")
+STORE_MB = max(1, int(os.getenv("EVENTHUB_STORE_MB", "256")))
+STORE_STATUS = {0: "failed", 1: "attached", 2: "created", 3: "restored from snapshot"}
+
+# Snapshot: with EVENTHUB_SNAPSHOT=<file>, the store starts from that image
+# (mapped copy-on-write, or with a shared store on the same filesystem linked
+# in as the store file, so startup does not grow with the data) and is
+# written back every EVENTHUB_SNAPSHOT_INTERVAL seconds when it changed, and
+# on shutdown.
+SNAPSHOT_PATH = os.getenv("EVENTHUB_SNAPSHOT", "")
+SNAPSHOT_INTERVAL = float(os.getenv("EVENTHUB_SNAPSHOT_INTERVAL", "30"))
+
+
+def server_generation() -> str:
+    """
+    Identity of the server run a shared store (and the shared metrics) belong
+    to. Workers of one gunicorn master agree on it; a restarted server (new
+    master) gets a fresh store instead of the previous run's leftovers. The parent's start time is
+    included because container masters are usually pid 1 on every boot.
+    """
+    configured = os.getenv("EVENTHUB_STORE_GENERATION")
+    if configured:
+        return configured
+    pid = os.getppid() if "gunicorn" in sys.modules else os.getpid()
+    try:
+        started = Path(f"/proc/{pid}/stat").read_text().rsplit(")", 1)[1].split()[19]
+        boot_id = Path("/proc/sys/kernel/random/boot_id").read_text().strip()[:8]
+        return f"{pid}-{started}-{boot_id}"
+    except (OSError, IndexError):
+        return str(pid)
+
+
+def _tracing() -> bool:
+    """Whether the current binding call should be logged. Decided once per
+    call, so a sampled call logs both its action and its result line."""
+    if _trace_level == 2:
+        return True
+    if _trace_level == 0:
+        return False
+    return next(_trace_counter) % TRACE_SAMPLE_EVERY == 0
+
+
 # Function call tracker
-def log_function_call(func_name, data_structure, params="", result=""):
-    """Enhanced logging for C function calls with data structure info"""
-    param_str = f" | params: {params}" if params else ""
-    result_str = f" | result: {result}" if result else ""
-    logger.info(f"🔧 {func_name}() → DS: {data_structure}{param_str}{result_str}")
+def log_function_call(func_name, data_structure, params="", result="", *args):
+    """Enhanced logging for C function calls with data structure info.
+    `result` may be a %-format filled from `args` only if the line is emitted."""
+    logger.info("🔧 %s() → DS: %s%s%s%s", func_name, data_structure,
+                " | params: " if params else "", params,
+                (" | result: " + (result % args if args else result)) if result else "")
 
 def log_user_action(action, details=""):
     """Log user actions that trigger C functions"""
-    detail_str = f" | {details}" if details else ""
-    logger.info(f"👤 USER_ACTION: {action}{detail_str}")
+    logger.info("👤 USER_ACTION: %s%s%s", action, " | " if details else "", details)
 
 class EventHub:
     def __init__(self):
+        trace = _tracing()
         self.ffi, self.lib = get_lib()
-        self.lib.eh_init()
-        log_function_call("eh_init", "HashTable + BST + Queue + Stack + Graph", "", "system initialized")
+        self.lib.eh_set_trace(_trace_level, TRACE_SAMPLE_EVERY)
+        self._snapshot_thread = None
+        self._snapshot_stop = threading.Event()
+        # Saves write through one temp file per process, and must not run
+        # once the store is unmapped: one at a time, none after shutdown.
+        self._snapshot_lock = threading.RLock()
+        self._closed = False
+        snapshot = SNAPSHOT_PATH.encode("utf-8") if SNAPSHOT_PATH else self.ffi.NULL
+        started = time.perf_counter()
+        status = 0
+        if SHARED_STORE_PATH:
+            status = self.lib.eh_init_shared(SHARED_STORE_PATH.encode("utf-8"), STORE_MB << 20,
+                                             server_generation().encode("utf-8"), snapshot)
+            if status == 0:
+                raise RuntimeError(f"could not map the shared EventHub store at {SHARED_STORE_PATH}")
+            logger.info("🗂️ shared store %s: %s in %.1f ms", SHARED_STORE_PATH, STORE_STATUS[status],
+                        (time.perf_counter() - started) * 1000)
+        elif SNAPSHOT_PATH and self.lib.eh_init_snapshot(snapshot, STORE_MB << 20):
+            logger.info("🗂️ store mapped from snapshot %s in %.1f ms", SNAPSHOT_PATH,
+                        (time.perf_counter() - started) * 1000)
+        else:
+            self.lib.eh_init()
+        if SNAPSHOT_PATH:
+            # A store restored from the snapshot may be that very file, linked
+            # in; write a fresh image right away so the snapshot stops
+            # following the live store.
+            self._start_snapshots(save_now=status == 3)
+        if trace:
+            log_function_call("eh_init", "HashTable + BST + Queue + Stack + Graph", "", "system initialized")
         logger.info("🚀 EventHub C backend initialized - all data structures ready")
 
+    def set_trace(self, mode: str, sample_every: int | None = None) -> None:
+        """Switch tracing at runtime for both the binding and the native store."""
+        global _trace_level, TRACE_SAMPLE_EVERY
+        if mode not in TRACE_MODES:
+            raise ValueError(f"trace mode must be one of {', '.join(TRACE_MODES)}")
+        if sample_every:
+            TRACE_SAMPLE_EVERY = max(1, int(sample_every))
+        _trace_level = TRACE_MODES[mode]
+        self.lib.eh_set_trace(_trace_level, TRACE_SAMPLE_EVERY)
+
     def shutdown(self):
-        log_function_call("eh_shutdown", "All Data Structures", "", "cleanup complete")
-        self.lib.eh_shutdown()
+        trace = _tracing()
+        if trace:
+            log_function_call("eh_shutdown", "All Data Structures", "", "cleanup complete")
+        self._snapshot_stop.set()
+        with self._snapshot_lock:
+            if SNAPSHOT_PATH:
+                self.save_snapshot()
+            self.lib.eh_shutdown()
+            self._closed = True
         logger.info("🔴 EventHub C backend shutdown")
 
+    def store_stats(self) -> dict:
+        """Arena usage: {"shared", "generation", "size", "used"} (bytes)."""
+        import json
+        p = self.lib.eh_store_stats()
+        if p == self.ffi.NULL:
+            return {}
+        try:
+            return json.loads(self.ffi.string(p).decode("utf-8"))
+        finally:
+            self.lib.eh_free(p)
+
+    def save_snapshot(self, path: str | None = None, force: bool = False) -> bool:
+        """Write the store to `path` (default EVENTHUB_SNAPSHOT); returns
+        whether a file was written (False when nothing changed since the last
+        snapshot, unless `force`)."""
+        path = path or SNAPSHOT_PATH
+        if not path:
+            return False
+        with self._snapshot_lock:
+            if self._closed:
+                return False
+            started = time.perf_counter()
+            status = self.lib.eh_save_snapshot(path.encode("utf-8"), int(force))
+        if status == 0:
+            logger.error("writing EventHub snapshot %s failed", path)
+            return False
+        if status == 1:
+            logger.info("🗂️ snapshot written to %s in %.1f ms", path, (time.perf_counter() - started) * 1000)
+        return status == 1
+
+    def _start_snapshots(self, save_now: bool = False) -> None:
+        def run():
+            wait = 0 if save_now else SNAPSHOT_INTERVAL
+            while not self._snapshot_stop.wait(wait):
+                wait = SNAPSHOT_INTERVAL
+                try:
+                    self.save_snapshot()
+                except Exception as e:
+                    logger.error("EventHub snapshot failed: %s", e)
+
+        self._snapshot_thread = threading.Thread(target=run, name="eventhub-snapshot", daemon=True)
+        self._snapshot_thread.start()
+        atexit.register(self.save_snapshot)
+
     # Users
     def register_user(self, user_id: str, password_hash: str) -> bool:
-        log_user_action("REGISTER_USER", f"user_id={user_id}")
+        trace = _tracing()
+        if trace:
+            log_user_action("REGISTER_USER", f"user_id={user_id}")
         result = bool(self.lib.eh_register_user(_cstr(self.ffi, user_id), _cstr(self.ffi, password_hash)))
-        log_function_call("eh_register_user", "HashTable", f"user_id={user_id}", "success" if result else "failed")
+        if trace:
+            log_function_call("eh_register_user", "HashTable", f"user_id={user_id}", "success" if result else "failed")
         return result
 
     def login_user(self, user_id: str, password_hash: str) -> bool:
-        log_user_action("LOGIN_USER", f"user_id={user_id}")
+        trace = _tracing()
+        if trace:
+            log_user_action("LOGIN_USER", f"user_id={user_id}")
         result = bool(self.lib.eh_login_user(_cstr(self.ffi, user_id), _cstr(self.ffi, password_hash)))
-        log_function_call("eh_login_user", "HashTable", f"user_id={user_id}", "success" if result else "failed")
+        if trace:
+            log_function_call("eh_login_user", "HashTable", f"user_id={user_id}", "success" if result else "failed")
         return result
 
     # Events
-    def add_event(self, event_id: str, name: str, category: str, venue: str, total: int) -> bool:
-        log_user_action("ADD_EVENT", f"event_id={event_id}, name={name}, category={category}")
-        result = bool(self.lib.eh_add_event(_cstr(self.ffi, event_id), _cstr(self.ffi, name), _cstr(self.ffi, category), _cstr(self.ffi, venue), int(total)))
-        log_function_call("eh_add_event", "HashTable + BST", f"event_id={event_id}, category={category}, total={total}", "success" if result else "failed")
+    def add_event(self, event_id: str, name: str, category: str, venue: str, total: int,
+                  date: str = "", time: str = "", price: float = 0.0) -> bool:
+        trace = _tracing()
+        if trace:
+            log_user_action("ADD_EVENT", f"event_id={event_id}, name={name}, category={category}")
+        result = bool(self.lib.eh_add_event(_cstr(self.ffi, event_id), _cstr(self.ffi, name), _cstr(self.ffi, category),
+                                            _cstr(self.ffi, venue), _cstr(self.ffi, date or ""), _cstr(self.ffi, time or ""),
+                                            float(price), int(total)))
+        if trace:
+            log_function_call("eh_add_event", "HashTable + BST", f"event_id={event_id}, category={category}, total={total}", "success" if result else "failed")
         return result
 
     def delete_event(self, event_id: str) -> bool:
-        log_user_action("DELETE_EVENT", f"event_id={event_id}")
+        trace = _tracing()
+        if trace:
+            log_user_action("DELETE_EVENT", f"event_id={event_id}")
         result = bool(self.lib.eh_delete_event(_cstr(self.ffi, event_id)))
-        log_function_call("eh_delete_event", "HashTable + BST", f"event_id={event_id}", "success" if result else "failed")
+        if trace:
+            log_function_call("eh_delete_event", "HashTable + BST", f"event_id={event_id}", "success" if result else "failed")
         return result
 
     def search_event_json(self, event_id: str) -> str | None:
-        log_user_action("SEARCH_EVENT", f"event_id={event_id}")
+        trace = _tracing()
+        if trace:
+            log_user_action("SEARCH_EVENT", f"event_id={event_id}")
         p = self.lib.eh_search_event(_cstr(self.ffi, event_id))
         found = p != self.ffi.NULL
-        log_function_call("eh_search_event", "HashTable", f"event_id={event_id}", "found" if found else "not found")
+        if trace:
+            log_function_call("eh_search_event", "HashTable", f"event_id={event_id}", "found" if found else "not found")
         if not found:
             return None
         try:
@@ -163,10 +396,30 @@ class EventHub:
         finally:
             self.lib.eh_free(p)
 
+    def event_capacity(self, event_ids, available=None, total=None):
+        """Bulk (available, total) lookup in one native call; -1 for unknown
+        ids. Writes into `available`/`total` when given writable int32
+        buffers (e.g. NumPy arrays), otherwise returns new lists."""
+        trace = _tracing()
+        n = len(event_ids)
+        keep = [self.ffi.new("char[]", str(i).encode("utf-8")) for i in event_ids]
+        ids = self.ffi.new("const char*[]", keep)
+        avail_buf = self.ffi.from_buffer("int[]", available) if available is not None else self.ffi.new("int[]", n)
+        total_buf = self.ffi.from_buffer("int[]", total) if total is not None else self.ffi.new("int[]", n)
+        found = self.lib.eh_event_capacity(ids, n, avail_buf, total_buf)
+        if trace:
+            log_function_call("eh_event_capacity", "HashTable", f"n={n}", f"found={found}")
+        if available is not None and total is not None:
+            return available, total
+        return list(avail_buf), list(total_buf)
+
     def list_categories_json(self) -> str:
-        log_user_action("LIST_CATEGORIES", "retrieving category tree")
+        trace = _tracing()
+        if trace:
+            log_user_action("LIST_CATEGORIES", "retrieving category tree")
         p = self.lib.eh_list_categories_tree()
-        log_function_call("eh_list_categories_tree", "BST + Tree", "", "category tree retrieved")
+        if trace:
+            log_function_call("eh_list_categories_tree", "BST + Tree", "", "category tree retrieved")
         if p == self.ffi.NULL:
             return "[]"
         try:
@@ -176,86 +429,203 @@ class EventHub:
 
     # Bookings Queue
     def book(self, user_id: str, event_id: str, qty: int) -> bool:
-        log_user_action("BOOK_TICKETS", f"user_id={user_id}, event_id={event_id}, qty={qty}")
+        trace = _tracing()
+        if trace:
+            log_user_action("BOOK_TICKETS", f"user_id={user_id}, event_id={event_id}, qty={qty}")
         result = bool(self.lib.eh_book_tickets(_cstr(self.ffi, user_id), _cstr(self.ffi, event_id), int(qty)))
-        log_function_call("eh_book_tickets", "Queue (FIFO)", f"user={user_id}, event={event_id}, qty={qty}", "enqueued" if result else "failed")
+        if trace:
+            log_function_call("eh_book_tickets", "Queue (FIFO)", f"user={user_id}, event={event_id}, qty={qty}", "enqueued" if result else "failed")
         return result
 
     def process_next_booking_json(self) -> str:
-        log_user_action("PROCESS_BOOKING", "processing next booking from queue")
+        trace = _tracing()
+        if trace:
+            log_user_action("PROCESS_BOOKING", "processing next booking from queue")
         p = self.lib.eh_process_next_booking()
-        result_str = self.ffi.string(p).decode("utf-8")
-        import json
+        if p == self.ffi.NULL:
+            raise MemoryError("eh_process_next_booking failed")
         try:
-            result_data = json.loads(result_str)
-            status = result_data.get('status', 'unknown')
-            log_function_call("eh_process_next_booking", "Queue (FIFO)", "dequeue operation", f"status={status}")
-        except:
-            log_function_call("eh_process_next_booking", "Queue (FIFO)", "dequeue operation", "processed")
+            result_str = self.ffi.string(p).decode("utf-8")
+        finally:
+            self.lib.eh_free(p)
+        if trace:
+            import json
+            try:
+                status = json.loads(result_str).get('status', 'unknown')
+            except ValueError:
+                status = "processed"
+            log_function_call("eh_process_next_booking", "Queue (FIFO)", "dequeue operation", "status=%s", status)
+        return result_str
+
+    # Waitlist
+    def drain_promotions(self, max_items: int = 0) -> list:
+        trace = _tracing()
+        p = self.lib.eh_drain_promotions(int(max_items))
+        if p == self.ffi.NULL:
+            raise MemoryError("eh_drain_promotions failed")
+        import json
         try:
-            return result_str
+            items = json.loads(self.ffi.string(p).decode("utf-8"))
         finally:
             self.lib.eh_free(p)
+        if items:
+            if trace:
+                log_function_call("eh_drain_promotions", "Heap (waitlist)", f"max={max_items}", f"promoted={len(items)}")
+        return items
+
+    def waitlist_length(self, event_id: str) -> int:
+        return int(self.lib.eh_waitlist_length(_cstr(self.ffi, event_id)))
 
     # Cancellations Stack
     def cancel(self, user_id: str, event_id: str, qty: int) -> bool:
-        log_user_action("CANCEL_TICKETS", f"user_id={user_id}, event_id={event_id}, qty={qty}")
+        trace = _tracing()
+        if trace:
+            log_user_action("CANCEL_TICKETS", f"user_id={user_id}, event_id={event_id}, qty={qty}")
         result = bool(self.lib.eh_cancel_tickets(_cstr(self.ffi, user_id), _cstr(self.ffi, event_id), int(qty)))
-        log_function_call("eh_cancel_tickets", "Stack (LIFO)", f"user={user_id}, event={event_id}, qty={qty}", "pushed" if result else "failed")
+        if trace:
+            log_function_call("eh_cancel_tickets", "Stack (LIFO)", f"user={user_id}, event={event_id}, qty={qty}", "pushed" if result else "failed")
         return result
 
     def process_last_cancellation_json(self) -> str:
-        log_user_action("PROCESS_CANCELLATION", "processing last cancellation from stack")
+        trace = _tracing()
+        if trace:
+            log_user_action("PROCESS_CANCELLATION", "processing last cancellation from stack")
         p = self.lib.eh_process_last_cancellation()
-        result_str = self.ffi.string(p).decode("utf-8")
+        if p == self.ffi.NULL:
+            raise MemoryError("eh_process_last_cancellation failed")
+        try:
+            result_str = self.ffi.string(p).decode("utf-8")
+        finally:
+            self.lib.eh_free(p)
+        if trace:
+            import json
+            try:
+                status = json.loads(result_str).get('status', 'unknown')
+            except ValueError:
+                status = "processed"
+            log_function_call("eh_process_last_cancellation", "Stack (LIFO)", "pop operation", "status=%s", status)
+        return result_str
+
+    def drain_cancellations(self, max_items: int) -> list:
+        trace = _tracing()
+        if trace:
+            log_user_action("DRAIN_CANCELLATIONS", f"max_items={max_items}")
+        p = self.lib.eh_drain_cancellations(int(max_items))
+        if p == self.ffi.NULL:
+            raise MemoryError("eh_drain_cancellations failed")
         import json
         try:
-            result_data = json.loads(result_str)
-            status = result_data.get('status', 'unknown')
-            log_function_call("eh_process_last_cancellation", "Stack (LIFO)", "pop operation", f"status={status}")
-        except:
-            log_function_call("eh_process_last_cancellation", "Stack (LIFO)", "pop operation", "processed")
+            items = json.loads(self.ffi.string(p).decode("utf-8"))
+        finally:
+            self.lib.eh_free(p)
+        if trace:
+            log_function_call("eh_drain_cancellations", "Stack (batch pop)", f"max={max_items}", f"drained={len(items)}")
+        return items
+
+    def purge_event_requests(self, event_id: str) -> dict:
+        trace = _tracing()
+        if trace:
+            log_user_action("PURGE_EVENT_REQUESTS", f"event_id={event_id}")
+        p = self.lib.eh_purge_event_requests(_cstr(self.ffi, event_id))
+        if p == self.ffi.NULL:
+            raise MemoryError("eh_purge_event_requests failed")
+        import json
         try:
-            return result_str
+            counts = json.loads(self.ffi.string(p).decode("utf-8"))
         finally:
             self.lib.eh_free(p)
+        if trace:
+            log_function_call("eh_purge_event_requests", "Queue + Stack", f"event={event_id}",
+                              f"bookings={counts['bookings']}, cancellations={counts['cancellations']}")
+        return counts
+
+    def close_event(self, event_id: str) -> bool:
+        trace = _tracing()
+        if trace:
+            log_user_action("CLOSE_EVENT", f"event_id={event_id}")
+        result = bool(self.lib.eh_close_event(_cstr(self.ffi, event_id)))
+        if trace:
+            log_function_call("eh_close_event", "HashTable", f"event_id={event_id}", "closed" if result else "failed")
+        return result
+
+    def release_tickets(self, event_id: str, quantity: int) -> int:
+        trace = _tracing()
+        available = int(self.lib.eh_release_tickets(_cstr(self.ffi, event_id), int(quantity)))
+        if trace:
+            log_function_call("eh_release_tickets", "HashTable", f"event={event_id}, qty={quantity}", f"available={available}")
+        return available
 
     # Venues Graph
     def add_venue(self, name: str) -> bool:
-        log_user_action("ADD_VENUE", f"venue_name={name}")
+        trace = _tracing()
+        if trace:
+            log_user_action("ADD_VENUE", f"venue_name={name}")
         result = bool(self.lib.eh_add_venue(_cstr(self.ffi, name)))
-        log_function_call("eh_add_venue", "Graph (Node)", f"venue={name}", "added" if result else "failed")
+        if trace:
+            log_function_call("eh_add_venue", "Graph (Node)", f"venue={name}", "added" if result else "failed")
         return result
 
     def add_path(self, a: str, b: str, distance: int) -> bool:
-        log_user_action("ADD_PATH", f"from={a}, to={b}, distance={distance}")
+        trace = _tracing()
+        if trace:
+            log_user_action("ADD_PATH", f"from={a}, to={b}, distance={distance}")
         result = bool(self.lib.eh_add_path(_cstr(self.ffi, a), _cstr(self.ffi, b), int(distance)))
-        log_function_call("eh_add_path", "Graph (Edge)", f"{a} ↔ {b}, dist={distance}", "added" if result else "failed")
+        if trace:
+            log_function_call("eh_add_path", "Graph (Edge)", f"{a} ↔ {b}, dist={distance}", "added" if result else "failed")
         return result
 
     def shortest_path_json(self, a: str, b: str) -> str | None:
-        log_user_action("SHORTEST_PATH", f"from={a}, to={b}")
+        trace = _tracing()
+        if trace:
+            log_user_action("SHORTEST_PATH", f"from={a}, to={b}")
         p = self.lib.eh_shortest_path(_cstr(self.ffi, a), _cstr(self.ffi, b))
         found = p != self.ffi.NULL
         if found:
             try:
                 result_str = self.ffi.string(p).decode("utf-8")
-                import json
-                try:
-                    result_data = json.loads(result_str)
-                    distance = result_data.get('distance', 'unknown')
-                    path_len = len(result_data.get('path', []))
-                    log_function_call("eh_shortest_path", "Graph + Dijkstra", f"{a} → {b}", f"found: dist={distance}, path_len={path_len}")
-                except:
-                    log_function_call("eh_shortest_path", "Graph + Dijkstra", f"{a} → {b}", "found")
+                if trace:
+                    import json
+                    try:
+                        result_data = json.loads(result_str)
+                        log_function_call("eh_shortest_path", "Graph + Dijkstra", f"{a} → {b}", "found: dist=%s, path_len=%d",
+                                          result_data.get('distance', 'unknown'), len(result_data.get('path', [])))
+                    except ValueError:
+                        log_function_call("eh_shortest_path", "Graph + Dijkstra", f"{a} → {b}", "found")
                 return result_str
             finally:
                 self.lib.eh_free(p)
         else:
-            log_function_call("eh_shortest_path", "Graph + Dijkstra", f"{a} → {b}", "no path found")
+            if trace:
+                log_function_call("eh_shortest_path", "Graph + Dijkstra", f"{a} → {b}", "no path found")
             return None
 
-if __name__ == "__main__":
+def _main(argv) -> int:
+    import argparse
+    parser = argparse.ArgumentParser(description="Build or smoke-test the native EventHub store.")
+    parser.add_argument("command", nargs="?", choices=("build", "check", "smoke"), default="smoke",
+                        help="build: compile the extension; check: exit 1 if it is missing or "
+                             "stale; smoke: run a few calls (default)")
+    args = parser.parse_args(argv)
+    if args.command == "build":
+        try:
+            path = _build_module()
+        except NativeBuildError as e:
+            print(f"error: {e}", file=sys.stderr)
+            return 1
+        print(f"built {path}")
+        return 0
+    if args.command == "check":
+        path = _module_path()
+        if path is None or _is_stale(path):
+            print("native module " + ("missing" if path is None else f"stale: {path}"), file=sys.stderr)
+            return 1
+        print(f"native module up to date: {path}")
+        return 0
+    _smoke()
+    return 0
+
+
+def _smoke() -> None:
     eh = EventHub()
     # Smoke test
     eh.register_user("alice", "h_pwd")
@@ -270,3 +640,7 @@ if __name__ == "__main__":
     eh.cancel("alice","E1",1)
     print(eh.process_last_cancellation_json())
     eh.shutdown()
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv[1:]))
@@ -0,0 +1,134 @@
+"""
+Cold-start report for the app.
+
+Imports `app` in a fresh interpreter under `python -X importtime`, then
+serves one request, and prints where the time went:
+
+    python app.py --startup-report
+    python startup_report.py --top 15 --json
+
+Heavy optional dependencies (reportlab, PIL, numpy, qrcode) are only meant
+to load on first use; the report lists any that were imported at startup.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent
+LAZY_MODULES = ("reportlab", "PIL", "numpy", "qrcode")
+
+# Runs in the child: the import itself is what gets measured.
+_PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+app.app.test_client().get("/")
+t2 = time.perf_counter()
+print("@@startup " + json.dumps({
+    "import_s": t1 - t0,
+    "first_request_s": t2 - t1,
+    "loaded": [m for m in %r if m in sys.modules],
+}))
+""" % (LAZY_MODULES,)
+
+
+def parse_importtime(text: str) -> List[Dict]:
+    """Rows of `-X importtime` output as {module, self_us, cumulative_us, depth}."""
+    rows = []
+    for line in text.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        module = parts[2].rstrip()
+        depth = (len(module) - len(module.lstrip(" ")) - 1) // 2
+        rows.append({
+            "module": module.strip(),
+            "self_us": int(parts[0]),
+            "cumulative_us": int(parts[1]),
+            "depth": max(depth, 0),
+        })
+    return rows
+
+
+def collect(env: Optional[Dict[str, str]] = None) -> Dict:
+    """Run the probe in a child interpreter and summarize it."""
+    child_env = dict(os.environ)
+    child_env.setdefault("EVENTHUB_TRACE", "off")
+    child_env.setdefault("TICKET_SIGNING_KEY", "startup-report")
+    child_env.update(env or {})
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROBE],
+        cwd=str(ROOT), env=child_env, capture_output=True, text=True,
+    )
+    marker = [l for l in proc.stdout.splitlines() if l.startswith("@@startup ")]
+    if proc.returncode != 0 or not marker:
+        raise RuntimeError(f"startup probe failed (exit {proc.returncode}):\n{proc.stderr[-2000:]}")
+    summary = json.loads(marker[-1][len("@@startup "):])
+    rows = parse_importtime(proc.stderr)
+
+    app_row = next((r for r in rows if r["module"] == "app"), None)
+    direct = []
+    if app_row is not None:
+        # app's direct imports are the depth+1 rows printed before it
+        index = rows.index(app_row)
+        depth = app_row["depth"] + 1
+        for r in reversed(rows[:index]):
+            if r["depth"] < depth:
+                break
+            if r["depth"] == depth:
+                direct.append(r)
+    by_package: Dict[str, int] = defaultdict(int)
+    for r in rows:
+        by_package[r["module"].split(".")[0]] += r["self_us"]
+
+    return {
+        **summary,
+        "app_module_body_s": app_row["self_us"] / 1e6 if app_row else None,
+        "imports_total_s": sum(r["self_us"] for r in rows if r is not app_row) / 1e6,
+        "app_imports": sorted(({"module": r["module"], "cumulative_s": r["cumulative_us"] / 1e6} for r in direct),
+                              key=lambda r: -r["cumulative_s"]),
+        "packages": sorted(({"package": k, "self_s": v / 1e6} for k, v in by_package.items()),
+                           key=lambda r: -r["self_s"]),
+    }
+
+
+def render(report: Dict, top: int = 10) -> str:
+    ms = lambda s: f"{s * 1000:8.1f} ms"  # noqa: E731
+    lines = [
+        f"import app        {ms(report['import_s'])}",
+        f"  module imports  {ms(report['imports_total_s'])}",
+        f"  app.py body     {ms(report['app_module_body_s'] or 0)}",
+        f"first request     {ms(report['first_request_s'])}",
+        "",
+        f"slowest imports made by app.py (cumulative, top {top}):",
+    ]
+    lines += [f"  {ms(r['cumulative_s'])}  {r['module']}" for r in report["app_imports"][:top]]
+    lines += ["", f"heaviest packages (self time, top {top}):"]
+    lines += [f"  {ms(r['self_s'])}  {r['package']}" for r in report["packages"][:top]]
+    loaded = report["loaded"]
+    lines += ["", "lazy dependencies loaded at startup: " + (", ".join(loaded) if loaded else "none")]
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Report where app startup time goes.")
+    parser.add_argument("--top", type=int, default=10, help="rows per table")
+    parser.add_argument("--json", action="store_true", help="print the full report as JSON")
+    args = parser.parse_args(argv)
+    report = collect()
+    print(json.dumps(report, indent=2) if args.json else render(report, args.top))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+from flask import Response, request, send_file
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:  # gzip only
+    BROTLI_AVAILABLE = False
+
+import logging
+logger = logging.getLogger("StaticAssets")
+if not logger.handlers:
+    h = logging.StreamHandler()
+    h.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    logger.addHandler(h)
+logger.setLevel(logging.INFO)
+
+# Re-stat files on every request and skip fingerprinting (local editing).
+STATIC_RELOAD = os.getenv("STATIC_ASSETS_RELOAD", "0") == "1"
+MAX_INMEMORY_BYTES = 8 * 1024 * 1024
+MIN_COMPRESS_BYTES = 512
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"                  # HTML: always check the ETag
+SHORT = "public, max-age=86400"          # un-fingerprinted assets and images
+
+# Only these are served; everything else under the project root (sources,
+# databases, logs) stays private.
+SERVED_SUFFIXES = {".html", ".css", ".js", ".svg", ".png", ".jpg", ".jpeg", ".gif", ".webp", ".ico", ".woff2"}
+COMPRESSIBLE = {".html", ".css", ".js", ".svg"}
+FINGERPRINTED = {".css", ".js"}
+RANGE_SUFFIXES = {".png", ".jpg", ".jpeg", ".gif", ".webp"}
+
+mimetypes.add_type("image/webp", ".webp")
+mimetypes.add_type("font/woff2", ".woff2")
+
+_REF_RE = re.compile(r"""(?P<pre>\b(?:src|href)=["'])(?P<name>[\w./-]+\.(?:css|js))(?P<post>["'])""")
+
+
+class Asset:
+    __slots__ = ("name", "path", "suffix", "data", "gzip", "br", "etag", "mtime", "mimetype", "cache_control")
+
+    def __init__(self, name: str, path: Path, data: Optional[bytes], mtime: float):
+        self.name = name
+        self.path = path
+        self.suffix = path.suffix.lower()
+        self.data = data
+        self.gzip: Optional[bytes] = None
+        self.br: Optional[bytes] = None
+        self.mtime = datetime.fromtimestamp(int(mtime), tz=timezone.utc)
+        # werkzeug adds "; charset=utf-8" for text types itself
+        self.mimetype = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+        self.cache_control = SHORT
+        self.etag = ""
+        if data is not None:
+            self.set_data(data)
+
+    def set_data(self, data: bytes) -> None:
+        self.data = data
+        self.etag = hashlib.sha256(data).hexdigest()[:20]
+        self.gzip = self.br = None
+
+    @property
+    def compressible(self) -> bool:
+        return self.suffix in COMPRESSIBLE and self.data is not None and len(self.data) >= MIN_COMPRESS_BYTES
+
+    def encoded(self, encoding: str) -> bytes:
+        """Body compressed with `encoding`, compressed once on first use so
+        startup does not pay for every file (racing threads only duplicate
+        the work)."""
+        if encoding == "br":
+            if self.br is None:
+                self.br = brotli.compress(self.data, quality=11)
+            return self.br
+        if self.gzip is None:
+            self.gzip = gzip.compress(self.data, compresslevel=9, mtime=0)
+        return self.gzip
+
+
+class StaticAssets:
+    """
+    In-memory static files for the site.
+
+    At startup every servable file is read once and CSS/JS get a
+    content-hashed alias (styles.3f2a9c1d.css) that HTML pages are rewritten
+    to reference, so those can be cached as immutable. Text assets are
+    compressed (gzip, plus brotli when installed) on first request and kept
+    in memory. Responses carry ETag/Last-Modified and answer 304s; images
+    honor Range requests.
+    """
+
+    def __init__(self, root: Path, static_dir: Path, reload: bool = STATIC_RELOAD):
+        self.root = root
+        self.static_dir = static_dir
+        self.reload = reload
+        self._assets: Dict[str, Asset] = {}
+        self.fingerprints: Dict[str, str] = {}
+        self.load()
+
+    def _files(self) -> Iterable[Path]:
+        for path in sorted(self.root.iterdir()):
+            if path.is_file() and path.suffix.lower() in SERVED_SUFFIXES:
+                yield path
+        if self.static_dir.is_dir():
+            for path in sorted(self.static_dir.rglob("*")):
+                if path.is_file() and path.suffix.lower() in SERVED_SUFFIXES:
+                    yield path
+
+    def _read(self, name: str, path: Path) -> Asset:
+        st = path.stat()
+        data = path.read_bytes() if st.st_size <= MAX_INMEMORY_BYTES else None
+        return Asset(name, path, data, st.st_mtime)
+
+    def load(self) -> None:
+        assets: Dict[str, Asset] = {}
+        fingerprints: Dict[str, str] = {}
+        total = 0
+        for path in self._files():
+            name = path.relative_to(self.root).as_posix()
+            asset = self._read(name, path)
+            assets[name] = asset
+            total += len(asset.data or b"")
+            if not self.reload and asset.suffix in FINGERPRINTED and asset.data is not None:
+                fp_name = f"{path.with_suffix('').relative_to(self.root).as_posix()}.{asset.etag[:8]}{asset.suffix}"
+                fingerprints[name] = fp_name
+        # HTML references the fingerprinted names; those never change content.
+        for name, fp_name in fingerprints.items():
+            alias = Asset(fp_name, assets[name].path, None, assets[name].path.stat().st_mtime)
+            alias.data, alias.etag = assets[name].data, assets[name].etag
+            alias.cache_control = IMMUTABLE
+            assets[fp_name] = alias
+        if fingerprints:
+            for asset in list(assets.values()):
+                if asset.suffix == ".html" and asset.data is not None:
+                    asset.set_data(self._rewrite(asset.data, fingerprints))
+        for asset in assets.values():
+            if asset.suffix == ".html":
+                asset.cache_control = REVALIDATE
+        self._assets = assets
+        self.fingerprints = fingerprints
+        logger.info("static assets: %d file(s), %.1f KiB in memory, %d fingerprinted, brotli=%s",
+                    len(assets), total / 1024, len(fingerprints), BROTLI_AVAILABLE)
+
+    @staticmethod
+    def _rewrite(html: bytes, fingerprints: Dict[str, str]) -> bytes:
+        def sub(m: re.Match) -> str:
+            name = m.group("name")
+            fp_name = fingerprints.get(name.lstrip("./"))
+            if fp_name is None:
+                return m.group(0)
+            prefix = "/" if name.startswith("/") else ""
+            return f"{m.group('pre')}{prefix}{fp_name}{m.group('post')}"
+        return _REF_RE.sub(sub, html.decode("utf-8")).encode("utf-8")
+
+    def url_for(self, name: str) -> str:
+        """Fingerprinted URL for `name` when it has one."""
+        return "/" + self.fingerprints.get(name, name)
+
+    def _current(self, name: str) -> Optional[Asset]:
+        asset = self._assets.get(name)
+        if self.reload:
+            path = asset.path if asset else self.root / name
+            try:
+                resolved = path.resolve()
+                if path.suffix.lower() not in SERVED_SUFFIXES or self.root not in resolved.parents:
+                    return None
+                st = path.stat()
+            except OSError:
+                return None
+            if asset is None or int(st.st_mtime) != int(asset.mtime.timestamp()):
+                asset = self._read(name, path)
+                self._assets[name] = asset
+        return asset
+
+    def serve(self, name: str) -> Optional[Response]:
+        """Response for the asset at project-relative `name`, or None."""
+        asset = self._current(name.lstrip("/"))
+        if asset is None:
+            return None
+        if asset.data is None:
+            # Too large to hold in memory: stream it from disk.
+            resp = send_file(asset.path, mimetype=asset.mimetype, conditional=True)
+            resp.headers["Cache-Control"] = asset.cache_control
+            return resp
+
+        accept = request.headers.get("Accept-Encoding", "")
+        body, encoding = asset.data, None
+        if asset.compressible:
+            if BROTLI_AVAILABLE and "br" in accept:
+                encoding = "br"
+            elif "gzip" in accept:
+                encoding = "gzip"
+            if encoding:
+                body = asset.encoded(encoding)
+
+        resp = Response(body, mimetype=asset.mimetype)
+        resp.set_etag(f"{asset.etag}-{encoding}" if encoding else asset.etag)
+        resp.last_modified = asset.mtime
+        resp.headers["Cache-Control"] = asset.cache_control
+        if asset.compressible:
+            resp.vary.add("Accept-Encoding")
+        if encoding:
+            resp.headers["Content-Encoding"] = encoding
+        # 304 on If-None-Match / If-Modified-Since; 206 for ranges on images
+        return resp.make_conditional(request.environ, accept_ranges=asset.suffix in RANGE_SUFFIXES,
+                                     complete_length=len(body))
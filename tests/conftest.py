@@ -0,0 +1,80 @@
+import os
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+import pytest
+
+# The app's modules live at the repository root.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Everything the app writes (ledger, ticket registry, outbox, logs, caches)
+# goes to a scratch directory, never into the checkout. Set before any app
+# module is imported, since they read their paths at import time.
+_STATE_DIR = Path(tempfile.mkdtemp(prefix="eventhub-tests-"))
+for _name, _value in {
+    "BOOKING_LEDGER_DB": _STATE_DIR / "bookings.sqlite3",
+    "TICKET_REGISTRY_PATH": _STATE_DIR / "registry.log",
+    "EMAIL_OUTBOX_DB": _STATE_DIR / "outbox.sqlite3",
+    "EMAIL_OUTBOX_WORKERS": "0",
+    "TICKET_BATCH_DB": _STATE_DIR / "batches.sqlite3",
+    "TRACE_LOG_PATH": _STATE_DIR / "trace.ndjson",
+    "IMAGE_CACHE_DIR": _STATE_DIR / "images",
+    "TICKET_SIGNING_KEY": "test-signing-key",
+    "GATE_API_KEY": "test-gate-key",
+    "EVENTHUB_TRACE": "off",
+}.items():
+    os.environ.setdefault(_name, str(_value))
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+@pytest.fixture(scope="session")
+def app_module():
+    """The Flask app module with its native store; skipped when the native
+    library cannot be built here."""
+    import app
+    if not app.EVENTHUB_AVAILABLE:
+        pytest.skip("native EventHub store not available")
+    return app
+
+
+@pytest.fixture
+def client(app_module):
+    # A client address of its own per test, so rate limits don't carry over.
+    c = app_module.app.test_client()
+    c.environ_base["REMOTE_ADDR"] = f"10.{uuid.uuid4().int % 250}.{uuid.uuid4().int % 250}.{uuid.uuid4().int % 250}"
+    return c
+
+
+@pytest.fixture
+def new_event(client):
+    """POST a bookable event with a fresh id and return that id."""
+    def make(total=10, price=50.0, date="2030-06-01", event_id=None):
+        event_id = event_id or f"T{uuid.uuid4().hex[:10]}"
+        resp = client.post("/events", json={
+            "id": event_id, "name": f"Test {event_id}", "category": "Concerts", "venue": "Test Hall",
+            "date": date, "time": "19:00", "price": price, "total": total,
+        })
+        assert resp.status_code == 200, resp.get_json()
+        return event_id
+    return make
+
+
+@pytest.fixture
+def book(client):
+    """Queue a booking and process it; returns /book/process's result."""
+    def run(user_id, event_id, quantity=1):
+        resp = client.post("/book", json={"user_id": user_id, "event_id": event_id, "quantity": quantity})
+        assert resp.status_code == 200, resp.get_json()
+        return client.post("/book/process").get_json()
+    return run
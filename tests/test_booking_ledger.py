@@ -0,0 +1,110 @@
+import uuid
+
+import pytest
+
+import booking_ledger
+from booking_ledger import BookingLedger, booking_seats
+
+EVENT = {"id": "E1", "name": "Test Show", "category": "Concerts", "venue": "Test Hall",
+         "date": "2030-06-01", "time": "19:00", "price": 50}
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    return BookingLedger(db_path=str(tmp_path / "ledger.sqlite3"), seed=False)
+
+
+def _uuids(*hexes):
+    """uuid4 stand-in returning the given ids in turn."""
+    values = iter(hexes)
+    return lambda: uuid.UUID(next(values))
+
+
+def test_booking_id_collision_draws_a_new_id(ledger, monkeypatch):
+    first, second = "aa" * 16, "bb" * 16
+    monkeypatch.setattr(booking_ledger.uuid, "uuid4", _uuids(first, first, second))
+    mine = ledger.record("a@example.com", EVENT, 1)
+    theirs = ledger.record("b@example.com", EVENT, 2)
+
+    assert mine["bookingId"] == "BK" + first[:10].upper()
+    assert theirs["bookingId"] == "BK" + second[:10].upper()
+    assert theirs["userId"] == "b@example.com" and theirs["tickets"] == 2
+    assert ledger.get(mine["bookingId"])["userId"] == "a@example.com"
+
+
+def test_booking_id_collisions_give_up(ledger, monkeypatch):
+    taken = "cc" * 16
+    monkeypatch.setattr(booking_ledger.uuid, "uuid4", lambda: uuid.UUID(taken))
+    ledger.record("a@example.com", EVENT, 1)
+    with pytest.raises(booking_ledger.sqlite3.IntegrityError):
+        ledger.record("b@example.com", EVENT, 1)
+    # The failed booking rolled back its seats too.
+    assert ledger._db().execute("SELECT next_seat FROM event_seats").fetchone()[0] == 2
+
+
+def test_seeding_twice_adds_nothing(tmp_path):
+    path = str(tmp_path / "seeded.sqlite3")
+    BookingLedger(db_path=path)
+    again = BookingLedger(db_path=path)
+    assert again._db().execute("SELECT COUNT(*) FROM bookings").fetchone()[0] == len(booking_ledger.SEED_BOOKINGS)
+
+
+def test_seats_are_allocated_sequentially(ledger):
+    a = ledger.record("a@example.com", EVENT, 19)
+    b = ledger.record("b@example.com", EVENT, 3)
+    assert (a["row"], a["seatNumber"]) == ("A", "01")
+    assert [(s["row"], s["seatNumber"]) for s in booking_seats(b)] == [("A", "20"), ("B", "01"), ("B", "02")]
+
+
+def test_cancel_only_what_is_held(ledger):
+    old = ledger.record("a@example.com", EVENT, 2)
+    new = ledger.record("a@example.com", EVENT, 1)
+    result, = ledger.cancel_batch([("a@example.com", "E1", 5)])
+    assert result["cancelled"] == 3 and result["refund"] == 150
+    # Newest booking first.
+    assert [c["bookingId"] for c in result["bookings"]] == [new["bookingId"], old["bookingId"]]
+    assert ledger.held_tickets("a@example.com", "E1") == 0
+
+
+def test_event_batches_resume_without_repeats(ledger):
+    ids = sorted(ledger.record(f"u{i}@example.com", EVENT, 1)["bookingId"] for i in range(5))
+    first = ledger.cancel_event_batch("E1", limit=2)
+    # A restarted job starts again from the beginning.
+    rest = ledger.cancel_event_batch("E1", limit=10)
+    assert [b["bookingId"] for b in first + rest] == ids
+    assert ledger.cancel_event_batch("E1") == []
+    refunds = ledger._db().execute("SELECT COUNT(*), SUM(amount) FROM refunds").fetchone()
+    assert refunds == (5, 250)
+
+
+def test_pages_cover_every_booking_once(ledger, monkeypatch):
+    # Equal timestamps: the booking id breaks the tie.
+    monkeypatch.setattr(booking_ledger.time, "time", lambda: 1000.0)
+    ids = {ledger.record("Pager@example.com", EVENT, 1)["bookingId"] for _ in range(5)}
+    ledger.record("other@example.com", EVENT, 1)
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        page, cursor = ledger.list_for_user("pager@example.com", limit=2, cursor=cursor)
+        seen += [b["bookingId"] for b in page]
+        pages += 1
+        if cursor is None:
+            break
+    assert pages == 3 and set(seen) == ids and seen == sorted(seen, reverse=True)
+    with pytest.raises(ValueError):
+        ledger.list_for_user("pager@example.com", cursor="not-a-cursor")
+
+
+def test_my_bookings_pages(client, new_event, book):
+    email = f"mine{uuid.uuid4().hex[:8]}@example.com"
+    assert client.get("/me/bookings").status_code == 401
+    client.post("/signup", json={"name": "Mine", "email": email, "password": "secret1"})
+    assert client.post("/login", json={"email": email, "password": "secret1"}).status_code == 200
+    event_id = new_event()
+    booked = [book(email, event_id)["booking"]["bookingId"] for _ in range(3)]
+
+    first = client.get("/me/bookings?limit=2").get_json()
+    rest = client.get(f"/me/bookings?limit=2&cursor={first['next_cursor']}").get_json()
+    assert rest["next_cursor"] is None
+    assert [b["bookingId"] for b in first["bookings"] + rest["bookings"]] == booked[::-1]
+    assert client.get("/me/bookings?cursor=bogus").status_code == 400
@@ -0,0 +1,50 @@
+import pytest
+
+from cancellations import CancellationEngine
+from ticket_registry import ticket_id_for
+
+
+class _BrokenLedger:
+    def cancel_batch(self, requests):
+        raise RuntimeError("ledger unavailable")
+
+
+def _seat_state(app_module, booking_id, seat):
+    return app_module.ticket_registry.state(ticket_id_for(booking_id, seat))
+
+
+def test_ledger_failure_requeues_the_batch(client, app_module, new_event, book):
+    event_id = new_event(total=5)
+    booking_id = book('quote"d@example.com', event_id, 2)["booking"]["bookingId"]
+    assert client.post("/cancel", json={"user_id": 'quote"d@example.com', "event_id": event_id,
+                                        "quantity": 2}).status_code == 200
+    with pytest.raises(RuntimeError):
+        CancellationEngine(app_module.eh, _BrokenLedger()).process()
+
+    result = client.post("/cancel/process").get_json()
+    assert result["processed"] == 1 and result["released"] == {event_id: 2}
+    assert result["results"][0]["user"] == 'quote"d@example.com'
+    assert app_module.booking_ledger.get(booking_id)["status"] == "cancelled"
+    assert _seat_state(app_module, booking_id, 0) == "revoked"
+
+
+def test_partial_cancellation_revokes_the_last_seats(client, app_module, new_event, book):
+    event_id = new_event(total=5)
+    booking_id = book("part@example.com", event_id, 3)["booking"]["bookingId"]
+    assert client.post("/cancel", json={"user_id": "part@example.com", "event_id": event_id,
+                                        "quantity": 2}).status_code == 200
+    result = client.post("/cancel/process").get_json()
+    assert result["released"] == {event_id: 2}
+    assert [_seat_state(app_module, booking_id, seat) for seat in range(3)] == ["issued", "revoked", "revoked"]
+    resp = client.post("/cancel", json={"user_id": "part@example.com", "event_id": event_id, "quantity": 2})
+    assert resp.status_code == 400 and resp.get_json()["held"] == 1
+
+
+def test_queued_beyond_what_is_held_is_rejected(client, app_module, new_event, book):
+    # Two requests for the same ticket, both queued before either ran.
+    event_id = new_event()
+    book("twice@example.com", event_id, 1)
+    for _ in range(2):
+        assert app_module.eh.cancel("twice@example.com", event_id, 1)
+    result = client.post("/cancel/process").get_json()
+    assert result["processed"] == 2 and result["rejected"] == 1 and result["released"] == {event_id: 1}
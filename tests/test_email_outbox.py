@@ -0,0 +1,140 @@
+import smtplib
+import time
+
+import pytest
+
+import email_outbox
+from email_outbox import EmailOutbox, backoff_delay
+
+
+class FakeSMTP:
+    """Local SMTP stand-in: records delivered messages and fails sends
+    according to a script of exceptions (None = accept)."""
+
+    def __init__(self):
+        self.sent = []
+        self.script = []
+        self.connections = 0
+
+    def __call__(self, host, port, timeout=None):
+        self.connections += 1
+        return _FakeConnection(self)
+
+
+class _FakeConnection:
+    def __init__(self, server):
+        self.server = server
+
+    def send_message(self, msg):
+        if self.server.script:
+            error = self.server.script.pop(0)
+            if error is not None:
+                raise error
+        self.server.sent.append(msg)
+
+    def noop(self):
+        return 250, b"ok"
+
+    def quit(self):
+        pass
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(email_outbox, "RETRY_BASE_SECONDS", 0.05)
+    monkeypatch.setattr(email_outbox, "IDLE_POLL_SECONDS", 0.05)
+
+
+@pytest.fixture
+def smtp():
+    return FakeSMTP()
+
+
+@pytest.fixture
+def make_outbox(tmp_path, smtp):
+    outboxes = []
+
+    def make(**kwargs):
+        kwargs.setdefault("workers", 1)
+        box = EmailOutbox(db_path=str(tmp_path / "outbox.sqlite3"), smtp_factory=smtp, **kwargs)
+        outboxes.append(box)
+        return box
+
+    yield make
+    for box in outboxes:
+        box.stop()
+
+
+def test_delivers_queued_message(make_outbox, smtp):
+    box = make_outbox()
+    box.enqueue("a@example.com", "Hello", "<p>hi</p>")
+    assert wait_for(lambda: box.stats().get("sent") == 1)
+    assert smtp.sent[0]["To"] == "a@example.com"
+
+
+def test_transient_errors_are_retried_with_backoff(make_outbox, smtp):
+    smtp.script = [
+        smtplib.SMTPResponseException(451, b"try again later"),
+        smtplib.SMTPServerDisconnected("connection dropped"),
+        smtplib.SMTPServerDisconnected("connection dropped"),
+        None,
+    ]
+    box = make_outbox()
+    msg_id = box.enqueue("a@example.com", "Hello", "<p>hi</p>")
+    assert wait_for(lambda: box.stats().get("sent") == 1)
+    attempts, error = box._db().execute(
+        "SELECT attempts, last_error FROM outbox WHERE id = ?", (msg_id,)).fetchone()
+    # 451, then a dropped connection that also failed on the fresh reconnect
+    assert attempts == 3
+    assert error is None
+    assert len(smtp.sent) == 1
+    assert smtp.connections >= 3
+
+
+def test_5xx_is_permanent(make_outbox, smtp):
+    smtp.script = [smtplib.SMTPRecipientsRefused({"bad@example.com": (550, b"no such user")})]
+    box = make_outbox()
+    msg_id = box.enqueue("bad@example.com", "Hello", "<p>hi</p>")
+    assert wait_for(lambda: box.stats().get("failed") == 1)
+    status, attempts, error = box._db().execute(
+        "SELECT status, attempts, last_error FROM outbox WHERE id = ?", (msg_id,)).fetchone()
+    assert (status, attempts) == ("failed", 1)
+    assert "550" in error
+    assert smtp.sent == []
+
+
+def test_gives_up_after_max_attempts(make_outbox, smtp):
+    smtp.script = [smtplib.SMTPResponseException(421, b"busy")] * 10
+    box = make_outbox(max_attempts=3)
+    box.enqueue("a@example.com", "Hello", "<p>hi</p>")
+    assert wait_for(lambda: box.stats().get("failed") == 1)
+    assert box._db().execute("SELECT attempts FROM outbox").fetchone()[0] == 3
+
+
+def test_pending_messages_are_sent_after_restart(make_outbox, smtp):
+    stopped = make_outbox(workers=0)  # enqueues but never sends, like a process that died
+    stopped.enqueue("a@example.com", "One", "<p>1</p>")
+    stopped.enqueue("b@example.com", "Two", "<p>2</p>")
+    assert smtp.sent == []
+
+    restarted = make_outbox()
+    restarted.start()
+    assert wait_for(lambda: restarted.stats().get("sent") == 2)
+    assert sorted(m["To"] for m in smtp.sent) == ["a@example.com", "b@example.com"]
+
+
+def test_backoff_grows_and_is_capped(monkeypatch):
+    monkeypatch.setattr(email_outbox, "RETRY_BASE_SECONDS", 5.0)
+    monkeypatch.setattr(email_outbox, "RETRY_MAX_SECONDS", 60.0)
+    for attempts, full in [(1, 5.0), (2, 10.0), (3, 20.0), (5, 60.0), (10, 60.0)]:
+        delay = backoff_delay(attempts)
+        assert full / 2 <= delay <= full
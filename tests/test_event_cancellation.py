@@ -0,0 +1,46 @@
+import json
+
+from conftest import wait_for
+
+
+def _job(client, url):
+    assert wait_for(lambda: client.get(url).get_json()["status"] in ("done", "failed"))
+    return client.get(url).get_json()
+
+
+def test_delete_event_with_quotes_in_id(client, app_module, new_event):
+    event_id = new_event(event_id='E"2\\x')
+    resp = client.delete(f"/events/{event_id}")
+    assert resp.status_code == 202
+    body = resp.get_json()
+    assert body["purged"]["event"] == event_id
+    assert _job(client, body["status_url"])["status"] == "done"
+    assert app_module.eh.search_event_json(event_id) is None
+
+
+def test_called_off_event_stays_closed(client, app_module, new_event, book):
+    event_id = new_event(total=2)
+    booked = book("held@example.com", event_id, 1)
+    assert booked["status"] == "ok"
+    assert book("waiting@example.com", event_id, 2)["status"] == "waitlisted"
+    assert client.post("/book", json={"user_id": "queued@example.com", "event_id": event_id}).status_code == 200
+
+    resp = client.post(f"/events/{event_id}/cancel")
+    assert resp.status_code == 202
+    body = resp.get_json()
+    assert body["purged"] == {"event": event_id, "bookings": 1, "cancellations": 0, "waitlisted": 1}
+    job = _job(client, body["status_url"])
+    assert job["status"] == "done" and job["bookings"] == 1 and job["tickets"] == 1
+    # The booking's holder and both unfilled requests are told.
+    assert job["notified"] == 3
+
+    event = json.loads(app_module.eh.search_event_json(event_id))
+    assert event["closed"] is True and event["available"] == 0 and event["waitlist"] == 0
+    resp = client.post("/book", json={"user_id": "late@example.com", "event_id": event_id})
+    assert resp.status_code == 409
+    # Cancelled seats are not sold again, nor handed to anyone.
+    assert app_module.eh.release_tickets(event_id, 1) == 0
+    assert app_module.eh.book("raced@example.com", event_id, 1)
+    result = client.post("/book/process").get_json()
+    assert result["status"] == "fail" and result["reason"] == "event cancelled"
+    assert app_module.booking_ledger.get(booked["booking"]["bookingId"])["status"] == "cancelled"
@@ -0,0 +1,74 @@
+import uuid
+
+import pytest
+from flask import Flask, jsonify
+
+from idempotency import IdempotencyTable, idempotent, set_response_ref
+
+
+@pytest.fixture
+def tiny(tmp_path):
+    """A one-view app whose view counts its runs; `status` sets its answer."""
+    refs = {}
+    table = IdempotencyTable("test", db_path=str(tmp_path / "keys.sqlite3"), load_ref=refs.get)
+    app = Flask(__name__)
+    state = {"runs": 0, "status": 200, "ref": None}
+
+    @app.post("/thing")
+    @idempotent(table, wait_seconds=0.2, scope_func=lambda: "someone")
+    def thing():
+        state["runs"] += 1
+        if state["ref"]:
+            refs[state["ref"]] = b'{"from": "ref"}'
+            set_response_ref(state["ref"])
+        return jsonify(run=state["runs"]), state["status"]
+
+    state["client"] = app.test_client()
+    state["refs"] = refs
+    return state
+
+
+def _post(state, body=None, key="k1"):
+    return state["client"].post("/thing", json=body or {"a": 1}, headers={"Idempotency-Key": key})
+
+
+def test_repeat_is_replayed(tiny):
+    first = _post(tiny)
+    again = _post(tiny)
+    assert tiny["runs"] == 1
+    assert again.get_json() == first.get_json() and again.headers["Idempotent-Replayed"] == "true"
+    assert _post(tiny, key="k2").get_json() == {"run": 2}
+    assert tiny["client"].post("/thing", json={"a": 1}).get_json() == {"run": 3}
+
+
+def test_key_reused_for_another_request(tiny):
+    _post(tiny)
+    assert _post(tiny, body={"a": 2}).status_code == 422
+    assert tiny["runs"] == 1
+
+
+def test_failures_are_not_stored(tiny):
+    tiny["status"] = 503
+    assert _post(tiny).status_code == 503
+    tiny["status"] = 200
+    assert _post(tiny).get_json() == {"run": 2}
+
+
+def test_reference_is_resolved_on_replay(tiny):
+    tiny["ref"] = "r1"
+    _post(tiny)
+    assert _post(tiny).get_json() == {"from": "ref"} and tiny["runs"] == 1
+    # Its target gone (e.g. evicted from a cache), the view runs again.
+    tiny["refs"].clear()
+    assert _post(tiny).get_json() == {"run": 2}
+
+
+def test_booking_retry_queues_once(client, new_event):
+    event_id = new_event()
+    body = {"user_id": "retry@example.com", "event_id": event_id}
+    headers = {"Idempotency-Key": uuid.uuid4().hex}
+    assert client.post("/book", json=body, headers=headers).status_code == 200
+    resp = client.post("/book", json=body, headers=headers)
+    assert resp.status_code == 200 and resp.headers["Idempotent-Replayed"] == "true"
+    assert client.post("/book/process").get_json()["status"] == "ok"
+    assert client.post("/book/process").get_json()["status"] == "empty"
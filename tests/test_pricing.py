@@ -0,0 +1,82 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import pricing
+from pricing import PriceTable
+
+NOW = time.time()
+
+
+def _date(days):
+    return (datetime.fromtimestamp(NOW) + timedelta(days=days)).strftime("%Y-%m-%d")
+
+
+@pytest.fixture(params=[True, False], ids=["numpy", "python"])
+def compute_path(request, monkeypatch):
+    if request.param and not pricing.NUMPY_AVAILABLE:
+        pytest.skip("numpy not installed")
+    monkeypatch.setattr(pricing, "NUMPY_AVAILABLE", request.param)
+
+
+def _priced(*events):
+    table = PriceTable(lambda: list(events))
+    table.refresh(NOW)
+    return {e["id"]: table.price(e["id"]) for e in events}
+
+
+def test_unsold_event_far_out_is_not_discounted(compute_path):
+    assert _priced({"id": "a", "price": 100, "date": _date(90), "available_seats": "100/100"}) == {"a": 100}
+
+
+def test_unsold_event_close_to_its_date_is_discounted(compute_path):
+    assert _priced({"id": "a", "price": 100, "date": _date(1), "available_seats": "100/100"}) == {"a": 80}
+
+
+def test_event_without_seat_counts_keeps_its_price(compute_path):
+    assert _priced({"id": "a", "price": 100, "date": _date(2)}) == {"a": 100}
+
+
+def test_selling_fast_raises_the_price(compute_path):
+    assert _priced({"id": "a", "price": 100, "date": _date(10), "available_seats": "10/100"}) == {"a": 150}
+
+
+def test_multiplier_snaps_down_to_a_tier(compute_path):
+    # Sold out on its date: 1 + 0.8 * 0.5 + 0.5 = 1.9, between the 1.75 and 2.0 tiers.
+    assert _priced({"id": "a", "price": 100, "date": _date(0), "available_seats": "0/100"}) == {"a": 175}
+
+
+def test_paths_agree_and_snap_to_tiers(monkeypatch):
+    if not pricing.NUMPY_AVAILABLE:
+        pytest.skip("numpy not installed")
+    events = [{"id": f"{days}-{left}", "price": 40, "date": _date(days), "available_seats": f"{left}/40"}
+              for days in (-3, 0, 1, 7, 30, 59, 120) for left in range(0, 41, 5)]
+    numpy_prices = _priced(*events)
+    monkeypatch.setattr(pricing, "NUMPY_AVAILABLE", False)
+    assert _priced(*events) == numpy_prices
+    assert set(numpy_prices.values()) <= {round(40 * tier) for tier in pricing.PRICE_TIERS}
+
+
+def test_catalog_keeps_the_base_price(compute_path):
+    events = [{"id": "a", "price": 100, "date": _date(10), "available_seats": "10/100"},
+              {"id": "b", "price": 30}]
+    table = PriceTable(lambda: events)
+    table.refresh(NOW)
+    listed = table.apply(events + [{"id": "new", "price": 5}])
+    assert listed[0]["price"] == 150 and listed[0]["base_price"] == 100 and listed[0]["price_tier"] == 1.5
+    assert listed[1]["price"] == 30
+    assert listed[2] == {"id": "new", "price": 5}
+    table.stop()
+
+
+def test_booking_is_charged_the_displayed_price(app_module, client, new_event, book, monkeypatch):
+    event_id = new_event(price=100.0, event_id="1002")
+    app_module.price_table.start()
+    monkeypatch.setitem(app_module.price_table._prices, event_id, (80, 0.8))
+    listed = next(e for e in app_module._all_catalog() if str(e["id"]) == event_id)
+    assert listed["price"] == 80
+
+    booking = book("priced@example.com", event_id, quantity=2)["booking"]
+    assert booking["price"] == 80
+    assert booking["totalAmount"] == 160
@@ -0,0 +1,50 @@
+import time
+import uuid
+
+
+def _table(tmp_path, **kw):
+    from rate_limiter import TokenBucketTable
+    kw = {"capacity": 3, "refill_per_sec": 1.0, **kw}
+    return TokenBucketTable("t", db_path=str(tmp_path / "limits.sqlite3"), **kw)
+
+
+def test_bucket_empties_and_refills(tmp_path):
+    table = _table(tmp_path)
+    assert [table.consume("k", now=10.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert table.consume("k", now=10.0) == 1.0
+    assert table.consume("other", now=10.0) == 0.0
+    assert table.retry_after("k", now=10.5) == 0.5
+    assert table.consume("k", now=11.0) == 0.0
+    # A refused request takes nothing.
+    assert table.consume("k", cost=2, now=11.0) == 2.0
+
+
+def test_refilled_buckets_are_compacted(tmp_path):
+    table = _table(tmp_path, compact_interval=0)
+    t = time.time()
+    table.consume("a", now=t)
+    table.consume("b", cost=3, now=t)
+    assert len(table) == 2
+    table.consume("c", now=t + 1.5)
+    # "a" is full again and so no longer stored; "b" is still refilling.
+    assert len(table) == 2 and table.retry_after("b", cost=3, now=t + 1.5) == 1.5
+
+
+def test_login_lockout_after_failures(client):
+    email = f"lock{uuid.uuid4().hex[:8]}@example.com"
+    assert client.post("/signup", json={"name": "Lock Out", "email": email, "password": "secret1"}).status_code == 200
+    for _ in range(5):
+        assert client.post("/login", json={"email": email, "password": "wrong"}).status_code == 401
+    resp = client.post("/login", json={"email": email, "password": "secret1"})
+    assert resp.status_code == 429 and int(resp.headers["Retry-After"]) > 0
+    assert resp.get_json()["reason"] == "account"
+
+
+def test_successful_login_clears_failures(client):
+    email = f"ok{uuid.uuid4().hex[:8]}@example.com"
+    client.post("/signup", json={"name": "Ok User", "email": email, "password": "secret1"})
+    for _ in range(4):
+        client.post("/login", json={"email": email, "password": "wrong"})
+    assert client.post("/login", json={"email": email, "password": "secret1"}).status_code == 200
+    for _ in range(4):
+        assert client.post("/login", json={"email": email, "password": "wrong"}).status_code == 401
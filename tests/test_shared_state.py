@@ -0,0 +1,56 @@
+"""State every gunicorn worker must see: each test uses two instances over
+the same SQLite file, as two worker processes would."""
+from conftest import wait_for
+
+
+def test_rate_limit_shared_between_workers(tmp_path):
+    from rate_limiter import TokenBucketTable
+    db = str(tmp_path / "limits.sqlite3")
+    a = TokenBucketTable("t", capacity=2, refill_per_sec=0.1, db_path=db)
+    b = TokenBucketTable("t", capacity=2, refill_per_sec=0.1, db_path=db)
+    assert a.consume("1.2.3.4", now=100.0) == 0.0
+    assert b.consume("1.2.3.4", now=100.0) == 0.0
+    assert a.consume("1.2.3.4", now=100.0) > 0
+    assert b.retry_after("1.2.3.4", now=100.0) > 0
+    # Another table name is another limit.
+    assert TokenBucketTable("u", capacity=2, refill_per_sec=0.1, db_path=db).consume("1.2.3.4", now=100.0) == 0.0
+    b.reset("1.2.3.4")
+    assert a.consume("1.2.3.4", now=100.0) == 0.0
+
+
+def test_metrics_summed_over_workers(tmp_path):
+    from metrics import MetricsRegistry
+    db = str(tmp_path / "metrics.sqlite3")
+    a = MetricsRegistry(db_path=db, publish_interval=3600)
+    b = MetricsRegistry(db_path=db, publish_interval=3600)
+    labels = ("index", "GET", "200")
+    a.inc("http_requests_total", labels, 2)
+    b.inc("http_requests_total", labels, 3)
+    b.publish()
+    assert 'http_requests_total{endpoint="index",method="GET",status="200"} 5' in a.render_prometheus()
+
+
+def test_batch_job_visible_to_another_worker(client, app_module, new_event, book):
+    if not app_module.PDF_GENERATION_AVAILABLE:
+        import pytest
+        pytest.skip("reportlab not installed")
+    from ticket_batch import BatchStore
+    event_id = new_event()
+    booking_id = book("batch@example.com", event_id)["booking"]["bookingId"]
+    resp = client.post("/download_tickets/batch", json={"bookings": [booking_id], "format": "pdf"})
+    assert resp.status_code == 202
+    job_id = resp.get_json()["job_id"]
+    other = BatchStore(app_module.batch_renderer.store.db_path)
+    assert wait_for(lambda: other.load(job_id).status == "done", timeout=60)
+    assert other.document(job_id).startswith(b"%PDF")
+
+
+def test_event_cancellation_job_visible_to_another_worker(client, app_module, new_event, book):
+    from cancellations import CancellationEngine
+    event_id = new_event()
+    book("called-off@example.com", event_id)
+    job_id = client.post(f"/events/{event_id}/cancel").get_json()["job_id"]
+    other = CancellationEngine(app_module.eh, app_module.booking_ledger,
+                               db_path=app_module.cancellation_engine.db_path)
+    assert wait_for(lambda: other.get_job(job_id).status == "done")
+    assert other.get_job(job_id).progress()["bookings"] == 1
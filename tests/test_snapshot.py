@@ -0,0 +1,41 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# One server run: prints whether the store file is the snapshot's inode at
+# startup, whether the snapshot then moved to a fresh file, and whether alice
+# can log in; then registers alice and shuts down (writing the snapshot).
+_RUN = """
+import json, os, time
+from scripts.eventhub_binding import EventHub, SHARED_STORE_PATH, SNAPSHOT_PATH
+seed = os.stat(SNAPSHOT_PATH).st_ino if os.path.exists(SNAPSHOT_PATH) else None
+eh = EventHub()
+linked = os.stat(SHARED_STORE_PATH).st_ino == seed
+deadline = time.monotonic() + 10
+while linked and os.stat(SNAPSHOT_PATH).st_ino == seed and time.monotonic() < deadline:
+    time.sleep(0.02)
+detached = linked and os.stat(SNAPSHOT_PATH).st_ino != seed
+found = eh.lib.eh_login_user(b"alice@example.com", b"hash")
+eh.lib.eh_register_user(b"alice@example.com", b"hash")
+eh.shutdown()
+print(json.dumps([linked, detached, found]))
+"""
+
+
+def _run(tmp_path, generation):
+    env = dict(os.environ, EVENTHUB_SHARED_STORE=str(tmp_path / "store"), EVENTHUB_SNAPSHOT=str(tmp_path / "snap"),
+               EVENTHUB_STORE_GENERATION=generation, EVENTHUB_SNAPSHOT_INTERVAL="3600", PYTHONPATH=str(ROOT))
+    out = subprocess.run([sys.executable, "-c", _RUN], cwd=ROOT, env=env, capture_output=True, text=True, timeout=120)
+    assert out.returncode == 0, out.stderr
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def test_shared_store_starts_from_linked_snapshot(tmp_path):
+    assert _run(tmp_path, "first") == [False, False, 0]
+    # The next server run maps the snapshot file itself as its store, then
+    # writes a fresh snapshot so the old path stops tracking the live store.
+    assert _run(tmp_path, "second") == [True, True, 1]
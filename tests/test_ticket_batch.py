@@ -0,0 +1,38 @@
+import pytest
+
+from conftest import wait_for
+
+
+@pytest.fixture
+def batch_job(client, app_module):
+    if not app_module.PDF_GENERATION_AVAILABLE:
+        pytest.skip("reportlab not installed")
+
+    def run(booking_ids, fmt="zip"):
+        resp = client.post("/download_tickets/batch", json={"bookings": booking_ids, "format": fmt})
+        assert resp.status_code == 202, resp.get_json()
+        url = resp.get_json()["status_url"]
+        assert wait_for(lambda: client.get(url).get_json()["status"] not in ("queued", "running"), timeout=60)
+        return client.get(url).get_json()
+    return run
+
+
+def test_batch_skips_cancelled_bookings(client, new_event, book, batch_job):
+    event_id = new_event()
+    kept = book("keep@example.com", event_id)["booking"]["bookingId"]
+    dropped = book("drop@example.com", event_id)["booking"]["bookingId"]
+    assert client.post("/cancel", json={"user_id": "drop@example.com", "event_id": event_id}).status_code == 200
+    client.post("/cancel/process")
+
+    job = batch_job([kept, dropped])
+    assert job["total"] == 2 and job["failed"] == 1
+    assert job["failures"][0]["bookingId"] == dropped
+    assert "not confirmed" in job["failures"][0]["error"]
+
+
+def test_batch_size_is_capped(client, app_module):
+    if not app_module.PDF_GENERATION_AVAILABLE:
+        pytest.skip("reportlab not installed")
+    resp = client.post("/download_tickets/batch",
+                       json={"bookings": ["BK0000000000"] * (app_module.MAX_TICKET_BATCH + 1)})
+    assert resp.status_code == 413
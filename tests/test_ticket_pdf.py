@@ -0,0 +1,27 @@
+import pytest
+
+import ticket_pdf
+
+pytestmark = pytest.mark.skipif(not ticket_pdf.PDF_GENERATION_AVAILABLE, reason="reportlab not installed")
+
+
+def _booking(booking_id, category="movies"):
+    return {"bookingId": booking_id, "category": category, "eventTitle": "Test Show",
+            "date": "2030-06-01", "time": "19:00", "venue": "Test Hall", "price": 10}
+
+
+def test_background_is_built_once_per_theme(monkeypatch):
+    gen = ticket_pdf.StandardizedTicketGenerator()
+    monkeypatch.setattr(ticket_pdf, "_BACKGROUND_OPS", {})
+    built = []
+    real = gen._background_ops
+    monkeypatch.setattr(gen, "_background_ops", lambda color: built.append(color) or real(color))
+
+    first = gen.render_tickets([_booking("BK0000000001"), _booking("BK0000000002")])
+    second = gen.render_tickets([_booking("BK0000000003")])
+
+    assert len(built) == 1
+    for pdf in (first, second):
+        assert pdf.startswith(b"%PDF") and b"/FormXob.ticket_bg_movies" in pdf
+    # Each document carries its own copy of the form, drawn once for all its pages.
+    assert first.count(b"/Subtype /Form") == 1
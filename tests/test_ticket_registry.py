@@ -0,0 +1,58 @@
+import pytest
+
+from ticket_registry import TicketRegistry, sign_ticket, ticket_id_for, verify_token
+
+
+def test_ticket_ids_and_signatures():
+    assert ticket_id_for("BK00A1", 0) != ticket_id_for("BK0A1", 0)
+    assert ticket_id_for("BK00A1", 1) != ticket_id_for("BK00A1", 0)
+    with pytest.raises(ValueError):
+        ticket_id_for("not-a-booking")
+    token = sign_ticket("123", key=b"k1")
+    assert verify_token(token, key=b"k1") == "123"
+    assert verify_token(token, key=b"k2") is None
+    assert verify_token("124." + token.partition(".")[2], key=b"k1") is None
+
+
+def test_scan_admits_once_across_processes(tmp_path):
+    path = str(tmp_path / "registry.log")
+    gate_a, gate_b = TicketRegistry(path, key=b"k"), TicketRegistry(path, key=b"k")
+    ticket_id = ticket_id_for("BK1234", 0)
+    token = gate_a.issue(ticket_id, "BK1234")
+    assert gate_b.validate(token, mark=False)[0] == "valid"
+    status, info = gate_b.validate(token)
+    assert status == "admitted" and info["booking_id"] == "BK1234"
+    assert gate_a.validate(token)[0] == "already_scanned"
+    # A restart replays the log.
+    assert TicketRegistry(path, key=b"k").state(ticket_id) == "scanned"
+
+
+def test_revoked_and_unknown_tickets(tmp_path):
+    registry = TicketRegistry(str(tmp_path / "registry.log"), key=b"k")
+    seats = [ticket_id_for("BK99", i) for i in range(3)]
+    assert registry.issue_many(seats, "BK99") == 3
+    assert registry.issue_many(seats, "BK99") == 0
+    assert registry.revoke_many(seats[:2]) == 2
+    assert registry.revoke_many(seats[:2]) == 0
+    assert registry.validate(registry.token_for(seats[0]))[0] == "revoked"
+    assert registry.validate(registry.token_for(seats[2]))[0] == "admitted"
+    assert registry.validate(registry.token_for(ticket_id_for("BK98")))[0] == "unknown"
+    assert registry.validate("garbage")[0] == "invalid_signature"
+
+
+def test_gate_validates_booked_tickets(client, app_module, new_event, book):
+    booking = book("gate@example.com", new_event(), 2)["booking"]
+    token = app_module.ticket_registry.token_for(ticket_id_for(booking["bookingId"], 1))
+    headers = {"X-Gate-Key": "test-gate-key"}
+    assert client.post("/tickets/validate", json={"token": token}).status_code == 401
+    resp = client.post("/tickets/validate", json={"token": token}, headers=headers)
+    assert resp.status_code == 200 and resp.get_json()["booking_id"] == booking["bookingId"]
+    assert client.post("/tickets/validate", json={"token": token}, headers=headers).status_code == 409
+
+    # Cancelling the booking revokes its tickets.
+    other = app_module.ticket_registry.token_for(ticket_id_for(booking["bookingId"], 0))
+    assert client.post("/cancel", json={"user_id": "gate@example.com", "event_id": booking["eventId"],
+                                        "quantity": 2}).status_code == 200
+    client.post("/cancel/process")
+    resp = client.post("/tickets/validate", json={"token": other}, headers=headers)
+    assert resp.status_code == 409 and resp.get_json()["status"] == "revoked"
@@ -0,0 +1,79 @@
+import json
+import os
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _promotions(eh, event_id):
+    return [(p["user"], p["quantity"]) for p in eh.drain_promotions() if p["event"] == event_id]
+
+
+def test_sold_out_requests_wait_and_are_promoted_best_fit(app_module, new_event, book):
+    eh = app_module.eh
+    event_id = new_event(total=3)
+    assert book("a@example.com", event_id, 3)["status"] == "ok"
+    assert book("big@example.com", event_id, 2)["status"] == "waitlisted"
+    assert book("small@example.com", event_id, 1)["status"] == "waitlisted"
+    assert book("huge@example.com", event_id, 4)["status"] == "fail"  # more than the event holds
+    assert eh.waitlist_length(event_id) == 2
+
+    # One seat back: the oldest request does not fit, the next one does.
+    assert eh.release_tickets(event_id, 1) == 0
+    assert _promotions(eh, event_id) == [("small@example.com", 1)]
+    assert eh.release_tickets(event_id, 2) == 0
+    assert _promotions(eh, event_id) == [("big@example.com", 2)]
+    assert eh.waitlist_length(event_id) == 0
+
+
+def test_cancellation_books_the_waitlisted_request(client, app_module, new_event, book):
+    event_id = new_event(total=1)
+    assert book("held@example.com", event_id)["status"] == "ok"
+    assert book("next@example.com", event_id)["status"] == "waitlisted"
+    assert client.post("/cancel", json={"user_id": "held@example.com", "event_id": event_id}).status_code == 200
+
+    result = client.post("/cancel/process").get_json()
+    promoted, = [b for b in result["promoted"] if b["eventId"] == event_id]
+    assert promoted["userId"] == "next@example.com" and promoted["status"] == "confirmed"
+    assert app_module.booking_ledger.held_tickets("next@example.com", event_id) == 1
+    assert app_module.booking_ledger.held_tickets("held@example.com", event_id) == 0
+
+
+_FULL_ARENA = textwrap.dedent("""
+    import json
+    from scripts.eventhub_binding import EventHub
+
+    eh = EventHub()
+    eh.add_event("E1", "Show", "Concerts", "Hall", 1, date="2030-06-01", time="19:00", price=10)
+    assert eh.book("a", "E1", 1) and json.loads(eh.process_next_booking_json())["status"] == "ok"
+    assert eh.book("w", "E1", 1) and json.loads(eh.process_next_booking_json())["status"] == "waitlisted"
+    for _ in range(50):
+        assert eh.book("filler", "E0", 1)
+    # Use up the arena, then the blocks freed requests left behind.
+    i = 0
+    while eh.register_user(f"user-{i}", "x" * 40):
+        i += 1
+    while eh.book("filler", "E0", 1):
+        pass
+    eh.release_tickets("E1", 1)
+    stuck = (json.loads(eh.search_event_json("E1"))["available"], eh.waitlist_length("E1"), eh.drain_promotions())
+    eh.purge_event_requests("E0")
+    eh.release_tickets("E1", 1)
+    print(json.dumps([stuck, eh.drain_promotions()]))
+""")
+
+
+def test_full_arena_keeps_waiting_requests(tmp_path):
+    env = dict(os.environ, EVENTHUB_SHARED_STORE=str(tmp_path / "store"), EVENTHUB_STORE_MB="1",
+               EVENTHUB_SNAPSHOT="", PYTHONPATH=str(ROOT))
+    out = subprocess.run([sys.executable, "-c", _FULL_ARENA], cwd=ROOT, env=env,
+                         capture_output=True, text=True, timeout=120)
+    assert out.returncode == 0, out.stderr
+    stuck, promoted = json.loads(out.stdout.strip().splitlines()[-1])
+    # No room for the promotion: the seat and the request both stay put...
+    assert stuck == [1, 1, []]
+    # ...and are matched up once there is room again.
+    assert promoted == [{"user": "w", "event": "E1", "quantity": 1}]
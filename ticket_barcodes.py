@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Tuple
+
+# Encoded symbols are memoized per value: a ticket id is encoded once no matter
+# how many times its PDF is (re)rendered, and drawing only walks the runs.
+ENCODE_CACHE_SIZE = 8192
+
+# Quiet zones required by the symbologies, in modules.
+CODE128_QUIET = 10
+QR_QUIET = 4
+
+
+@lru_cache(maxsize=ENCODE_CACHE_SIZE)
+def code128_bars(value: str) -> Tuple[int, Tuple[Tuple[int, int], ...]]:
+    """
+    Code 128 encoding of `value` as (total_modules, ((offset, width), ...)).
+    Offsets and widths are in modules and cover bars only; reportlab picks
+    the code sets (all-digit ticket ids use the dense set C).
+    """
+    from reportlab.graphics.barcode.code128 import Code128
+    bc = Code128(value)
+    bc.validate()
+    bc.encode()
+    # decompose() yields one letter per element: upper case = bar,
+    # lower case = space, width 1-4 modules as A-D / a-d.
+    bars = []
+    pos = 0
+    for ch in bc.decompose():
+        if ch.isupper():
+            width = ord(ch) - ord("A") + 1
+            bars.append((pos, width))
+        else:
+            width = ord(ch) - ord("a") + 1
+        pos += width
+    return pos, tuple(bars)
+
+
+@lru_cache(maxsize=ENCODE_CACHE_SIZE)
+def qr_runs(value: str) -> Tuple[int, Tuple[Tuple[int, int, int], ...]]:
+    """
+    QR encoding of `value` as (size, ((row, col, length), ...)): horizontal
+    runs of dark modules, row 0 at the top, without the quiet zone.
+    """
+    import qrcode
+    qr = qrcode.QRCode(border=0, error_correction=qrcode.constants.ERROR_CORRECT_M)
+    qr.add_data(value)
+    qr.make(fit=True)
+    matrix = qr.get_matrix()
+    runs = []
+    for r, row in enumerate(matrix):
+        c = 0
+        n = len(row)
+        while c < n:
+            if row[c]:
+                start = c
+                while c < n and row[c]:
+                    c += 1
+                runs.append((r, start, c - start))
+            else:
+                c += 1
+    return len(matrix), tuple(runs)
+
+
+def draw_code128(canv, value: str, x: float, y: float, width: float, height: float) -> None:
+    """Draw a Code 128 symbol filling the box (quiet zones included) as one
+    filled vector path."""
+    modules, bars = code128_bars(value)
+    module = width / (modules + 2 * CODE128_QUIET)
+    left = x + CODE128_QUIET * module
+    p = canv.beginPath()
+    for offset, w in bars:
+        p.rect(left + offset * module, y, w * module, height)
+    canv.drawPath(p, stroke=0, fill=1)
+
+
+def draw_qr(canv, value: str, x: float, y: float, size: float) -> None:
+    """Draw a QR symbol in the size x size box at (x, y) (quiet zone included)
+    as one filled vector path."""
+    n, runs = qr_runs(value)
+    module = size / (n + 2 * QR_QUIET)
+    left = x + QR_QUIET * module
+    top = y + size - QR_QUIET * module
+    p = canv.beginPath()
+    for r, c, length in runs:
+        p.rect(left + c * module, top - (r + 1) * module, length * module, module)
+    canv.drawPath(p, stroke=0, fill=1)
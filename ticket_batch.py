@@ -0,0 +1,487 @@
+#!/usr/bin/env python3
+"""
+Batch ticket rendering for group bookings and mass reissues.
+
+Tickets are rendered in a process pool (reportlab is CPU-bound and holds the
+GIL), so a batch never occupies a web worker. Jobs report progress and
+per-ticket failures while they run; the result is either a ZIP with one PDF
+per ticket or a single multi-page PDF.
+
+CLI:
+    python ticket_batch.py bookings.json -o tickets.zip
+    python ticket_batch.py bookings.json -o tickets.pdf --format pdf
+"""
+from __future__ import annotations
+
+import io
+import json
+import multiprocessing
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import logging
+logger = logging.getLogger("TicketBatch")
+if not logger.handlers:
+    h = logging.StreamHandler()
+    h.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    logger.addHandler(h)
+logger.setLevel(logging.INFO)
+
+ROOT = Path(__file__).resolve().parent
+# Jobs and their rendered tickets, shared by every worker process: a job can
+# be polled and fetched through any of them.
+BATCH_DB = os.getenv("TICKET_BATCH_DB", str(ROOT / "ticket_batches.sqlite3"))
+REQUIRED_FIELDS = ("bookingId", "eventTitle", "category", "date", "time", "venue")
+MAX_WORKERS = int(os.getenv("TICKET_BATCH_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+MAX_JOBS = 64
+MAX_BATCH = 500             # booking ids per request; each may expand to several tickets
+
+# --- Worker side (runs in the pool processes) ---
+
+_generator = None
+
+
+def _worker_generator():
+    global _generator
+    if _generator is None:
+        from ticket_pdf import StandardizedTicketGenerator
+        _generator = StandardizedTicketGenerator()
+    return _generator
+
+
+def render_one(booking_data: dict) -> bytes:
+    """Render a single ticket; raises on failure so the parent sees the reason."""
+    pdf = _worker_generator().render_ticket(booking_data)
+    if pdf is None:
+        raise RuntimeError("ticket renderer failed")
+    return pdf
+
+
+def render_document(bookings: List[dict]) -> bytes:
+    """Render all bookings as pages of one PDF; the theme backgrounds are
+    defined once and shared by every page."""
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.pagesizes import letter
+    gen = _worker_generator()
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf, pagesize=letter)
+    for booking_data in bookings:
+        gen.draw_ticket_page(c, booking_data)
+        c.showPage()
+    c.save()
+    return buf.getvalue()
+
+
+# --- Parent side ---
+
+def validate_booking(booking_data) -> Optional[str]:
+    if not isinstance(booking_data, dict):
+        return "booking must be an object"
+    missing = [k for k in REQUIRED_FIELDS if not booking_data.get(k)]
+    if missing:
+        return f"missing fields: {', '.join(missing)}"
+    return None
+
+
+def ticket_filename(booking_data: dict, index: int) -> str:
+    safe_title = re.sub(r"[^\w\s-]", "", str(booking_data.get("eventTitle", ""))).strip()
+    safe_title = re.sub(r"[-\s]+", "_", safe_title) or "ticket"
+    seat = re.sub(r"[^\w-]", "", f"{booking_data.get('row', '')}{booking_data.get('seatNumber', '')}")
+    return f"{index:04d}_{safe_title}_{booking_data.get('bookingId')}_{seat or 'GA'}.pdf"
+
+
+class BatchJob:
+    """
+    One batch render. The process running it updates it as tickets come
+    back from the pool; every change is written through to the BatchStore,
+    where any process can load it (BatchStore.load) to report progress or
+    stream the result.
+    """
+
+    def __init__(self, store: "BatchStore", bookings: List[dict], fmt: str):
+        self.store = store
+        self.id = uuid.uuid4().hex
+        self.format = fmt
+        self.bookings = bookings
+        self.total = len(bookings)
+        self.done = 0
+        self.rendered = 0
+        self.failures: List[dict] = []
+        self.status = "queued"
+        self.created = time.time()
+        self.finished: Optional[float] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    def progress(self) -> dict:
+        with self._lock:
+            return self._progress()
+
+    def _progress(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "format": self.format,
+            "total": self.total,
+            "done": self.done,
+            "failed": len(self.failures),
+            "failures": list(self.failures),
+            "elapsed": round((self.finished or time.time()) - self.created, 3),
+        }
+
+    def _state(self) -> str:
+        """Caller holds self._lock."""
+        state = self._progress()
+        del state["elapsed"]
+        state.update(rendered=self.rendered, created=self.created, finished=self.finished)
+        return json.dumps(state)
+
+    def record(self, index: int, pdf: Optional[bytes], error: Optional[str]) -> None:
+        # Written under the lock, so a slower thread cannot overwrite a later state.
+        with self._lock:
+            self.done += 1
+            if error is None:
+                self.rendered += 1
+                self.store.save(self, ticket=(index, ticket_filename(self.bookings[index], index), pdf))
+            else:
+                self.failures.append({"index": index, "bookingId": self._booking_id(index), "error": error})
+                self.store.save(self)
+
+    def fail_all(self, indexes: List[int], error: str) -> None:
+        with self._lock:
+            self.done = self.total
+            self.failures.extend({"index": i, "bookingId": self._booking_id(i), "error": error} for i in indexes)
+            self.status = "failed"
+            self.finished = time.time()
+            self.store.save(self)
+
+    def finish(self, status: str, document: Optional[bytes] = None) -> None:
+        with self._lock:
+            if document is not None:
+                self.done = self.total
+                self.rendered = self.total - len(self.failures)
+            self.status = status
+            self.finished = time.time()
+            self.store.save(self, document=document)
+
+    def _booking_id(self, index: int):
+        b = self.bookings[index]
+        return b.get("bookingId") if isinstance(b, dict) else None
+
+    @property
+    def document(self) -> Optional[bytes]:
+        """The multi-page PDF of a finished "pdf" job."""
+        return self.store.document(self.id)
+
+    def iter_zip(self) -> Iterator[bytes]:
+        """Stream the ZIP archive chunk by chunk. PDFs are already deflated,
+        so entries are stored rather than recompressed."""
+        sink = _ChunkSink()
+        with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED) as zf:
+            for filename, pdf in self.store.tickets(self.id):
+                zf.writestr(filename, pdf)
+                yield sink.drain()
+        yield sink.drain()
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS batch_jobs (
+    job_id TEXT PRIMARY KEY,
+    created REAL NOT NULL,
+    state TEXT NOT NULL,
+    document BLOB
+);
+CREATE INDEX IF NOT EXISTS batch_jobs_by_created ON batch_jobs (created);
+CREATE TABLE IF NOT EXISTS batch_tickets (
+    job_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    filename TEXT NOT NULL,
+    pdf BLOB NOT NULL,
+    PRIMARY KEY (job_id, idx)
+);
+"""
+
+
+class BatchStore:
+    """Batch jobs, their progress and rendered PDFs, in SQLite; the newest
+    MAX_JOBS are kept."""
+
+    def __init__(self, db_path: str = BATCH_DB):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._db().executescript(_SCHEMA)
+
+    def _db(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def create(self, job: BatchJob) -> None:
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            with job._lock:
+                db.execute("INSERT INTO batch_jobs (job_id, created, state) VALUES (?, ?, ?)",
+                           (job.id, job.created, job._state()))
+            old = db.execute("SELECT job_id FROM batch_jobs ORDER BY created DESC LIMIT -1 OFFSET ?",
+                             (MAX_JOBS,)).fetchall()
+            db.executemany("DELETE FROM batch_tickets WHERE job_id = ?", old)
+            db.executemany("DELETE FROM batch_jobs WHERE job_id = ?", old)
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+
+    def save(self, job: BatchJob, ticket: Optional[Tuple[int, str, bytes]] = None,
+             document: Optional[bytes] = None) -> None:
+        """Write the job's state (caller holds job._lock), with a rendered
+        ticket or the finished document, in one transaction."""
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            if ticket is not None:
+                db.execute("INSERT OR REPLACE INTO batch_tickets (job_id, idx, filename, pdf) VALUES (?, ?, ?, ?)",
+                           (job.id,) + ticket)
+            if document is not None:
+                db.execute("UPDATE batch_jobs SET document = ? WHERE job_id = ?", (document, job.id))
+            db.execute("UPDATE batch_jobs SET state = ? WHERE job_id = ?", (job._state(), job.id))
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+
+    def load(self, job_id: str) -> Optional[BatchJob]:
+        """A read-only copy of a job, for progress and results."""
+        row = self._db().execute("SELECT state FROM batch_jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        state = json.loads(row[0])
+        job = BatchJob(self, [], state["format"])
+        job.id = job_id
+        for name in ("status", "total", "done", "rendered", "failures", "created", "finished"):
+            setattr(job, name, state[name])
+        return job
+
+    def document(self, job_id: str) -> Optional[bytes]:
+        row = self._db().execute("SELECT document FROM batch_jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return row[0] if row else None
+
+    def tickets(self, job_id: str) -> Iterator[Tuple[str, bytes]]:
+        """(filename, pdf) of a job's rendered tickets in index order, read
+        one at a time."""
+        for filename, pdf in self._db().execute(
+                "SELECT filename, pdf FROM batch_tickets WHERE job_id = ? ORDER BY idx", (job_id,)):
+            yield filename, pdf
+
+
+class _ChunkSink(io.RawIOBase):
+    """Unseekable write target so ZipFile writes data descriptors and we can
+    hand each entry to the client as soon as it is written."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class BatchRenderer:
+    """Owns the process pool; jobs are kept in a BatchStore."""
+
+    def __init__(self, max_workers: int = MAX_WORKERS, cache=None,
+                 resolve: Optional[Callable[[str], Optional[List[dict]]]] = None,
+                 store: Optional[BatchStore] = None):
+        self.max_workers = max_workers
+        self.store = store or BatchStore()
+        self.cache = cache
+        # booking id -> its tickets (one dict per seat), None if it cannot be
+        # rendered. When set, only booking ids are taken from the request and
+        # everything printed comes from the resolver.
+        self.resolve = resolve
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # spawn: children must not inherit the parent's threads/locks
+                # (web server, native store), they only need ticket_pdf.
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._pool
+
+    def get(self, job_id: str) -> Optional[BatchJob]:
+        return self.store.load(job_id)
+
+    def submit(self, bookings: List[dict], fmt: str = "zip") -> BatchJob:
+        if fmt not in ("zip", "pdf"):
+            raise ValueError("format must be 'zip' or 'pdf'")
+        errors: Dict[int, str] = {}
+        if self.resolve is not None:
+            bookings, errors = self._resolve_all(bookings)
+        job = BatchJob(self.store, bookings, fmt)
+        job.status = "running"
+        self.store.create(job)
+        valid = []
+        for index, booking_data in enumerate(bookings):
+            error = errors.get(index) or validate_booking(booking_data)
+            if error:
+                job.record(index, None, error)
+            else:
+                valid.append(index)
+        if not valid:
+            job.finish("failed")
+            return job
+        if fmt == "pdf":
+            self._submit_document(job, valid)
+        else:
+            self._submit_tickets(job, valid)
+        return job
+
+    def _resolve_all(self, entries: List) -> Tuple[List[dict], Dict[int, str]]:
+        """Expand booking ids (or objects carrying a bookingId) into one
+        entry per ticket; unresolvable ones keep a placeholder and an error."""
+        tickets: List[dict] = []
+        errors: Dict[int, str] = {}
+        for entry in entries:
+            booking_id = entry.get("bookingId") if isinstance(entry, dict) else entry
+            resolved = self.resolve(str(booking_id)) if isinstance(booking_id, str) and booking_id else None
+            if resolved:
+                tickets.extend(resolved)
+            else:
+                errors[len(tickets)] = "booking not found or not confirmed"
+                tickets.append({"bookingId": booking_id})
+        return tickets, errors
+
+    def _submit_tickets(self, job: BatchJob, indexes: List[int]) -> None:
+        from ticket_cache import ticket_cache_key
+        pending = []
+        for index in indexes:
+            cached = self.cache.get(ticket_cache_key(job.bookings[index])) if self.cache else None
+            if cached is not None:
+                job.record(index, cached, None)
+            else:
+                pending.append(index)
+        if not pending:
+            job.finish("done")
+            return
+        job._pending = len(pending)
+        pool = self._executor()
+        for index in pending:
+            future = pool.submit(render_one, job.bookings[index])
+            future.add_done_callback(lambda f, i=index: self._ticket_done(job, i, f))
+
+    def _ticket_done(self, job: BatchJob, index: int, future) -> None:
+        try:
+            pdf = future.result()
+            if self.cache:
+                from ticket_cache import ticket_cache_key
+                self.cache.put(ticket_cache_key(job.bookings[index]), pdf)
+            job.record(index, pdf, None)
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool):
+                self._discard_pool()
+            logger.warning("batch %s: ticket %d failed: %s", job.id, index, e)
+            job.record(index, None, str(e) or e.__class__.__name__)
+        with job._lock:
+            job._pending -= 1
+            last = job._pending == 0
+        if last:
+            job.finish("done" if job.rendered else "failed")
+            logger.info("batch %s finished: %d ok, %d failed", job.id, job.rendered, len(job.failures))
+
+    def _submit_document(self, job: BatchJob, indexes: List[int]) -> None:
+        future = self._executor().submit(render_document, [job.bookings[i] for i in indexes])
+
+        def done(f):
+            try:
+                document = f.result()
+            except Exception as e:
+                if isinstance(e, BrokenProcessPool):
+                    self._discard_pool()
+                logger.warning("batch %s: document render failed: %s", job.id, e)
+                job.fail_all(indexes, str(e))
+                return
+            job.finish("done", document=document)
+
+        future.add_done_callback(done)
+
+    def _discard_pool(self) -> None:
+        """A crashed worker breaks the whole pool; start a fresh one next time."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+
+def _main(argv: Iterable[str]) -> int:
+    import argparse
+    import json
+    parser = argparse.ArgumentParser(description="Render many tickets in parallel")
+    parser.add_argument("bookings", help="JSON file with a list of booking objects")
+    parser.add_argument("-o", "--output", required=True, help="output .zip or .pdf")
+    parser.add_argument("--format", choices=("zip", "pdf"), help="defaults to the output extension")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS)
+    args = parser.parse_args(list(argv))
+
+    with open(args.bookings, "r", encoding="utf-8") as f:
+        bookings = json.load(f)
+    fmt = args.format or ("pdf" if args.output.lower().endswith(".pdf") else "zip")
+
+    scratch = tempfile.TemporaryDirectory(prefix="ticket-batch-")
+    renderer = BatchRenderer(max_workers=args.workers, store=BatchStore(os.path.join(scratch.name, "jobs.sqlite3")))
+    job = renderer.submit(bookings, fmt)
+    while job.status == "running":
+        p = job.progress()
+        print(f"\r{p['done']}/{p['total']} rendered, {p['failed']} failed", end="", file=sys.stderr)
+        time.sleep(0.2)
+    p = job.progress()
+    print(f"\r{p['done']}/{p['total']} rendered, {p['failed']} failed in {p['elapsed']}s", file=sys.stderr)
+    for failure in p["failures"]:
+        print(f"  #{failure['index']} {failure['bookingId']}: {failure['error']}", file=sys.stderr)
+
+    with open(args.output, "wb") as out:
+        if fmt == "pdf":
+            out.write(job.document or b"")
+        else:
+            for chunk in job.iter_zip():
+                out.write(chunk)
+    renderer.shutdown()
+    scratch.cleanup()
+    return 0 if job.status == "done" else 1
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv[1:]))
@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Optional
+
+from ticket_registry import SIGNING_KEY
+
+import logging
+logger = logging.getLogger("TicketCache")
+if not logger.handlers:
+    h = logging.StreamHandler()
+    h.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    logger.addHandler(h)
+logger.setLevel(logging.INFO)
+
+# Booking fields that end up on the rendered ticket. Anything else a client
+# posts (timestamps, cart ids, ...) must not change the cache key.
+RENDER_FIELDS = (
+    "bookingId", "eventTitle", "category", "date", "time", "venue",
+    "price", "seatNumber", "row", "gate", "mood", "tickets", "seatIndex",
+)
+
+# Bump when the ticket layout changes so stale cached PDFs are not served.
+RENDER_VERSION = "4"
+
+DEFAULT_MAX_BYTES = int(os.getenv("TICKET_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+DEFAULT_DISK_DIR = os.getenv("TICKET_CACHE_DIR") or None
+
+
+def ticket_cache_key(booking_data: dict) -> str:
+    """Content address of a ticket: hash of the fields the renderer reads."""
+    fields = {k: booking_data.get(k) for k in RENDER_FIELDS}
+    # The signing key is part of the address: rotating it must not serve
+    # PDFs whose codes were signed with the old key.
+    key_id = hashlib.sha256(SIGNING_KEY).hexdigest()[:16]
+    blob = json.dumps([RENDER_VERSION, key_id, fields], sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class TicketCache:
+    """
+    Content-addressed cache of rendered ticket PDFs.
+
+    Memory tier: LRU bounded by total bytes. Optional disk tier (one file per
+    key under `disk_dir`) survives restarts and is shared between worker
+    processes; disk hits are promoted into memory.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, disk_dir: Optional[str] = DEFAULT_DISK_DIR):
+        self.max_bytes = max_bytes
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        if self.disk_dir:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return data
+        data = self._disk_read(key)
+        if data is not None:
+            self._put_memory(key, data)
+            with self._lock:
+                self.hits += 1
+            return data
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, data: bytes) -> None:
+        self._put_memory(key, data)
+        self._disk_write(key, data)
+
+    def get_or_render(self, booking_data: dict, render: Callable[[dict], Optional[bytes]]) -> Optional[bytes]:
+        """Return cached PDF bytes for this booking, rendering (once) on a miss."""
+        key = ticket_cache_key(booking_data)
+        data = self.get(key)
+        if data is None:
+            data = render(booking_data)
+            if data is not None:
+                self.put(key, data)
+        return data
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._size, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses}
+
+    def _put_memory(self, key: str, data: bytes) -> None:
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._entries[key] = data
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def _disk_path(self, key: str) -> Path:
+        return self.disk_dir / f"{key}.pdf"
+
+    def _disk_read(self, key: str) -> Optional[bytes]:
+        if not self.disk_dir:
+            return None
+        try:
+            return self._disk_path(key).read_bytes()
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.warning("ticket cache disk read failed for %s: %s", key, e)
+            return None
+
+    def _disk_write(self, key: str, data: bytes) -> None:
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning("ticket cache disk write failed for %s: %s", key, e)
@@ -0,0 +1,335 @@
+from __future__ import annotations
+
+import importlib.util
+import io
+from datetime import datetime
+
+from ticket_barcodes import draw_code128, draw_qr
+from ticket_registry import sign_ticket, ticket_id_for
+
+import logging
+logger = logging.getLogger("TicketPDF")
+if not logger.handlers:
+    h = logging.StreamHandler()
+    h.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    logger.addHandler(h)
+logger.setLevel(logging.INFO)
+
+# Optional imports for PDF ticket generation. reportlab (and the PIL it pulls
+# in) costs ~100ms to import, so only its presence is checked here; the
+# modules themselves are loaded by the first generator, see _load_reportlab().
+PDF_GENERATION_AVAILABLE = importlib.util.find_spec("reportlab") is not None
+if not PDF_GENERATION_AVAILABLE:
+    print("PDF generation libraries not available - install with: pip install reportlab qrcode pillow")
+
+letter = Color = white = black = inch = canvas = PDFPathObject = fp_str = None
+
+# Content-stream operators of each theme's background, built once per process
+# and replayed into every document's form (see use_background).
+_BACKGROUND_OPS: dict = {}
+
+
+def _load_reportlab() -> None:
+    global letter, Color, white, black, inch, canvas, PDFPathObject, fp_str
+    if canvas is not None:
+        return
+    from reportlab.lib.pagesizes import letter as _letter
+    from reportlab.lib.colors import Color as _Color, white as _white, black as _black
+    from reportlab.lib.units import inch as _inch
+    from reportlab.pdfgen import canvas as _canvas
+    from reportlab.pdfgen.pathobject import PDFPathObject as _PDFPathObject
+    from reportlab.lib.rl_accel import fp_str as _fp_str
+    from reportlab import rl_config
+    # Plain Flate streams: the pure-Python ASCII85 pass costs more than
+    # drawing the ticket and only makes the file bigger.
+    rl_config.useA85 = 0
+    letter, Color, white, black, inch = _letter, _Color, _white, _black, _inch
+    PDFPathObject, fp_str = _PDFPathObject, _fp_str
+    canvas = _canvas  # last: other threads test it to skip the imports
+
+
+class StandardizedTicketGenerator:
+    """
+    Standardized PDF ticket generator matching the exact reference format.
+    Creates uniform tickets for all event types with proper theming.
+    """
+    
+    def __init__(self):
+        _load_reportlab()
+        # Standard ticket dimensions matching reference
+        self.ticket_width = 7.5 * inch
+        self.ticket_height = 3.5 * inch
+        
+        # Exact theme colors matching reference format
+        self.theme_colors = {
+            'movies': Color(0.8, 0.2, 0.2),      # Red theme
+            'events': Color(0.4, 0.2, 0.8),      # Purple theme  
+            'sports': Color(0.2, 0.7, 0.3),      # Green theme
+            'play': Color(0.8, 0.6, 0.2),        # Gold theme (matching reference)
+        }
+        
+        # Ticket positioning (centered on page) and section dimensions
+        self.x_start = 1 * inch
+        self.y_start = 4.5 * inch
+        self.left_width = 5 * inch
+        self.right_width = 2.5 * inch
+        self.section_height = 2.5 * inch
+        self.qr_inset = 0.12 * inch
+        self.qr_size = 0.85 * inch
+        
+        # Category labels
+        self.category_labels = {
+            'movies': 'Movie',
+            'events': 'Concert', 
+            'sports': 'Sports',
+            'play': 'Play'
+        }
+    
+    def generate_ticket_id(self, booking_data: dict) -> str:
+        """The registry's ticket ID for this seat of the booking (see
+        booking_ledger.booking_seats), the same on every re-download."""
+        return ticket_id_for(booking_data.get('bookingId', ''), int(booking_data.get('seatIndex') or 0))
+    
+    def format_date(self, date_str: str) -> tuple:
+        """Format date string to match reference format."""
+        try:
+            date_obj = datetime.strptime(date_str, '%Y-%m-%d')
+            day_name = date_obj.strftime('%A').upper()
+            month_day = date_obj.strftime('%B %d, %Y').upper()
+            return day_name, month_day
+        except:
+            return "DATE", "TO BE ANNOUNCED"
+    
+    def render_ticket(self, booking_data: dict) -> bytes | None:
+        """Render the ticket into memory and return the PDF bytes (None on failure)."""
+        buf = io.BytesIO()
+        if not self.generate_standardized_ticket(booking_data, buf):
+            return None
+        return buf.getvalue()
+
+    def render_tickets(self, tickets: list) -> bytes | None:
+        """Render several tickets (every seat of a booking) as the pages of
+        one PDF and return its bytes (None on failure)."""
+        if not PDF_GENERATION_AVAILABLE:
+            return None
+        buf = io.BytesIO()
+        try:
+            c = canvas.Canvas(buf, pagesize=letter)
+            for booking_data in tickets:
+                self.draw_ticket_page(c, booking_data)
+                c.showPage()
+            c.save()
+        except Exception as e:
+            logger.error(f"Error generating ticket PDF: {e}")
+            return None
+        return buf.getvalue()
+
+    def generate_standardized_ticket(self, booking_data: dict, output_path) -> bool:
+        """
+        Generate a standardized PDF ticket matching the exact reference format.
+        Layout: Left section (white) + Right section (colored) + Bottom info strip
+        `output_path` may be a filename or a binary file-like object.
+        """
+        if not PDF_GENERATION_AVAILABLE:
+            return False
+            
+        try:
+            # Create canvas with standard page size
+            c = canvas.Canvas(output_path, pagesize=letter)
+            self.draw_ticket_page(c, booking_data)
+            
+            # Save the PDF
+            c.save()
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error generating standardized ticket PDF: {e}")
+            return False
+
+    def draw_ticket_page(self, c, booking_data: dict) -> None:
+        """Draw one ticket onto the current page of canvas `c`: the cached
+        static background for its theme, then the per-booking overlay."""
+        # Get theme color for this category
+        category = booking_data.get('category', 'movies').lower()
+        if category not in self.theme_colors:
+            category = 'movies'
+        
+        # Ticket ID is stable per booking + seat; the codes carry it signed
+        # so the gate can reject forged IDs before any lookup.
+        ticket_id = self.generate_ticket_id(booking_data)
+        token = sign_ticket(ticket_id)
+        
+        x_start, y_start = self.x_start, self.y_start
+        left_width, right_width = self.left_width, self.right_width
+        ticket_height = self.section_height
+        
+        # Borders, panels, perforation, rule and info strip
+        self.use_background(c, category)
+        
+        # LEFT SECTION CONTENT
+        c.setFillColor(black)
+        
+        # Event Title (Large, centered)
+        c.setFont("Helvetica-Bold", 24)
+        event_title = booking_data.get('eventTitle', 'Event Name')
+        title_width = c.stringWidth(event_title, "Helvetica-Bold", 24)
+        title_x = x_start + (left_width - title_width) / 2
+        c.drawString(title_x, y_start + ticket_height - 0.6 * inch, event_title)
+        
+        # Format date
+        day_name, full_date = self.format_date(booking_data.get('date'))
+        
+        # Three column layout for details
+        c.setFont("Helvetica-Bold", 10)
+        
+        # Column 1: Date
+        col1_x = x_start + 0.3 * inch
+        c.drawString(col1_x, y_start + ticket_height - 1.2 * inch, day_name)
+        c.drawString(col1_x, y_start + ticket_height - 1.35 * inch, full_date)
+        
+        # Column 2: Price
+        col2_x = x_start + 1.8 * inch
+        c.drawString(col2_x, y_start + ticket_height - 1.2 * inch, "EVENT PRICE")
+        price_text = f"₹{booking_data.get('price') or 0}"
+        c.drawString(col2_x, y_start + ticket_height - 1.35 * inch, price_text)
+        
+        # Column 3: Door Open
+        col3_x = x_start + 3.2 * inch
+        c.drawString(col3_x, y_start + ticket_height - 1.2 * inch, "DOOR OPEN")
+        time_text = booking_data.get('time') or 'TBA'
+        c.drawString(col3_x, y_start + ticket_height - 1.35 * inch, time_text)
+        
+        # Venue (centered)
+        c.setFont("Helvetica", 12)
+        venue = booking_data.get('venue') or 'TBA'
+        venue_width = c.stringWidth(venue, "Helvetica", 12)
+        venue_x = x_start + (left_width - venue_width) / 2
+        c.drawString(venue_x, y_start + ticket_height - 1.7 * inch, venue)
+        
+        # Barcode in left section
+        self.draw_barcode(c, token, x_start + 0.3 * inch, y_start + 0.3 * inch, 4.4 * inch, 0.4 * inch)
+        
+        # Barcode number
+        c.setFont("Helvetica", 8)
+        barcode_num = ticket_id
+        c.drawString(x_start + 2 * inch, y_start + 0.1 * inch, barcode_num)
+        
+        # RIGHT SECTION CONTENT
+        c.setFillColor(white)
+        
+        # "ADMIT ONE TICKET" text
+        c.setFont("Helvetica-Bold", 14)
+        c.drawString(x_start + left_width + 0.2 * inch, y_start + ticket_height - 0.5 * inch, "ADMIT ONE")
+        c.drawString(x_start + left_width + 0.3 * inch, y_start + ticket_height - 0.7 * inch, "TICKET")
+        
+        # Date in right section
+        c.setFont("Helvetica-Bold", 10)
+        c.drawString(x_start + left_width + 0.2 * inch, y_start + ticket_height - 1.0 * inch, full_date)
+        
+        # Gate and Seat info
+        c.setFont("Helvetica-Bold", 9)
+        gate = booking_data.get('gate', 'Main')
+        row = booking_data.get('row', 'K')
+        seat = booking_data.get('seatNumber', '04')
+        
+        c.drawString(x_start + left_width + 0.2 * inch, y_start + ticket_height - 1.3 * inch, f"GATE {gate}")
+        c.drawString(x_start + left_width + 0.2 * inch, y_start + ticket_height - 1.45 * inch, f"ROW {row} • SEAT {seat}")
+        
+        # QR code in right section, on the white pad from the background
+        c.setFillColor(black)
+        draw_qr(c, token, x_start + left_width + self.qr_inset, y_start + self.qr_inset, self.qr_size)
+        
+        # Barcode number in right section, beside the QR code
+        c.setFillColor(white)
+        c.setFont("Helvetica", 7)
+        c.drawString(x_start + left_width + 1.1 * inch, y_start + 0.45 * inch, barcode_num)
+        
+        # BOTTOM INFO STRIP text
+        strip_y = y_start - 0.3 * inch
+        c.setFillColor(black)
+        c.setFont("Helvetica", 8)
+        
+        # Category and mood
+        category_label = self.category_labels.get(category, 'Event')
+        mood = booking_data.get('mood') or 'Entertainment'
+        c.drawString(x_start + 0.2 * inch, strip_y + 0.1 * inch, f"■ {category_label} • #{mood.title()}")
+        
+        # Ticket ID on right
+        c.drawString(x_start + left_width + right_width - 1.5 * inch, strip_y + 0.1 * inch, f"ID: {ticket_id}")
+
+    def use_background(self, c, category: str) -> None:
+        """Paint the static layout for `category` as a form XObject.
+        The form is added once per document and re-used by every page; its
+        operators are built once per process (see _background_ops)."""
+        name = f"ticket_bg_{category}"
+        if not c.hasForm(name):
+            ops = _BACKGROUND_OPS.get(category)
+            if ops is None:
+                ops = _BACKGROUND_OPS[category] = self._background_ops(self.theme_colors[category])
+            c.beginForm(name)
+            c.addLiteral(ops)
+            c.endForm()
+        c.doForm(name)
+
+    def _background_ops(self, theme_color) -> str:
+        """The background as PDF content-stream operators."""
+        x_start, y_start = self.x_start, self.y_start
+        left_width, right_width = self.left_width, self.right_width
+        ticket_height = self.section_height
+        ops = []
+
+        def fill(color):
+            ops.append(f"{fp_str(color.red, color.green, color.blue)} rg")
+
+        def stroke(color, width):
+            ops.append(f"{fp_str(color.red, color.green, color.blue)} RG {fp_str(width)} w")
+
+        def paint(path, op):
+            ops.append(f"{path.getCode()} {op}")
+
+        def rect(x, y, width, height):
+            path = PDFPathObject()
+            path.rect(x, y, width, height)
+            paint(path, "f*")
+
+        # Main ticket border
+        stroke(black, 2)
+        border = PDFPathObject()
+        border.rect(x_start, y_start, left_width + right_width, ticket_height)
+        paint(border, "S")
+
+        # LEFT SECTION (White background)
+        fill(white)
+        rect(x_start, y_start, left_width, ticket_height)
+
+        # RIGHT SECTION (Colored background)
+        fill(theme_color)
+        rect(x_start + left_width, y_start, right_width, ticket_height)
+
+        # Perforated edge, filled with the theme colour like the stub
+        stroke(black, 1)
+        perf_x = x_start + left_width
+        perforation = PDFPathObject()
+        for i in range(15):
+            perforation.circle(perf_x, y_start + (i * 0.15 * inch) + 0.1 * inch, 0.03 * inch)
+        paint(perforation, "B*")
+
+        # Horizontal line under title
+        rule = PDFPathObject()
+        rule.moveTo(x_start + 0.3 * inch, y_start + ticket_height - 0.8 * inch)
+        rule.lineTo(x_start + left_width - 0.3 * inch, y_start + ticket_height - 0.8 * inch)
+        paint(rule, "S")
+
+        # White pad (QR quiet zone) on the coloured stub
+        fill(white)
+        rect(x_start + left_width + self.qr_inset, y_start + self.qr_inset, self.qr_size, self.qr_size)
+
+        # BOTTOM INFO STRIP
+        fill(Color(0.9, 0.9, 0.9))
+        rect(x_start, y_start - 0.3 * inch, left_width + right_width, 0.25 * inch)
+        return "\n".join(ops)
+
+    def draw_barcode(self, canvas, value, x, y, width, height):
+        """Draw a scannable Code 128 barcode of `value` (vector bars)."""
+        canvas.setFillColor(black)
+        draw_code128(canvas, value, x, y, width, height)
@@ -0,0 +1,334 @@
+from __future__ import annotations
+
+import hashlib
+import hmac
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process dev server only
+    fcntl = None
+
+import logging
+logger = logging.getLogger("TicketRegistry")
+if not logger.handlers:
+    h = logging.StreamHandler()
+    h.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    logger.addHandler(h)
+logger.setLevel(logging.INFO)
+
+ROOT = Path(__file__).resolve().parent
+# Without TICKET_SIGNING_KEY anyone who has read this file can sign tickets;
+# the app refuses to start that way outside debug mode.
+SIGNING_KEY_CONFIGURED = bool(os.getenv("TICKET_SIGNING_KEY"))
+SIGNING_KEY = (os.getenv("TICKET_SIGNING_KEY") or "dev-secret-change-me").encode("utf-8")
+REGISTRY_PATH = os.getenv("TICKET_REGISTRY_PATH", str(ROOT / "tickets" / "registry.log"))
+
+# Truncated HMAC-SHA256: 64 bits is plenty against guessing and keeps the QR small.
+SIG_HEX_CHARS = 16
+
+ISSUED, SCANNED, REVOKED = 0, 1, 2
+_STATE_NAMES = {ISSUED: "issued", SCANNED: "scanned", REVOKED: "revoked"}
+
+
+def ticket_id_for(booking_id: str, seat_index: int = 0) -> str:
+    """Ticket id for one seat of a ledger booking: the booking id's hex digits
+    (behind a leading 1, so leading zeros survive) and the 0-based seat index
+    packed into one integer. Ledger booking ids are unique, so ticket ids are
+    too; raises ValueError for ids the ledger did not issue."""
+    booking_id = str(booking_id)
+    digits = booking_id[2:]
+    if not booking_id.startswith("BK") or not 0 < len(digits) <= 11 or not 0 <= seat_index < 1 << 16:
+        raise ValueError(f"no ticket id for booking {booking_id!r} seat {seat_index}")
+    return str(int("1" + digits, 16) << 16 | seat_index)
+
+
+def sign_ticket(ticket_id: str, key: bytes = SIGNING_KEY) -> str:
+    """Token printed on the ticket: '<ticket_id>.<hmac>'."""
+    mac = hmac.new(key, ticket_id.encode("utf-8"), hashlib.sha256).hexdigest()[:SIG_HEX_CHARS]
+    return f"{ticket_id}.{mac}"
+
+
+def verify_token(token: str, key: bytes = SIGNING_KEY) -> Optional[str]:
+    """Return the ticket id if the token's signature is valid, else None."""
+    ticket_id, _, mac = (token or "").strip().partition(".")
+    if not ticket_id.isdigit() or len(mac) != SIG_HEX_CHARS:
+        return None
+    expected = sign_ticket(ticket_id, key).partition(".")[2]
+    return ticket_id if hmac.compare_digest(mac, expected) else None
+
+
+class _Bloom:
+    """Bit-array Bloom filter over integer ticket ids (k probes, double hashing)."""
+
+    def __init__(self, bits: int = 1 << 23, k: int = 4):
+        self.m = bits
+        self.k = k
+        self.bits = bytearray(bits >> 3)
+
+    def _probes(self, n: int):
+        h1 = (n * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+        h2 = ((n ^ (n >> 31)) * 0xBF58476D1CE4E5B9) & 0xFFFFFFFFFFFFFFFF | 1
+        m = self.m
+        for i in range(self.k):
+            yield (h1 + i * h2) % m
+
+    def add(self, n: int) -> None:
+        bits = self.bits
+        for p in self._probes(n):
+            bits[p >> 3] |= 1 << (p & 7)
+
+    def __contains__(self, n: int) -> bool:
+        bits = self.bits
+        for p in self._probes(n):
+            if not bits[p >> 3] & (1 << (p & 7)):
+                return False
+        return True
+
+
+class TicketRegistry:
+    """
+    Server-side record of issued tickets.
+
+    Index: ticket ids as unsigned 64-bit ints in a sorted array (bisect), a
+    small dict for recent inserts that is merged into the sorted array in
+    bulk, a parallel bytearray of states, and a Bloom filter in front so
+    unknown ids are rejected without touching the index.
+
+    Durability / multi-process: every issue and scan is appended to a log
+    file. A validation takes an exclusive file lock, replays any entries other
+    worker processes appended since our last read, then checks and marks the
+    ticket, so two gates can never admit the same ticket.
+    """
+
+    MERGE_THRESHOLD = 4096
+
+    def __init__(self, path: Optional[str] = REGISTRY_PATH, key: bytes = SIGNING_KEY):
+        self.key = key
+        self.path = Path(path) if path else None
+        self._sorted = array("Q")
+        self._slots = array("I")           # sorted position -> slot
+        self._recent: Dict[int, int] = {}  # id -> slot, not yet merged
+        self._state = bytearray()          # slot -> state
+        self._booking: list = []           # slot -> booking id
+        self._scanned_at = array("d")      # slot -> unix time of scan
+        self._bloom = _Bloom()
+        self._lock = threading.Lock()
+        self._log_offset = 0
+        if self.path:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.touch(exist_ok=True)
+            with self._lock:
+                self._catch_up()
+            logger.info("ticket registry loaded %d tickets from %s", len(self._state), self.path)
+
+    def __len__(self) -> int:
+        return len(self._state)
+
+    # --- index ---
+
+    def _find(self, n: int) -> int:
+        slot = self._recent.get(n)
+        if slot is not None:
+            return slot
+        i = bisect_left(self._sorted, n)
+        if i < len(self._sorted) and self._sorted[i] == n:
+            return self._slots[i]
+        return -1
+
+    def _insert(self, n: int, booking_id: str) -> int:
+        slot = len(self._state)
+        self._state.append(ISSUED)
+        self._booking.append(booking_id)
+        self._scanned_at.append(0.0)
+        self._recent[n] = slot
+        self._bloom.add(n)
+        if len(self._recent) >= self.MERGE_THRESHOLD:
+            self._merge()
+        return slot
+
+    def _merge(self) -> None:
+        pairs = sorted(list(zip(self._sorted, self._slots)) + list(self._recent.items()))
+        self._sorted = array("Q", (p[0] for p in pairs))
+        self._slots = array("I", (p[1] for p in pairs))
+        self._recent.clear()
+
+    # --- log ---
+
+    def _apply(self, line: str) -> None:
+        parts = line.split(" ")
+        if len(parts) < 2 or not parts[1].isdigit():
+            return
+        n = int(parts[1])
+        if parts[0] == "I":
+            if n not in self._bloom or self._find(n) < 0:
+                self._insert(n, parts[2] if len(parts) > 2 else "")
+        elif parts[0] in ("S", "R"):
+            slot = self._find(n)
+            if slot >= 0:
+                self._state[slot] = SCANNED if parts[0] == "S" else REVOKED
+                if parts[0] == "S" and len(parts) > 2:
+                    self._scanned_at[slot] = float(parts[2])
+
+    def _catch_up(self) -> None:
+        """Replay log entries appended (by any process) since the last read."""
+        if not self.path:
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            f.seek(self._log_offset)
+            data = f.read()
+        if not data:
+            return
+        end = data.rfind("\n") + 1  # ignore a half-written trailing line
+        for line in data[:end].splitlines():
+            self._apply(line)
+        self._log_offset += len(data[:end].encode("utf-8"))
+
+    def _append(self, f, line: str) -> None:
+        f.write(line + "\n")
+        f.flush()
+        self._log_offset = f.tell()
+
+    def _locked_log(self):
+        return _LogLock(self.path) if self.path else _NullLock()
+
+    # --- API ---
+
+    def token_for(self, ticket_id: str) -> str:
+        return sign_ticket(ticket_id, self.key)
+
+    def issue(self, ticket_id: str, booking_id: str = "") -> str:
+        """Record an issued ticket (idempotent) and return its signed token."""
+        n = int(ticket_id)
+        booking_id = str(booking_id).replace(" ", "_")
+        with self._lock:
+            if n in self._bloom and self._find(n) >= 0:
+                return self.token_for(ticket_id)
+            with self._locked_log() as f:
+                self._catch_up()
+                if self._find(n) < 0:
+                    self._insert(n, booking_id)
+                    if f:
+                        self._append(f, f"I {n} {booking_id}")
+        return self.token_for(ticket_id)
+
+    def issue_many(self, ticket_ids: Iterable[str], booking_id: str = "") -> int:
+        """issue() for all tickets of one booking under a single log lock.
+        Returns how many were not issued before."""
+        ns = [int(t) for t in ticket_ids]
+        booking_id = str(booking_id).replace(" ", "_")
+        with self._lock:
+            if all(n in self._bloom and self._find(n) >= 0 for n in ns):
+                return 0
+            with self._locked_log() as f:
+                self._catch_up()
+                new = [n for n in ns if self._find(n) < 0]
+                for n in new:
+                    self._insert(n, booking_id)
+                if f and new:
+                    self._append(f, "\n".join(f"I {n} {booking_id}" for n in new))
+        return len(new)
+
+    def validate(self, token: str, mark: bool = True) -> Tuple[str, dict]:
+        """
+        Check a scanned token and (by default) mark it used.
+        Returns (status, info) with status one of: admitted, valid,
+        already_scanned, revoked, unknown, invalid_signature.
+        """
+        ticket_id = verify_token(token, self.key)
+        if ticket_id is None:
+            return "invalid_signature", {}
+        n = int(ticket_id)
+        with self._lock:
+            with self._locked_log() as f:
+                self._catch_up()
+                slot = self._find(n) if n in self._bloom else -1
+                if slot < 0:
+                    return "unknown", {"ticket_id": ticket_id}
+                info = {"ticket_id": ticket_id, "booking_id": self._booking[slot]}
+                state = self._state[slot]
+                if state == SCANNED:
+                    info["scanned_at"] = self._scanned_at[slot]
+                    return "already_scanned", info
+                if state == REVOKED:
+                    return "revoked", info
+                if not mark:
+                    return "valid", info
+                now = time.time()
+                self._state[slot] = SCANNED
+                self._scanned_at[slot] = now
+                if f:
+                    self._append(f, f"S {n} {now:.3f}")
+                info["scanned_at"] = now
+                return "admitted", info
+
+    def revoke(self, ticket_id: str) -> bool:
+        n = int(ticket_id)
+        with self._lock:
+            with self._locked_log() as f:
+                self._catch_up()
+                slot = self._find(n) if n in self._bloom else -1
+                if slot < 0:
+                    return False
+                self._state[slot] = REVOKED
+                if f:
+                    self._append(f, f"R {n}")
+                return True
+
+    def revoke_many(self, ticket_ids: Iterable[str]) -> int:
+        """revoke() for many tickets under a single log lock. Returns how
+        many were known and not revoked before."""
+        ns = [int(t) for t in ticket_ids]
+        with self._lock:
+            with self._locked_log() as f:
+                self._catch_up()
+                slots = [(n, self._find(n) if n in self._bloom else -1) for n in ns]
+                revoked = [n for n, slot in slots if slot >= 0 and self._state[slot] != REVOKED]
+                for n, slot in slots:
+                    if slot >= 0:
+                        self._state[slot] = REVOKED
+                if f and revoked:
+                    self._append(f, "\n".join(f"R {n}" for n in revoked))
+        return len(revoked)
+
+    def state(self, ticket_id: str) -> Optional[str]:
+        n = int(ticket_id)
+        with self._lock:
+            slot = self._find(n) if n in self._bloom else -1
+            return _STATE_NAMES[self._state[slot]] if slot >= 0 else None
+
+
+class _LogLock:
+    """Open the log for append under an exclusive advisory lock."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.f = None
+
+    def __enter__(self):
+        self.f = open(self.path, "a", encoding="utf-8")
+        if fcntl:
+            fcntl.flock(self.f.fileno(), fcntl.LOCK_EX)
+        return self.f
+
+    def __exit__(self, *exc):
+        try:
+            if fcntl:
+                fcntl.flock(self.f.fileno(), fcntl.LOCK_UN)
+        finally:
+            self.f.close()
+        return False
+
+
+class _NullLock:
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc):
+        return False
@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import atexit
+import json
+import logging.handlers
+import os
+import threading
+import time
+from collections import Counter, deque
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+import logging
+logger = logging.getLogger("TraceBuffer")
+if not logger.handlers:
+    h = logging.StreamHandler()
+    h.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    logger.addHandler(h)
+logger.setLevel(logging.INFO)
+
+ROOT = Path(__file__).resolve().parent
+TRACE_LOG_PATH = os.getenv("TRACE_LOG_PATH", str(ROOT / "logs" / "trace.ndjson"))
+TRACE_LOG_MAX_BYTES = int(os.getenv("TRACE_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+TRACE_LOG_BACKUPS = int(os.getenv("TRACE_LOG_BACKUPS", "5"))
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "10000"))
+TRACE_FLUSH_SECONDS = float(os.getenv("TRACE_FLUSH_SECONDS", "1.0"))
+MAX_BATCH = 500
+
+# Map common actions to DS concepts (keep mapping small and editable)
+ACTION_DS = {
+    "add_to_cart": "HashTable/Array",      # cart insert/update uses local storage (keyed by user)
+    "proceed_to_payment": "Queue/BookingQueue", # booking queue enqueue
+    "complete_booking": "Queue/BookingQueue",  # booking processing (dequeue)
+    "login": "HashTable",
+    "register": "HashTable",
+    "search_event": "BST/Trie/HashTable",
+    "shortest_path": "Graph/Dijkstra",
+    "add_path": "Graph",
+    "add_venue": "Graph/NodeInsert",
+    "cancel": "Stack/CancelStack",
+}
+
+# Map actions to typical client and server function names for clarity
+ACTION_FUNCS = {
+    "add_to_cart": {"client": "Cart.add / addToBookingCart", "server": "(localStorage) / optional eh.book"},
+    "proceed_to_payment": {"client": "seatSelectionSystem.proceedToPayment", "server": "/book -> eh.book (enqueue)"},
+    "complete_booking": {"client": "bookingConfirmationSystem.completeBooking", "server": "/book/process -> eh.process_next_booking"},
+    "login": {"client": "AuthSystem.handleLogin", "server": "/login -> eh.login_user"},
+    "register": {"client": "AuthSystem.handleRegistration", "server": "/signup -> eh.register_user"},
+    "search_event": {"client": "ehApi.getEvent", "server": "/event/<id> -> eh.search_event_json"},
+    "shortest_path": {"client": "ehApi.shortest", "server": "/venues/shortest -> eh.shortest_path_json"},
+    "add_path": {"client": "ehApi.addPath", "server": "/paths -> eh.add_path"},
+    "add_venue": {"client": "ehApi.addVenue", "server": "/venues -> eh.add_venue"},
+    "cancel": {"client": "ehApi.cancel", "server": "/cancel -> eh.cancel"},
+}
+_UNKNOWN_FUNCS = {"client": "unknown", "server": "unknown"}
+
+
+class TraceBuffer:
+    """
+    Ring buffer for client trace events, flushed off the request path.
+
+    submit() only appends to a bounded deque (atomic under the GIL, no lock);
+    when the buffer is full the oldest events are dropped rather than making
+    the client wait. A background thread drains it every flush interval,
+    enriches events with the DS/function mapping, appends them as NDJSON to a
+    size-rotated file and keeps per-action counters.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = TRACE_LOG_PATH,
+        capacity: int = TRACE_BUFFER_SIZE,
+        flush_interval: float = TRACE_FLUSH_SECONDS,
+        max_bytes: int = TRACE_LOG_MAX_BYTES,
+        backups: int = TRACE_LOG_BACKUPS,
+    ):
+        self.path = path
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._events: deque = deque(maxlen=capacity)
+        self._dropped = 0
+        self._written = 0
+        self._counts: Counter = Counter()
+        self._file: Optional[logging.Handler] = None
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    def submit(self, events: Iterable[Dict[str, Any]]) -> int:
+        """Buffer client events ({action, details, ts}); returns how many
+        were accepted."""
+        self.start()
+        received = time.time()
+        buf = self._events
+        accepted = 0
+        for e in events:
+            if len(buf) >= self.capacity:
+                self._dropped += 1
+            buf.append((received, e.get("ts"), e["action"], e.get("details")))
+            accepted += 1
+        return accepted
+
+    # --- background flush ---
+
+    def _sink(self) -> Optional[logging.Handler]:
+        if self._file is None and self.path:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(
+                self.path, maxBytes=self.max_bytes, backupCount=self.backups, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self._file = handler
+        return self._file
+
+    def flush(self) -> int:
+        """Drain everything buffered so far; returns the number written."""
+        with self._flush_lock:
+            buf = self._events
+            lines = []
+            counts = self._counts
+            for _ in range(len(buf)):
+                try:
+                    received, client_ts, action, details = buf.popleft()
+                except IndexError:
+                    break
+                counts[action] += 1
+                funcs = ACTION_FUNCS.get(action, _UNKNOWN_FUNCS)
+                lines.append(json.dumps({
+                    "ts": received,
+                    "client_ts": client_ts,
+                    "action": action,
+                    "ds": ACTION_DS.get(action, "unknown"),
+                    "client_fn": funcs["client"],
+                    "server_fn": funcs["server"],
+                    "details": details,
+                }, default=str, ensure_ascii=False))
+            if not lines:
+                return 0
+            sink = self._sink()
+            if sink is not None:
+                # One record per batch; the rotating handler checks size per emit.
+                sink.emit(logging.makeLogRecord({"msg": "\n".join(lines), "args": None}))
+            self._written += len(lines)
+        logger.debug("trace: flushed %d event(s)", len(lines))
+        return len(lines)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error("trace flush failed: %s", e)
+
+    def start(self) -> None:
+        """Start the flush thread (idempotent)."""
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            thread = threading.Thread(target=self._run, name="trace-flush", daemon=True)
+            thread.start()
+            self._thread = thread
+            atexit.register(self.stop)
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread = None
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self._events),
+            "written": self._written,
+            "dropped": self._dropped,
+            "actions": dict(self._counts),
+        }